@@ -0,0 +1,117 @@
+# auto_exposure.py - 基于直方图的自动Gamma/对比度（可选曝光）闭环调节
+
+import math
+import sensor, image
+from utils import ticks_ms, ticks_elapsed
+
+TARGET_MEDIAN = 0.45   # 目标亮度中位数（0-1）
+TARGET_SPREAD = 0.70   # 目标亮度范围 P95-P5（0-1）
+
+
+class AutoExposure:
+    """
+    自动亮度调节
+
+    每隔interval毫秒把校正后的画面降采样到一个灰度缓冲区，取亮度直方图的P5/P50/P95：
+      - 中位数偏离目标时调Gamma（输出≈输入^gamma，按 ln(目标)/ln(中位数) 估计所需Gamma）
+      - P95-P5 的范围偏离目标时调对比度
+    每次调节幅度受max_step限制，误差在死区内不调节，避免画面闪烁。
+    结果写回GammaController，由其gamma_corr查表校正，替代每帧的histeq(adaptive=True)。
+
+    use_sensor=True时，中位数偏差较大先调整传感器曝光时间，Gamma只做细调。
+    """
+
+    def __init__(self, gamma_ctrl, width, height, decimate=4, interval=1000,
+                 target_median=TARGET_MEDIAN, target_spread=TARGET_SPREAD,
+                 deadband=0.03, max_step=0.05, use_sensor=False):
+        """
+        Args:
+            gamma_ctrl: GammaController实例（参数写回对象）
+            width, height (int): 帧尺寸
+            decimate (int): 降采样倍数
+            interval (int): 测光间隔（ms）
+            target_median (float): 目标亮度中位数
+            target_spread (float): 目标亮度范围
+            deadband (float): 死区
+            max_step (float): 每次调节的最大幅度（Gamma/对比度）
+            use_sensor (bool): 是否同时调节传感器曝光
+        """
+        self.ctrl = gamma_ctrl
+        self.decimate = decimate
+        self.interval = interval
+        self.target_median = target_median
+        self.target_spread = target_spread
+        self.deadband = deadband
+        self.max_step = max_step
+        self.use_sensor = use_sensor
+
+        self.small = sensor.alloc_extra_fb(width // decimate, height // decimate, sensor.GRAYSCALE)
+        self.last_update = ticks_ms()
+
+        # 最近一次测光结果
+        self.p_low = 0.0
+        self.median = 0.0
+        self.p_high = 0.0
+
+        if use_sensor:
+            sensor.set_auto_exposure(False)
+            self.exposure_us = sensor.get_exposure_us()
+            self.exposure_range = (100, 4 * self.exposure_us)
+
+    def _step(self, value, target, value_range):
+        """向target移动，单次幅度不超过max_step"""
+        delta = max(-self.max_step, min(self.max_step, target - value))
+        return max(value_range[0], min(value_range[1], value + delta))
+
+    def measure(self, img):
+        """降采样并计算亮度分位数"""
+        scale = 1 / self.decimate
+        self.small.draw_image(img, 0, 0, x_scale=scale, y_scale=scale, hint=image.AREA)
+        hist = self.small.get_histogram(bins=64)
+        self.p_low = hist.get_percentile(0.05).value() / 255
+        self.median = hist.get_percentile(0.5).value() / 255
+        self.p_high = hist.get_percentile(0.95).value() / 255
+
+    def update(self, img):
+        """
+        每帧调用（在Gamma校正之后）：到达测光间隔时测光并调节一次
+
+        Returns:
+            bool: 本次是否调整了参数
+        """
+        if ticks_elapsed(self.last_update) < self.interval:
+            return False
+        self.last_update = ticks_ms()
+        self.measure(img)
+
+        changed = False
+        ctrl = self.ctrl
+        median = min(0.98, max(0.02, self.median))
+        error = self.target_median - median
+
+        if abs(error) > self.deadband:
+            if self.use_sensor and abs(error) > 0.15 and self._adjust_exposure(median):
+                return True
+            target_gamma = ctrl.gamma * math.log(self.target_median) / math.log(median)
+            ctrl.gamma = self._step(ctrl.gamma, target_gamma, ctrl.gamma_range)
+            changed = True
+
+        spread = max(0.05, self.p_high - self.p_low)
+        if abs(self.target_spread - spread) > self.deadband:
+            target_contrast = ctrl.contrast * self.target_spread / spread
+            ctrl.contrast = self._step(ctrl.contrast, target_contrast, ctrl.contrast_range)
+            changed = True
+        return changed
+
+    def _adjust_exposure(self, median):
+        """按中位数比例调节曝光时间（单次最多±25%），到达范围边界时返回False"""
+        ratio = max(0.75, min(1.25, self.target_median / median))
+        exposure = int(max(self.exposure_range[0], min(self.exposure_range[1], self.exposure_us * ratio)))
+        if exposure == self.exposure_us:
+            return False
+        self.exposure_us = exposure
+        sensor.set_auto_exposure(False, exposure_us=exposure)
+        return True
+
+    def get_status_text(self):
+        return f"AE P5:{self.p_low:.2f} P50:{self.median:.2f} P95:{self.p_high:.2f}"
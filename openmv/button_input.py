@@ -0,0 +1,190 @@
+# button_input.py - 中断驱动的按键输入（消抖、长按连发、组合键）
+
+import pyb
+import time
+
+# 事件类型（handler(event, value)）
+EV_PRESS = 1    # 单键按下，value=按键序号
+EV_REPEAT = 2   # 单键长按连发，value=按键序号
+EV_CHORD = 3    # 组合键，value=按键位掩码
+
+QUEUE_SIZE = 16  # 边沿队列长度（2的幂）
+
+
+class ButtonInput:
+    """
+    按键输入
+
+    每个按键引脚注册ExtInt双边沿中断，中断里只把按键序号写入环形队列并记录时间。
+    主循环调用poll()：队列为空且没有按住的按键时不读取中断按键的引脚；
+    最后一个边沿经过消抖时间后，只读取有边沿的引脚，得到稳定的按下状态。
+
+    同一条中断线（引脚号相同，如P3=PB12与P7=PD12都是线12）只能注册一个ExtInt，
+    中断线已被占用的按键改为在poll()中轮询：每次只读取这些引脚，电平变化时按边沿处理。
+
+    按下后等待组合键窗口：窗口内按下的所有按键作为一次手势，
+    若是注册的组合键则发出EV_CHORD，否则每个按键发出EV_PRESS。
+    单键按住超过长按时间后按固定间隔发出EV_REPEAT。
+    """
+
+    def __init__(self, pin_names, chords=(), debounce=30, chord_window=80,
+                 long_press=600, repeat_interval=150):
+        """
+        Args:
+            pin_names (list): 引脚名（低电平为按下），序号即事件中的按键序号
+            chords (list): 组合键位掩码列表
+            debounce (int): 消抖时间（ms）
+            chord_window (int): 组合键判定窗口（ms）
+            long_press (int): 长按判定时间（ms）
+            repeat_interval (int): 长按连发间隔（ms）
+        """
+        self.chords = chords
+        self.debounce = debounce
+        self.chord_window = chord_window
+        self.long_press = long_press
+        self.repeat_interval = repeat_interval
+
+        # 中断用的环形队列（中断里不分配内存）
+        self.queue = bytearray(QUEUE_SIZE)
+        self.head = 0
+        self.tail = 0
+        self.overflow = False
+        self.last_edge = time.ticks_ms()
+
+        self.pins = []
+        self.line_index = bytearray(b"\xff" * 16)
+        self.ext = []
+        self.polled = []        # 中断线已被占用、由poll()轮询的按键序号
+        for i, name in enumerate(pin_names):
+            pin = pyb.Pin(name, pyb.Pin.IN, pyb.Pin.PULL_UP)
+            self.pins.append(pin)
+            if self.line_index[pin.pin()] != 0xff:
+                self.polled.append(i)
+                continue
+            self.line_index[pin.pin()] = i
+            self.ext.append(pyb.ExtInt(pin, pyb.ExtInt.IRQ_RISING_FALLING, pyb.Pin.PULL_UP, self._irq))
+
+        # 稳定的按下状态（位掩码）
+        self.pressed = 0
+        for i, pin in enumerate(self.pins):
+            if not pin.value():
+                self.pressed |= 1 << i
+
+        # 轮询按键的上次电平（按下为1）和未处理的变化
+        self.polled_raw = 0
+        for i in self.polled:
+            self.polled_raw |= self.pressed & (1 << i)
+        self.polled_touched = 0
+
+        # 当前手势
+        self.gesture = 0
+        self.gesture_start = 0
+        self.emitted = False
+        self.next_repeat = 0
+
+    def _irq(self, line):
+        # 中断上下文：只写队列
+        nxt = (self.head + 1) & (QUEUE_SIZE - 1)
+        if nxt == self.tail:
+            self.overflow = True
+        else:
+            self.queue[self.head] = self.line_index[line]
+            self.head = nxt
+        self.last_edge = time.ticks_ms()
+
+    def _settle(self):
+        """读取有边沿的引脚，更新稳定状态，返回 (新按下掩码, 新松开掩码)"""
+        state = pyb.disable_irq()
+        touched = 0
+        while self.tail != self.head:
+            touched |= 1 << self.queue[self.tail]
+            self.tail = (self.tail + 1) & (QUEUE_SIZE - 1)
+        if self.overflow:
+            touched = (1 << len(self.pins)) - 1
+            self.overflow = False
+        pyb.enable_irq(state)
+        touched |= self.polled_touched
+        self.polled_touched = 0
+
+        pressed = self.pressed
+        for i in range(len(self.pins)):
+            bit = 1 << i
+            if touched & bit:
+                if self.pins[i].value():
+                    pressed &= ~bit
+                else:
+                    pressed |= bit
+        down = pressed & ~self.pressed
+        up = self.pressed & ~pressed
+        self.pressed = pressed
+        return down, up
+
+    def _scan_polled(self):
+        """读取轮询按键，电平变化时记为边沿"""
+        raw = 0
+        for i in self.polled:
+            if not self.pins[i].value():
+                raw |= 1 << i
+        if raw != self.polled_raw:
+            self.polled_touched |= raw ^ self.polled_raw
+            self.polled_raw = raw
+            self.last_edge = time.ticks_ms()
+
+    def _emit(self, handler, now):
+        """发出当前手势"""
+        self.emitted = True
+        self.next_repeat = time.ticks_add(now, self.long_press)
+        if self.gesture in self.chords:
+            handler(EV_CHORD, self.gesture)
+            return
+        for i in range(len(self.pins)):
+            if self.gesture & (1 << i):
+                handler(EV_PRESS, i)
+
+    def poll(self, handler):
+        """
+        处理按键事件
+
+        Args:
+            handler: handler(event, value)，event为EV_PRESS/EV_REPEAT/EV_CHORD
+        """
+        if self.polled:
+            self._scan_polled()
+        if self.head == self.tail and not self.overflow and not self.polled_touched and not self.gesture:
+            return
+
+        now = time.ticks_ms()
+        if (self.head != self.tail or self.overflow or self.polled_touched) and \
+                time.ticks_diff(now, self.last_edge) >= self.debounce:
+            down, up = self._settle()
+            if down and not self.emitted:
+                if not self.gesture:
+                    self.gesture_start = now
+                self.gesture |= down
+            if up and self.gesture and not self.emitted:
+                # 在组合键窗口内松开（短按）：立即发出
+                self._emit(handler, now)
+            if not self.pressed:
+                self.gesture = 0
+                self.emitted = False
+                return
+
+        if not self.gesture:
+            return
+        if not self.emitted:
+            if time.ticks_diff(now, self.gesture_start) >= self.chord_window:
+                self._emit(handler, now)
+            return
+
+        # 单键长按连发（组合键不连发）
+        g = self.gesture
+        if g & (g - 1) == 0 and self.pressed == g and time.ticks_diff(now, self.next_repeat) >= 0:
+            self.next_repeat = time.ticks_add(now, self.repeat_interval)
+            i = 0
+            while not g & (1 << i):
+                i += 1
+            handler(EV_REPEAT, i)
+
+    def close(self):
+        for ext in self.ext:
+            ext.disable()
@@ -0,0 +1,108 @@
+# clean_bg.py - 背景差分清洁度模块（OpenMV版，对应tools/clean_stream.py）
+
+import sensor
+
+T0 = 0.05              # 清洁度阈值
+DIFF_THRESHOLD = 50    # 差分二值化阈值
+BLEND_ALPHA = 248      # 背景更新权重（0-256，越接近256背景变化越慢）
+
+
+class BackgroundCleanliness:
+    """
+    背景差分清洁度计算
+
+    灰度帧与背景差分并二值化，去掉Otsu分割出的猪，统计剩余变化像素占比；
+    背景只在无猪且未变化的像素上用blend缓慢更新。
+    全部缓冲区在初始化时一次性分配，运行中不再申请内存。
+    """
+
+    def __init__(self, width, height, clean_threshold=T0, diff_threshold=DIFF_THRESHOLD,
+                 blend_alpha=BLEND_ALPHA):
+        """
+        Args:
+            width, height (int): 帧尺寸
+            clean_threshold (float): 粪尿像素占比阈值
+            diff_threshold (int): 差分二值化阈值
+            blend_alpha (int): 背景更新权重
+        """
+        self.clean_threshold = clean_threshold
+        self.diff_threshold = diff_threshold
+        self.blend_alpha = blend_alpha
+
+        # 背景、差分结果、地面掩码各占一个灰度帧缓冲
+        self.background = sensor.alloc_extra_fb(width, height, sensor.GRAYSCALE)
+        self.work = sensor.alloc_extra_fb(width, height, sensor.GRAYSCALE)
+        self.ground = sensor.alloc_extra_fb(width, height, sensor.GRAYSCALE)
+        self.initialized = False
+
+        self.ratio = 0.0
+        self.dirty = False
+
+    def set_background(self, gray):
+        """用当前灰度帧作为背景"""
+        self.background.replace(gray)
+        self.initialized = True
+
+    def process(self, gray):
+        """
+        处理一帧灰度图像
+
+        Args:
+            gray: 灰度图像（与初始化尺寸相同）
+
+        Returns:
+            float: 粪尿像素占比
+        """
+        if not self.initialized:
+            self.set_background(gray)
+
+        # 差分并二值化：work = 发生变化的像素
+        self.work.replace(gray)
+        self.work.difference(self.background)
+        self.work.binary([(self.diff_threshold, 255)])
+
+        # Otsu分割：ground = 不是猪的像素
+        thr = gray.get_histogram().get_threshold().value()
+        self.ground.replace(gray)
+        self.ground.binary([(0, thr)])
+
+        # 粪尿 = 发生变化且不是猪
+        self.work.b_and(self.ground)
+        self.ratio = self.work.get_statistics().mean() / 255
+        self.dirty = self.ratio >= self.clean_threshold
+
+        # ground异或粪尿 = 无猪且未变化的像素，只在这些像素上更新背景
+        self.ground.b_xor(self.work)
+        self.background.blend(gray, alpha=self.blend_alpha, mask=self.ground)
+
+        return self.ratio
+
+
+if __name__ == "__main__":
+    import time
+    from pyb import Pin
+
+    p_out = Pin('P7', Pin.OUT_PP)
+    p_out.high()
+
+    sensor.reset()
+    sensor.set_pixformat(sensor.GRAYSCALE)
+    sensor.set_framesize(sensor.QVGA)
+    sensor.skip_frames(time=2000)
+
+    engine = BackgroundCleanliness(sensor.width(), sensor.height())
+    clock = time.clock()
+
+    while True:
+        clock.tick()
+        img = sensor.snapshot()
+        ratio = engine.process(img)
+
+        if engine.dirty:
+            p_out.low()
+        else:
+            p_out.high()
+
+        status = "Pigsty Dirty" if engine.dirty else "Pigsty Clean"
+        img.draw_string(10, 10, status, color=255, scale=2)
+        print("FPS:", clock.fps(), "Status:", status, "Ratio:", ratio)
@@ -0,0 +1,114 @@
+# clean_tiles.py - 分块清洁度估计模块（降采样 + 粗网格统计）
+
+from array import array
+
+T0 = 0.01  # 清洁度阈值
+FECES_THRESHOLD = (18, 62, -32, 6, 26, 51)
+BLACK_THRESHOLD = (0, 9, -128, 127, -128, 127)
+
+
+class TileCleanliness:
+    """
+    在降采样后的图像上计算粪尿像素占比，同时给出每个网格块的脏污程度
+
+    mean_pool本身起到平滑作用，可替代原HD流程中的blur(2)；
+    二值化后白色像素L=100、黑色L=0，每块的l_mean/100即为该块的粪尿占比。
+    """
+
+    def __init__(self, threshold=FECES_THRESHOLD, grid=(8, 6), decimate=4, clean_threshold=T0):
+        """
+        Args:
+            threshold (tuple): 粪尿LAB颜色阈值
+            grid (tuple): 网格列数、行数
+            decimate (int): 降采样倍数（mean_pool的x_div/y_div）
+            clean_threshold (float): 清洁度阈值
+        """
+        self.threshold = threshold
+        self.cols, self.rows = grid
+        self.decimate = decimate
+        self.clean_threshold = clean_threshold
+
+        # 每块占比（0-255表示0-100%），按行优先存放
+        self.tiles = bytearray(self.cols * self.rows)
+        self.tile_rois = None
+        self._size = None
+        self.tile_pixels = array('H', [0] * (self.cols * self.rows))
+        self.ratio = 0.0
+        self.dirty = False
+
+    def _layout(self, w, h):
+        """按图像尺寸计算各网格块ROI（尺寸不变时只计算一次）"""
+        rois = []
+        for r in range(self.rows):
+            y0 = r * h // self.rows
+            y1 = (r + 1) * h // self.rows
+            for c in range(self.cols):
+                x0 = c * w // self.cols
+                x1 = (c + 1) * w // self.cols
+                rois.append((x0, y0, x1 - x0, y1 - y0))
+                self.tile_pixels[len(rois) - 1] = (x1 - x0) * (y1 - y0)
+        self.tile_rois = rois
+        self._size = (w, h)
+
+    def process(self, img):
+        """
+        原地降采样并二值化图像，更新每块占比和整体占比
+
+        Args:
+            img: RGB565图像（会被修改为降采样后的二值图）
+
+        Returns:
+            float: 整体粪尿像素占比
+        """
+        if self.decimate > 1:
+            img.mean_pool(self.decimate, self.decimate)
+        img.binary([self.threshold])
+
+        w, h = img.width(), img.height()
+        if self._size != (w, h):
+            self._layout(w, h)
+
+        dirty_pixels = 0
+        for i, roi in enumerate(self.tile_rois):
+            tile_ratio = img.get_statistics(roi=roi).l_mean() / 100
+            self.tiles[i] = min(255, int(tile_ratio * 255))
+            dirty_pixels += tile_ratio * self.tile_pixels[i]
+
+        self.ratio = dirty_pixels / (w * h)
+        self.dirty = self.ratio >= self.clean_threshold
+        return self.ratio
+
+    def dirtiest_tile(self):
+        """
+        Returns:
+            tuple: (col, row, ratio) 最脏的网格块
+        """
+        best = 0
+        for i in range(len(self.tiles)):
+            if self.tiles[i] > self.tiles[best]:
+                best = i
+        return (best % self.cols, best // self.cols, self.tiles[best] / 255)
+
+    def draw_tiles(self, img, min_ratio=0.05):
+        """在（降采样后的）图像上标出脏污程度超过min_ratio的网格块"""
+        for i, roi in enumerate(self.tile_rois):
+            if self.tiles[i] >= min_ratio * 255:
+                img.draw_rectangle(roi, color=(255, 0, 0))
+
+
+def reference_ratio(img, threshold=FECES_THRESHOLD):
+    """
+    原HD流程（binary -> blur(2) -> find_blobs统计像素），仅作为精度对照
+
+    Args:
+        img: RGB565图像（会被修改）
+
+    Returns:
+        float: 粪尿像素占比
+    """
+    img.binary([threshold])
+    img.blur(2)
+    white_pixels = 0
+    for blob in img.find_blobs([BLACK_THRESHOLD], invert=True):
+        white_pixels += blob.pixels()
+    return white_pixels / (img.width() * img.height())
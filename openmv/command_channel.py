@@ -0,0 +1,171 @@
+# command_channel.py - 串口命令通道（接收单片机的查询/设置命令并应答）
+
+from my_uart import uart, send_custom_packet
+
+# 命令帧（单片机 -> OpenMV）：
+#   0xF8, 长度高, 长度低, 命令号, 参数..., 0xE8     （长度 = 1 + 参数字节数）
+# 应答帧（OpenMV -> 单片机）：
+#   0xF9, 长度高, 长度低, 命令号, 状态, 数据..., 0xE9 （长度 = 2 + 数据字节数）
+# 其他带长度的帧类型可以用register_frame()接收（如uart_link的链路帧）
+COMMAND_FRAME = 8
+RESPONSE_FRAME = 9
+MAX_COMMAND_LEN = 64
+
+# 应答状态
+STATUS_OK = 0
+STATUS_UNKNOWN = 1      # 未注册的命令
+STATUS_BAD_ARGS = 2     # 参数错误
+STATUS_FAILED = 3       # 执行失败
+
+# 命令号
+CMD_STATS_HOUR = 0x10   # 参数[小时号]，返回[小时号, 日期(4字节)] + 统计数据
+CMD_STATS_DAY = 0x11    # 参数[几天前(0为今天)]，返回[几天前, 日期(4字节)] + 统计数据
+CMD_STATS_CURVE = 0x12  # 参数[字段序号]，返回[字段序号] + 24个小时的数值(各4字节)
+CMD_CONFIG_GET = 0x20   # 参数[参数序号]，返回[参数序号] + 值（编码见config_store.encode_value）
+CMD_CONFIG_SET = 0x21   # 参数[参数序号] + 值，立即生效，返回[参数序号] + 生效后的值
+CMD_CONFIG_SAVE = 0x22  # 保存当前参数到flash
+CMD_CONFIG_DEFAULTS = 0x23  # 恢复默认参数（不保存）
+CMD_RATE_STATUS = 0x30  # 返回[当前档位] + 各档位累计停留时间(各4字节, ms) + 切换次数(4字节)
+CMD_MODEL_INFO = 0x40   # 返回[模型数, 当前序号] + 最近切换耗时(4字节, ms) + 堆峰值(4字节) + 每个模型[已加载] + 大小(4字节)
+CMD_MODEL_SELECT = 0x41 # 参数[模型序号]，切换模型，返回[模型序号] + 切换耗时(4字节, ms)
+CMD_LINK_STATUS = 0x50  # 返回链路状态（见uart_link.LinkManager.status_bytes）
+CMD_SNAPSHOT_TAKE = 0x60    # 参数[原因]，下一帧截取事件快照，返回[是否接受]
+CMD_SNAPSHOT_NAK = 0x61     # 参数[快照号(2), 块序号(2)]，从该块开始重发
+CMD_SNAPSHOT_ACK = 0x62     # 参数[快照号(2)]，快照已收齐
+
+# 接收状态
+_WAIT_HEADER = 0
+_LEN_HI = 1
+_LEN_LO = 2
+_BODY = 3
+_FOOTER = 4
+
+
+class CommandError(Exception):
+    """处理函数抛出此异常时以指定状态应答"""
+
+    def __init__(self, status=STATUS_BAD_ARGS):
+        super().__init__(status)
+        self.status = status
+
+
+class CommandChannel:
+    """
+    非阻塞的命令接收与分发
+
+    每帧调用poll()：只读取串口缓冲中已有的字节并逐字节推进状态机，
+    收到完整命令后调用注册的处理函数，把返回的数据作为应答发送。
+    """
+
+    def __init__(self, port=uart):
+        self.uart = port
+        self.handlers = {}
+        self.frame_handlers = {}    # 帧类型 -> handler(body)
+        self.frame_type = COMMAND_FRAME
+        self.rx = bytearray(32)
+        self.body = bytearray(MAX_COMMAND_LEN)
+        self.state = _WAIT_HEADER
+        self.length = 0
+        self.received = 0
+        self.frames = 0
+        self.bad_frames = 0
+
+    def register(self, cmd, handler):
+        """
+        注册命令处理函数
+
+        Args:
+            cmd (int): 命令号
+            handler: handler(args) -> bytes/bytearray/list，args为参数的memoryview
+        """
+        self.handlers[cmd] = handler
+
+    def register_frame(self, frame_type, handler):
+        """
+        接收其他类型的带长度帧（帧头0xF0+类型，帧尾0xE0+类型，格式同命令帧）
+
+        Args:
+            frame_type (int): 帧类型
+            handler: handler(body)，body为帧内容（长度之后、帧尾之前）的memoryview
+        """
+        self.frame_handlers[frame_type] = handler
+
+    def reset(self):
+        """丢弃接收到一半的帧（切换波特率后调用）"""
+        self.state = _WAIT_HEADER
+
+    def poll(self):
+        """处理串口缓冲中的数据，返回本次处理的帧数"""
+        handled = 0
+        while self.uart.any():
+            n = self.uart.readinto(self.rx)
+            if not n:
+                break
+            for i in range(n):
+                if self._feed(self.rx[i]):
+                    self.frames += 1
+                    if self.frame_type == COMMAND_FRAME:
+                        self._dispatch()
+                    else:
+                        self.frame_handlers[self.frame_type](memoryview(self.body)[:self.length])
+                    handled += 1
+        return handled
+
+    def _feed(self, b):
+        """推进接收状态机，收到完整命令时返回True"""
+        state = self.state
+        if state == _WAIT_HEADER:
+            if b == 0xF0 + COMMAND_FRAME or ((b & 0xF0) == 0xF0 and (b & 0x0F) in self.frame_handlers):
+                self.frame_type = b & 0x0F
+                self.state = _LEN_HI
+        elif state == _LEN_HI:
+            self.length = b << 8
+            self.state = _LEN_LO
+        elif state == _LEN_LO:
+            self.length |= b
+            self.received = 0
+            if 1 <= self.length <= MAX_COMMAND_LEN:
+                self.state = _BODY
+            else:
+                self.bad_frames += 1
+                self.state = _WAIT_HEADER
+        elif state == _BODY:
+            self.body[self.received] = b
+            self.received += 1
+            if self.received == self.length:
+                self.state = _FOOTER
+        else:
+            self.state = _WAIT_HEADER
+            if b == 0xE0 + self.frame_type:
+                return True
+            self.bad_frames += 1
+        return False
+
+    def _dispatch(self):
+        cmd = self.body[0]
+        args = memoryview(self.body)[1:self.length]
+        handler = self.handlers.get(cmd)
+        if handler is None:
+            self.respond(cmd, STATUS_UNKNOWN)
+            return
+        try:
+            data = handler(args)
+        except CommandError as e:
+            self.respond(cmd, e.status)
+            return
+        except Exception as e:
+            print(f"命令0x{cmd:02x}执行失败: {e}")
+            self.respond(cmd, STATUS_FAILED)
+            return
+        self.respond(cmd, STATUS_OK, data)
+
+    def respond(self, cmd, status, data=b""):
+        """发送应答帧"""
+        length = 2 + len(data)
+        send_custom_packet(RESPONSE_FRAME,
+                           bytearray([(length >> 8) & 0xff, length & 0xff, cmd, status]) + bytearray(data))
+
+
+def u32_bytes(v):
+    """32位无符号数 -> 4字节大端"""
+    return bytearray([(v >> 24) & 0xff, (v >> 16) & 0xff, (v >> 8) & 0xff, v & 0xff])
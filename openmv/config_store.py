@@ -0,0 +1,210 @@
+# config_store.py - 持久化参数存储（flash上的JSON，原子写入，启动时一次读取）
+
+import os
+import json
+import struct
+from command_channel import CommandError, STATUS_BAD_ARGS, STATUS_FAILED, \
+    CMD_CONFIG_GET, CMD_CONFIG_SET, CMD_CONFIG_SAVE, CMD_CONFIG_DEFAULTS
+
+CONFIG_VERSION = 1
+CONFIG_FILE = "config.json"
+
+# 参数类型
+T_INT = 'i'       # 整数，串口编码为4字节有符号大端
+T_FLOAT = 'f'     # 浮点，串口编码为4字节IEEE754大端
+T_BOOL = 'b'      # 布尔，串口编码为1字节
+T_LAB = 'lab'     # LAB颜色阈值(Lmin, Lmax, Amin, Amax, Bmin, Bmax)，串口编码为6字节有符号
+
+# 参数表：(名称, 类型, 默认值, 最小值, 最大值, 说明)
+# 串口命令按参数在表中的序号访问，新参数只能追加在末尾
+CONFIG_SCHEMA = (
+    ("min_confidence", T_FLOAT, 0.8, 0.0, 1.0, "FOMO最小置信度"),
+    ("feces_color_threshold", T_LAB, (18, 61, -21, 15, 31, 63), -128, 127, "粪便颜色LAB阈值"),
+    ("ref_x", T_INT, 141, 0, 639, "参考点x"),
+    ("ref_y", T_INT, 215, 0, 479, "参考点y"),
+    ("detection_timeout", T_INT, 1000, 100, 60000, "检测超时(ms)"),
+    ("alarm_threshold", T_INT, 10000, 1000, 600000, "声光报警阈值(ms)"),
+    ("fail_send_limit", T_INT, 25, 0, 1000, "未检测到目标时的发送次数上限"),
+    ("stat_interval", T_INT, 5000, 500, 600000, "实时统计发送间隔(ms)"),
+    ("gamma", T_FLOAT, 1.0, 0.1, 3.0, "Gamma"),
+    ("contrast", T_FLOAT, 1.0, 0.1, 3.0, "对比度"),
+    ("brightness", T_FLOAT, 0.0, -1.0, 1.0, "亮度"),
+    ("auto_exposure", T_BOOL, True, 0, 1, "自动亮度调节"),
+    ("pan_min", T_INT, 45, 0, 180, "水平舵机最小角度"),
+    ("pan_max", T_INT, 150, 0, 180, "水平舵机最大角度"),
+    ("tilt_min", T_INT, 45, 0, 180, "垂直舵机最小角度"),
+    ("tilt_max", T_INT, 135, 0, 180, "垂直舵机最大角度"),
+    ("tiled_inference", T_BOOL, False, 0, 1, "整帧扫描使用分块推理"),
+    ("tile_budget_ms", T_INT, 150, 10, 2000, "分块推理每帧时间预算(ms)"),
+    ("color_refine", T_BOOL, True, 0, 1, "用颜色色块细化目标中心（关闭时用FOMO加权质心）"),
+    ("grid_bits", T_INT, 0, 0, 8, "类别网格帧每格位数（0关闭，1/2/4/8）"),
+    ("uart_baud", T_INT, 115200, 115200, 2000000, "期望的串口波特率（高于115200时与单片机协商）"),
+    ("snapshot_rate", T_INT, 2000, 0, 50000, "事件快照发送速率上限(字节/秒，0关闭)"),
+    ("snapshot_quality", T_INT, 50, 10, 100, "事件快照JPEG质量"),
+    ("latency_trace", T_BOOL, False, 0, 1, "延迟追踪（串口帧附加帧号和拍照时间，终端输出TRACE行）"),
+    ("pid_p", T_FLOAT, 0.09, 0.0, 10.0, "云台跟踪PID比例系数"),
+    ("pid_i", T_FLOAT, 0.01, 0.0, 10.0, "云台跟踪PID积分系数"),
+    ("pid_d", T_FLOAT, 0.0009, 0.0, 10.0, "云台跟踪PID微分系数"),
+    ("pid_imax", T_INT, 90, 0, 1000, "云台跟踪PID积分限幅"),
+)
+
+
+def validate(field, value):
+    """
+    按参数表检查并规范化一个值
+
+    Returns:
+        规范化后的值
+
+    Raises:
+        Exception: 类型或范围不符
+    """
+    name, kind, _, lo, hi, _ = field
+    if kind == T_LAB:
+        if len(value) != 6:
+            raise Exception(f"{name}: 需要6个数值")
+        value = tuple(int(v) for v in value)
+        for v in value:
+            if not lo <= v <= hi:
+                raise Exception(f"{name}: {v} 超出范围 [{lo}, {hi}]")
+        if value[0] > value[1] or value[2] > value[3] or value[4] > value[5]:
+            raise Exception(f"{name}: 最小值大于最大值")
+        return value
+    if kind == T_BOOL:
+        return bool(value)
+    value = float(value) if kind == T_FLOAT else int(value)
+    if not lo <= value <= hi:
+        raise Exception(f"{name}: {value} 超出范围 [{lo}, {hi}]")
+    return value
+
+
+class ConfigStore:
+    """
+    参数存储
+
+    启动时一次读入整个文件并逐项校验，缺失或非法的项使用默认值；
+    保存时先写临时文件再重命名，断电时旧文件或新文件至少有一个完整。
+    set()立即生效并通知监听者，save()后才写入flash。
+    """
+
+    def __init__(self, path=CONFIG_FILE, schema=CONFIG_SCHEMA):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.schema = schema
+        self.index = {field[0]: i for i, field in enumerate(schema)}
+        self.values = {field[0]: field[2] for field in schema}
+        self.listeners = []
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        """读取配置文件（主文件损坏时尝试上次未完成重命名的临时文件）"""
+        for path in (self.path, self.tmp_path):
+            try:
+                with open(path) as f:
+                    data = json.loads(f.read())
+            except (OSError, ValueError):
+                continue
+            if data.get("version") != CONFIG_VERSION:
+                print(f"配置版本 {data.get('version')} 与当前版本 {CONFIG_VERSION} 不同，按参数名迁移")
+            stored = data.get("values", {})
+            for field in self.schema:
+                if field[0] in stored:
+                    try:
+                        self.values[field[0]] = validate(field, stored[field[0]])
+                    except Exception as e:
+                        print(f"配置项无效，使用默认值: {e}")
+            print(f"配置已加载: {path}")
+            return True
+        return False
+
+    def save(self):
+        """原子写入：写临时文件后重命名覆盖"""
+        data = {"version": CONFIG_VERSION, "values": self.values}
+        with open(self.tmp_path, "w") as f:
+            f.write(json.dumps(data))
+        os.rename(self.tmp_path, self.path)
+        self.dirty = False
+
+    def get(self, name):
+        return self.values[name]
+
+    def set(self, name, value):
+        """校验并更新参数，通知监听者"""
+        value = validate(self.schema[self.index[name]], value)
+        if value == self.values[name]:
+            return
+        self.values[name] = value
+        self.dirty = True
+        for listener in self.listeners:
+            listener(name, value)
+
+    def reset_defaults(self):
+        for field in self.schema:
+            self.set(field[0], field[2])
+
+    def add_listener(self, listener):
+        """
+        注册参数变化回调
+
+        Args:
+            listener: listener(name, value)
+        """
+        self.listeners.append(listener)
+
+    # ---------------- 串口命令 ----------------
+
+    def register_commands(self, channel):
+        channel.register(CMD_CONFIG_GET, self._cmd_get)
+        channel.register(CMD_CONFIG_SET, self._cmd_set)
+        channel.register(CMD_CONFIG_SAVE, self._cmd_save)
+        channel.register(CMD_CONFIG_DEFAULTS, self._cmd_defaults)
+
+    def _field(self, args):
+        if len(args) < 1 or args[0] >= len(self.schema):
+            raise CommandError(STATUS_BAD_ARGS)
+        return self.schema[args[0]]
+
+    def _cmd_get(self, args):
+        field = self._field(args)
+        return bytearray([args[0]]) + encode_value(field, self.values[field[0]])
+
+    def _cmd_set(self, args):
+        field = self._field(args)
+        try:
+            self.set(field[0], decode_value(field, args[1:]))
+        except Exception as e:
+            print(f"配置命令错误: {e}")
+            raise CommandError(STATUS_BAD_ARGS)
+        return bytearray([args[0]]) + encode_value(field, self.values[field[0]])
+
+    def _cmd_save(self, args):
+        try:
+            self.save()
+        except OSError:
+            raise CommandError(STATUS_FAILED)
+        return b""
+
+    def _cmd_defaults(self, args):
+        self.reset_defaults()
+        return b""
+
+
+def encode_value(field, value):
+    """参数值 -> 串口字节"""
+    kind = field[1]
+    if kind == T_LAB:
+        return struct.pack(">6b", *value)
+    if kind == T_BOOL:
+        return bytearray([1 if value else 0])
+    return struct.pack(">f" if kind == T_FLOAT else ">i", value)
+
+
+def decode_value(field, data):
+    """串口字节 -> 参数值"""
+    kind = field[1]
+    if kind == T_LAB:
+        return struct.unpack(">6b", bytes(data))
+    if kind == T_BOOL:
+        return data[0] != 0
+    return struct.unpack(">f" if kind == T_FLOAT else ">i", bytes(data))[0]
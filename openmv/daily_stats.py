@@ -0,0 +1,154 @@
+# daily_stats.py - 统计计数器模块（字段统一声明，自动生成串口/日志编码）
+#
+# 本模块不依赖pyb，上位机解码工具直接导入同一份字段表。
+
+from array import array
+
+SCHEMA_VERSION = 1
+
+# 聚合方式
+AGG_SUM = 0    # 累加
+AGG_MAX = 1    # 取最大值
+AGG_MIN = 2    # 取最小值
+AGG_LAST = 3   # 取最新值
+
+# 字段表：(名称, 串口字节数, 聚合方式, 说明)
+# 内部统一以32位无符号数保存，串口按声明的字节数编码，超出范围时饱和到最大值
+STATS_SCHEMA = (
+    ("frame_count", 4, AGG_SUM, "帧数"),
+    ("target_count", 4, AGG_SUM, "FOMO目标次数"),
+    ("red_detect_count", 4, AGG_SUM, "红色检测成功数"),
+    ("fail_count", 4, AGG_SUM, "红色检测失败数"),
+    ("uart_send_count", 4, AGG_SUM, "串口发送次数"),
+    ("blob_count", 4, AGG_SUM, "色块总数"),
+    ("largest_blob_pixels", 4, AGG_MAX, "最大红色块像素数"),
+    ("total_blob_pixels", 4, AGG_SUM, "累计红色像素数"),
+    ("label_1_detects", 4, AGG_SUM, "粪便检测数"),
+    ("label_2_detects", 4, AGG_SUM, "猪检测数"),
+    ("naive_scan_pixels", 4, AGG_SUM, "色块扫描像素数(合并前)"),
+    ("merged_scan_pixels", 4, AGG_SUM, "色块扫描像素数(合并后)"),
+)
+
+U32_MAX = 0xFFFFFFFF
+
+
+def payload_size(schema=STATS_SCHEMA):
+    """串口数据部分长度（版本号1字节 + 各字段）"""
+    return 1 + sum(field[1] for field in schema)
+
+
+class Stats:
+    """按字段表保存的一组统计计数器（一个array('I')）"""
+
+    def __init__(self, schema=STATS_SCHEMA):
+        self.schema = schema
+        self.index = {field[0]: i for i, field in enumerate(schema)}
+        self.values = array('I', [0] * len(schema))
+        self.reset()
+
+    def reset(self):
+        """清零（取最小值的字段置为最大值，表示尚无数据）"""
+        for i, field in enumerate(self.schema):
+            self.values[i] = U32_MAX if field[2] == AGG_MIN else 0
+
+    def update(self, name, value=1):
+        """按字段的聚合方式更新"""
+        i = self.index[name]
+        agg = self.schema[i][2]
+        if agg == AGG_SUM:
+            value += self.values[i]
+            self.values[i] = value if value < U32_MAX else U32_MAX
+        elif agg == AGG_MAX:
+            if value > self.values[i]:
+                self.values[i] = min(value, U32_MAX)
+        elif agg == AGG_MIN:
+            if value < self.values[i]:
+                self.values[i] = max(value, 0)
+        else:
+            self.values[i] = min(max(value, 0), U32_MAX)
+
+    def get(self, name):
+        return self.values[self.index[name]]
+
+    def load(self, values, offset=0):
+        """从另一个数组（如小时桶）复制一组数值"""
+        for i in range(len(self.schema)):
+            self.values[i] = values[offset + i]
+
+    def store(self, values, offset=0):
+        """把当前数值复制到另一个数组"""
+        for i in range(len(self.schema)):
+            values[offset + i] = self.values[i]
+
+    def merge(self, values, offset=0):
+        """按各字段的聚合方式并入另一组数值（如把一个小时桶并入当天汇总）"""
+        for i, field in enumerate(self.schema):
+            v = values[offset + i]
+            agg = field[2]
+            if agg == AGG_SUM:
+                v += self.values[i]
+                self.values[i] = v if v < U32_MAX else U32_MAX
+            elif agg == AGG_MAX:
+                if v > self.values[i]:
+                    self.values[i] = v
+            elif agg == AGG_MIN:
+                if v < self.values[i]:
+                    self.values[i] = v
+            else:
+                self.values[i] = v
+
+    def uart_payload(self):
+        """
+        生成串口帧数据部分：[版本号] + 各字段按声明字节数大端编码
+
+        Returns:
+            bytearray: 数据部分
+        """
+        out = bytearray(payload_size(self.schema))
+        out[0] = SCHEMA_VERSION
+        pos = 1
+        for i, field in enumerate(self.schema):
+            width = field[1]
+            limit = (1 << (8 * width)) - 1
+            v = self.values[i]
+            if v > limit:
+                v = limit
+            for shift in range(width - 1, -1, -1):
+                out[pos] = (v >> (8 * shift)) & 0xff
+                pos += 1
+        return out
+
+    def report_lines(self):
+        """
+        生成日志/打印用的文本行
+
+        Returns:
+            list: ["说明: 数值", ...]
+        """
+        lines = []
+        for i, field in enumerate(self.schema):
+            v = self.values[i]
+            if field[2] == AGG_MIN and v == U32_MAX:
+                v = "-"
+            lines.append(f"{field[3]}: {v}")
+        return lines
+
+
+def decode_payload(payload, schema=STATS_SCHEMA):
+    """
+    解析串口帧数据部分（上位机/单片机参考实现）
+
+    Returns:
+        dict: {字段名: 数值}
+    """
+    if payload[0] != SCHEMA_VERSION:
+        raise Exception(f"统计帧版本不符: {payload[0]}")
+    result = {}
+    pos = 1
+    for field in schema:
+        v = 0
+        for _ in range(field[1]):
+            v = (v << 8) | payload[pos]
+            pos += 1
+        result[field[0]] = v
+    return result
@@ -0,0 +1,208 @@
+# event_log.py - 追加写入的二进制事件日志（flash/SD，预分配分段文件轮转）
+
+import os
+import struct
+import pyb
+from utils import get_unix_timestamp, ticks_ms, ticks_elapsed
+
+# 记录格式（16字节，小端）：
+#   seq(u32) 全局递增序号 | unix(u32) RTC秒 | ms(u16) pyb.millis()低16位 |
+#   event(u8) 事件类型 | check(u8) 校验 | value(i32) 事件参数
+RECORD_FORMAT = "<IIHBBi"
+RECORD_SIZE = 16
+CHECK_OFFSET = 11
+
+# 事件类型
+EV_BOOT = 1             # 系统启动
+EV_DETECT_START = 2     # 开始检测到目标
+EV_DETECT_END = 3       # 检测结束，value=持续时间(ms)
+EV_ALARM = 4            # 声光报警，value=持续时间(ms)
+EV_PUMP_ON = 5          # 水泵开启
+EV_PUMP_OFF = 6         # 水泵关闭，value=运行时间(ms)
+EV_UART_FAIL = 7        # 未检测到目标的发送次数达到上限，value=次数
+EV_DAILY_RESET = 8      # 每日统计清零，value=当日帧数
+EV_RATE_TIER = 9        # 帧率档位切换，value=新档位（rate_governor.TIER_*）
+EV_SCENE = 10           # 白天/夜间切换，value=新状态（scene_condition.COND_*）
+EV_LINK = 11            # 串口波特率改变，value=新波特率
+EV_SNAPSHOT = 12        # 截取事件快照，value=触发原因（snapshot.SNAP_*）
+
+EVENT_NAMES = {
+    EV_BOOT: "boot",
+    EV_DETECT_START: "detect_start",
+    EV_DETECT_END: "detect_end",
+    EV_ALARM: "alarm",
+    EV_PUMP_ON: "pump_on",
+    EV_PUMP_OFF: "pump_off",
+    EV_UART_FAIL: "uart_fail",
+    EV_DAILY_RESET: "daily_reset",
+    EV_RATE_TIER: "rate_tier",
+    EV_SCENE: "scene",
+    EV_LINK: "link",
+    EV_SNAPSHOT: "snapshot",
+}
+
+
+def record_check(buf, offset=0):
+    """记录校验：除校验字节外15字节求和取反，全0xFF/全0的未写区域不会通过校验"""
+    s = 0
+    for i in range(offset, offset + RECORD_SIZE):
+        if i != offset + CHECK_OFFSET:
+            s += buf[i]
+    return (~s) & 0xff
+
+
+class EventLog:
+    """
+    事件日志
+
+    日志由若干个预先分配好大小的分段文件组成，写满一段后轮转到下一段（覆盖最旧的一段），
+    不在运行中扩展文件，减少文件系统元数据写入。
+    记录先放入内存缓冲，攒够一批或超时后才写入并flush。
+    断电后启动时根据序号连续性和校验找回最后一条有效记录，之后从该位置继续写。
+    """
+
+    def __init__(self, prefix="evlog", segments=4, segment_records=2048,
+                 batch_records=32, flush_interval=5000):
+        """
+        Args:
+            prefix (str): 分段文件名前缀（如 "evlog" 或 "/sd/evlog"）
+            segments (int): 分段文件数
+            segment_records (int): 每段记录数
+            batch_records (int): 内存缓冲记录数
+            flush_interval (int): 最长缓冲时间（ms）
+        """
+        self.prefix = prefix
+        self.segments = segments
+        self.segment_records = segment_records
+        self.batch_records = batch_records
+        self.flush_interval = flush_interval
+
+        self.buffer = bytearray(batch_records * RECORD_SIZE)
+        self.buffered = 0
+        self.last_flush = ticks_ms()
+
+        self.segment = 0     # 当前写入的分段
+        self.position = 0    # 当前分段内下一条记录的位置
+        self.seq = 0         # 下一条记录的序号
+        self.file = None
+
+        self._prepare_segments()
+        self._recover()
+        self._open_segment()
+
+    def _path(self, index):
+        return f"{self.prefix}{index}.bin"
+
+    def _prepare_segments(self):
+        """创建缺失或大小不符的分段文件，内容填充0xFF"""
+        size = self.segment_records * RECORD_SIZE
+        fill = b"\xff" * 512
+        for i in range(self.segments):
+            path = self._path(i)
+            try:
+                if os.stat(path)[6] == size:
+                    continue
+            except OSError:
+                pass
+            with open(path, "wb") as f:
+                for _ in range(size // len(fill)):
+                    f.write(fill)
+                f.write(fill[:size % len(fill)])
+
+    def _first_seq(self, index):
+        """读取分段第一条记录的序号，无效时返回None"""
+        with open(self._path(index), "rb") as f:
+            rec = f.read(RECORD_SIZE)
+        if len(rec) == RECORD_SIZE and rec[CHECK_OFFSET] == record_check(rec):
+            return struct.unpack_from("<I", rec)[0]
+        return None
+
+    def _recover(self):
+        """找到最新分段及其末尾（最后一条有效且序号连续的记录之后）"""
+        newest = None
+        for i in range(self.segments):
+            seq = self._first_seq(i)
+            if seq is not None and (newest is None or seq > newest[1]):
+                newest = (i, seq)
+        if newest is None:
+            return
+
+        self.segment, expected = newest
+        position = 0
+        chunk = bytearray(RECORD_SIZE * 32)
+        with open(self._path(self.segment), "rb") as f:
+            while position < self.segment_records:
+                n = f.readinto(chunk)
+                if not n:
+                    break
+                stop = False
+                for off in range(0, n - RECORD_SIZE + 1, RECORD_SIZE):
+                    if chunk[off + CHECK_OFFSET] != record_check(chunk, off):
+                        stop = True
+                        break
+                    if struct.unpack_from("<I", chunk, off)[0] != expected:
+                        stop = True
+                        break
+                    expected += 1
+                    position += 1
+                if stop:
+                    break
+        self.position = position
+        self.seq = expected
+        print(f"事件日志恢复: 分段{self.segment} 位置{self.position} 序号{self.seq}")
+
+        if self.position >= self.segment_records:
+            self.segment = (self.segment + 1) % self.segments
+            self.position = 0
+
+    def _open_segment(self):
+        if self.file:
+            self.file.close()
+        self.file = open(self._path(self.segment), "r+b")
+
+    def log(self, event, value=0):
+        """
+        追加一条事件（只写入内存缓冲，不做文件操作）
+
+        Args:
+            event (int): 事件类型 EV_*
+            value (int): 事件参数
+        """
+        off = self.buffered * RECORD_SIZE
+        struct.pack_into(RECORD_FORMAT, self.buffer, off,
+                         self.seq, get_unix_timestamp(), pyb.millis() & 0xFFFF, event, 0, value)
+        self.buffer[off + CHECK_OFFSET] = record_check(self.buffer, off)
+        self.seq += 1
+        self.buffered += 1
+        if self.buffered >= self.batch_records:
+            self.flush()
+
+    def poll(self):
+        """每帧调用：缓冲超时后写入"""
+        if self.buffered and ticks_elapsed(self.last_flush) >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """把缓冲的记录写入当前分段，写满时轮转到下一段"""
+        written = 0
+        mv = memoryview(self.buffer)
+        while written < self.buffered:
+            room = self.segment_records - self.position
+            n = min(room, self.buffered - written)
+            self.file.seek(self.position * RECORD_SIZE)
+            self.file.write(mv[written * RECORD_SIZE:(written + n) * RECORD_SIZE])
+            self.file.flush()
+            written += n
+            self.position += n
+            if self.position >= self.segment_records:
+                self.segment = (self.segment + 1) % self.segments
+                self.position = 0
+                self._open_segment()
+        self.buffered = 0
+        self.last_flush = ticks_ms()
+
+    def close(self):
+        self.flush()
+        if self.file:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,205 @@
+# feces_heatmap.py - 粪便位置热力图累计模块（粗网格，按天统计）
+
+from array import array
+from feces_refine import merge_rois
+
+HEATMAP_FILE = "heatmap.bin"
+HEADER_SIZE = 4         # 文件头：日期编码YYYYMMDD（4字节小端，见rolling_stats.date_code），其后为计数表
+FULL_WRITE_CELLS = 64   # 脏单元超过该数目时整表写入，否则逐单元写入
+
+
+def rle_encode(values):
+    """
+    零游程编码：0x00后跟连续零的个数(1-255)，其余字节原样输出
+
+    Args:
+        values: 0-255的字节序列
+
+    Returns:
+        bytearray: 编码结果
+    """
+    out = bytearray()
+    run = 0
+    for v in values:
+        if v == 0:
+            run += 1
+            if run == 255:
+                out.append(0)
+                out.append(run)
+                run = 0
+        else:
+            if run:
+                out.append(0)
+                out.append(run)
+                run = 0
+            out.append(v)
+    if run:
+        out.append(0)
+        out.append(run)
+    return out
+
+
+class FecesHeatmap:
+    """
+    把画面划分为 cols×rows 的粗网格，每次确认检测时对所在网格计数加一（O(1)），
+    计数保存在array('H')中，定期增量写入flash；文件头记录日期，只恢复当天的数据
+    """
+
+    def __init__(self, frame_w, frame_h, date, cols=32, rows=24, path=HEATMAP_FILE):
+        """
+        Args:
+            frame_w, frame_h (int): 画面尺寸
+            date (int): 当天的日期编码YYYYMMDD（rolling_stats.date_code）
+            cols, rows (int): 网格列数、行数
+            path (str): flash上的保存文件
+        """
+        self.frame_w = frame_w
+        self.frame_h = frame_h
+        self.cols = cols
+        self.rows = rows
+        self.path = path
+        self.date = date
+        self.counts = array('H', [0] * (cols * rows))
+        # 自上次保存以来修改过的单元（位图）
+        self.dirty = bytearray((cols * rows + 7) // 8)
+        self.dirty_count = 0
+        self.load()
+
+    def add(self, x, y):
+        """在画面坐标(x, y)处计数一次"""
+        col = x * self.cols // self.frame_w
+        row = y * self.rows // self.frame_h
+        if not (0 <= col < self.cols and 0 <= row < self.rows):
+            return
+        i = row * self.cols + col
+        if self.counts[i] < 0xFFFF:
+            self.counts[i] += 1
+        if not self.dirty[i >> 3] & (1 << (i & 7)):
+            self.dirty[i >> 3] |= 1 << (i & 7)
+            self.dirty_count += 1
+
+    def _file_size(self):
+        return HEADER_SIZE + len(self.counts) * 2
+
+    def _header(self):
+        d = self.date
+        return bytearray([d & 0xff, (d >> 8) & 0xff, (d >> 16) & 0xff, (d >> 24) & 0xff])
+
+    def _write_all(self):
+        with open(self.path, 'wb') as f:
+            f.write(self._header())
+            f.write(self.counts)
+
+    def load(self):
+        """从flash读取当天的累计数据，文件不存在、尺寸不符或不是当天的数据时从零开始"""
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return
+        if len(data) != self._file_size():
+            print(f"热力图文件尺寸不符，已丢弃: {self.path}")
+            return
+        if data[:HEADER_SIZE] != self._header():
+            print(f"热力图不是当天的数据，已丢弃: {self.path}")
+            return
+        self.counts = array('H', data[HEADER_SIZE:])
+        print(f"热力图已加载: {self.path}")
+
+    def save(self):
+        """增量保存到flash：只写入修改过的单元"""
+        if not self.dirty_count:
+            return
+        try:
+            if self.dirty_count > FULL_WRITE_CELLS:
+                self._write_all()
+            else:
+                cell = bytearray(2)
+                with open(self.path, 'r+b') as f:
+                    # 文件被截断或是旧格式时逐单元写入会留下错位的数据，改为整表写入
+                    if f.seek(0, 2) != self._file_size():
+                        raise OSError
+                    for i in range(len(self.counts)):
+                        if self.dirty[i >> 3] & (1 << (i & 7)):
+                            # 与array('H')写入整表时的字节序一致（小端）
+                            cell[0] = self.counts[i] & 0xff
+                            cell[1] = self.counts[i] >> 8
+                            f.seek(HEADER_SIZE + i * 2)
+                            f.write(cell)
+        except OSError:
+            # 文件不存在或尺寸不符时整表写入
+            self._write_all()
+        for i in range(len(self.dirty)):
+            self.dirty[i] = 0
+        self.dirty_count = 0
+
+    def reset(self, date):
+        """
+        清零（新的一天）并写回flash
+
+        Args:
+            date (int): 新一天的日期编码YYYYMMDD
+        """
+        self.date = date
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+        self._write_all()
+        for i in range(len(self.dirty)):
+            self.dirty[i] = 0
+        self.dirty_count = 0
+
+    def peak(self):
+        m = 0
+        for v in self.counts:
+            if v > m:
+                m = v
+        return m
+
+    def encode_frame(self):
+        """
+        编码为串口每日热力图帧的数据部分：
+        [长度高, 长度低, cols, rows, 峰值高, 峰值低] + 零游程编码的8位归一化网格
+
+        Returns:
+            bytearray: 数据部分
+        """
+        peak = self.peak()
+        scaled = bytearray(len(self.counts))
+        if peak:
+            for i, v in enumerate(self.counts):
+                # 非零计数至少映射为1，避免稀疏单元在归一化后丢失
+                scaled[i] = (v * 255 + peak - 1) // peak
+        body = bytearray([self.cols, self.rows, (peak >> 8) & 0xff, peak & 0xff]) + rle_encode(scaled)
+        return bytearray([(len(body) >> 8) & 0xff, len(body) & 0xff]) + body
+
+    def hot_zones(self, min_fraction=0.25, max_zones=4):
+        """
+        计数不低于峰值min_fraction的网格合并成的热点区域（画面坐标）
+
+        Returns:
+            list: [(x, y, w, h), ...]，按区域内热点网格数从多到少排列
+        """
+        peak = self.peak()
+        if not peak:
+            return []
+        limit = max(1, int(peak * min_fraction))
+        cell_w = self.frame_w / self.cols
+        cell_h = self.frame_h / self.rows
+        cells = []
+        for i, v in enumerate(self.counts):
+            if v >= limit:
+                col = i % self.cols
+                row = i // self.cols
+                # 每个网格向四周扩展半格，使相邻热点网格相交从而被合并
+                cells.append((int((col - 0.5) * cell_w), int((row - 0.5) * cell_h),
+                              int(cell_w * 2), int(cell_h * 2)))
+
+        zones = []
+        for rect, members in merge_rois(cells, cost_check=False):
+            x = max(0, rect[0])
+            y = max(0, rect[1])
+            w = min(self.frame_w, rect[0] + rect[2]) - x
+            h = min(self.frame_h, rect[1] + rect[3]) - y
+            zones.append((len(members), (x, y, w, h)))
+        zones.sort(key=lambda z: -z[0])
+        return [z[1] for z in zones[:max_zones]]
@@ -0,0 +1,146 @@
+# feces_refine.py - 粪便检测的颜色细化模块（合并划算的重叠ROI，减少重复扫描）
+
+import math
+
+
+def expand_roi(bbox, img_w, img_h):
+    """
+    计算FOMO检测框周围3倍大小的辅助色块检测区域
+
+    Args:
+        bbox (tuple): FOMO检测框 (x, y, w, h)
+        img_w, img_h (int): 图像尺寸
+
+    Returns:
+        tuple: 裁剪到图像范围内的ROI (x, y, w, h)
+    """
+    x, y, w, h = bbox
+    color_x = max(0, math.ceil(x - w))
+    color_y = max(0, math.ceil(y - h))
+    color_w = min(img_w - color_x, 3 * w)
+    color_h = min(img_h - color_y, 3 * h)
+    return (color_x, color_y, color_w, color_h)
+
+
+def _overlap(a, b):
+    """判断两个矩形是否相交"""
+    return (a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and
+            a[1] < b[1] + b[3] and b[1] < a[1] + a[3])
+
+
+def _area(r):
+    return r[2] * r[3]
+
+
+def _overlap_area(a, b):
+    """两个矩形相交部分的面积"""
+    w = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    h = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    return w * h if w > 0 and h > 0 else 0
+
+
+def _union(a, b):
+    """两个矩形的外接矩形"""
+    x = min(a[0], b[0])
+    y = min(a[1], b[1])
+    return (x, y, max(a[0] + a[2], b[0] + b[2]) - x, max(a[1] + a[3], b[1] + b[3]) - y)
+
+
+def merge_rois(rois, cost_check=True):
+    """
+    合并相交的ROI：只有外接矩形面积不超过两者分开扫描的像素数
+    （area(a)+area(b)-重叠面积）时才合并，否则外接矩形多出的空白区域
+    比重复扫描重叠部分更贵，保持分开
+
+    Args:
+        rois (list): ROI列表 [(x, y, w, h), ...]
+        cost_check (bool): False时只要相交就合并（用于分组而非扫描）
+
+    Returns:
+        list: [(merged_roi, [原ROI下标, ...]), ...]
+    """
+    groups = [(roi, [i]) for i, roi in enumerate(rois) if roi[2] > 0 and roi[3] > 0]
+    merged = True
+    while merged:
+        merged = False
+        i = 0
+        while i < len(groups):
+            j = i + 1
+            while j < len(groups):
+                a, b = groups[i][0], groups[j][0]
+                union = _union(a, b)
+                if _overlap(a, b) and (not cost_check or
+                                       _area(union) <= _area(a) + _area(b) - _overlap_area(a, b)):
+                    groups[i] = (union, groups[i][1] + groups[j][1])
+                    groups.pop(j)
+                    merged = True
+                else:
+                    j += 1
+            i += 1
+    return groups
+
+
+def _contains(roi, x, y):
+    return roi[0] <= x < roi[0] + roi[2] and roi[1] <= y < roi[1] + roi[3]
+
+
+class FecesRefiner:
+    """
+    对一帧内所有粪便检测做颜色细化：
+    各检测的3倍窗口中划算的先合并，每个区域只调用一次find_blobs；
+    仍相交的区域会在重叠处找到同一色块，按中心点去重后再归回各自的检测
+    """
+
+    def __init__(self, color_threshold):
+        """
+        Args:
+            color_threshold (tuple): LAB颜色阈值
+        """
+        self.color_threshold = color_threshold
+        # 最近一帧的扫描像素数（合并前/合并后）
+        self.naive_scan_pixels = 0
+        self.merged_scan_pixels = 0
+
+    def refine(self, img, detections):
+        """
+        Args:
+            img: 输入图像
+            detections (list): FOMO粪便检测结果
+
+        Returns:
+            tuple: (blobs, matches, regions)
+                blobs: 中心落在任一原窗口内的色块（按中心点去重，每个只出现一次）
+                matches: 与detections对应的最大色块列表，未找到为None
+                regions: 实际扫描的合并区域
+        """
+        rois = [expand_roi(d['bbox'], img.width(), img.height()) for d in detections]
+        regions = merge_rois(rois)
+
+        self.naive_scan_pixels = sum(r[2] * r[3] for r in rois)
+        self.merged_scan_pixels = sum(r[0][2] * r[0][3] for r in regions)
+
+        blobs = []
+        for region, members in regions:
+            for blob in img.find_blobs([self.color_threshold], roi=region, merge=True):
+                cx, cy = blob.cx(), blob.cy()
+                # 合并区域的外接矩形会多出少量原窗口之外的像素，其中的色块不计入
+                if not any(_contains(rois[i], cx, cy) for i in members):
+                    continue
+                # 相交区域在重叠处会各找到一次同一色块（可能被区域边界截断）：
+                # 中心点落在已有色块内或反之即视为重复，保留像素多的
+                for k, other in enumerate(blobs):
+                    if _contains(other.rect(), cx, cy) or _contains(blob.rect(), other.cx(), other.cy()):
+                        if blob.pixels() > other.pixels():
+                            blobs[k] = blob
+                        break
+                else:
+                    blobs.append(blob)
+
+        matches = [None] * len(detections)
+        for blob in blobs:
+            cx, cy = blob.cx(), blob.cy()
+            for i, roi in enumerate(rois):
+                if _contains(roi, cx, cy) and (matches[i] is None or blob.pixels() > matches[i].pixels()):
+                    matches[i] = blob
+
+        return blobs, matches, [r[0] for r in regions]
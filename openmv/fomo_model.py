@@ -1,10 +1,10 @@
 # fomo_model.py - FOMO神经网络模型模块
 
 import ml
-import uos
-import gc
 import math
 import image
+from utils import ticks_ms, ticks_elapsed
+from model_registry import ModelRegistry, MODEL_EXT
 
 class FOMOModel:
     """
@@ -12,20 +12,34 @@ class FOMOModel:
     用于目标检测和分类
     """
     
-    def __init__(self, model_path="trained.tflite", labels_path="labels.txt", min_confidence=0.8):
+    def __init__(self, model_path="trained.tflite", labels_path="labels.txt", min_confidence=0.8,
+                 registry=None, model_name=None):
         """
         初始化FOMO模型
         
         Args:
-            model_path (str): 模型文件路径
-            labels_path (str): 标签文件路径
+            model_path (str): 模型文件路径（不使用registry时）
+            labels_path (str): 标签文件路径（不使用registry时）
             min_confidence (float): 最小置信度阈值 (0.0-1.0)
+            registry (ModelRegistry): 模型注册表，None时只注册model_path一个模型
+            model_name (str): 使用registry中的哪个模型，默认为第一个
         """
-        self.model_path = model_path
-        self.labels_path = labels_path
+        if registry is None:
+            registry = ModelRegistry()
+            model_name = model_path[:-len(MODEL_EXT)] if model_path.endswith(MODEL_EXT) else model_path
+            registry.add(model_name, model_path, labels_path)
+        self.registry = registry
+        self.model_name = None
+        self.model_path = None
+        self.labels_path = None
         self.min_confidence = min_confidence
         self.net = None
         self.labels = None
+        self.last_swap_ms = 0
+
+        # 最近一次推理的各类别置信度图及其网格映射(x_offset, y_offset, scale)，供class_grid编码
+        self.last_maps = []
+        self.last_geometry = (0, 0, 1)
         self.threshold_list = [(math.ceil(min_confidence * 255), 255)]
         
         # 为不同检测类别定义显示颜色
@@ -40,27 +54,38 @@ class FOMOModel:
         ]
         
         # 加载模型和标签
-        self._load_model()
-        self._load_labels()
-    
-    def _load_model(self):
-        """加载TensorFlow Lite模型"""
-        try:
-            # 根据剩余内存决定是否将模型加载到帧缓冲区
-            load_to_fb = uos.stat(self.model_path)[6] > (gc.mem_free() - (64*1024))
-            self.net = ml.Model(self.model_path, load_to_fb=load_to_fb)
-            print(f"模型加载成功: {self.model_path}")
-        except Exception as e:
-            raise Exception(f'加载模型"{self.model_path}"失败: {str(e)}')
+        self.use_model(model_name or registry.names()[0])
     
-    def _load_labels(self):
-        """加载分类标签"""
+    def use_model(self, name):
+        """
+        切换到注册表中的另一个模型（已预加载时几乎没有停顿）
+        
+        Args:
+            name (str): 模型名称
+        """
+        start = ticks_ms()
+        # 先释放对旧模型的引用并取消pin，注册表需要卸载它时内存才能真正回收
+        old = self.model_name
+        self.net = None
+        if old is not None:
+            self.registry.unpin(old)
         try:
-            with open(self.labels_path, 'r') as f:
-                self.labels = [line.rstrip('\n') for line in f]
-            print(f"标签加载成功: {self.labels}")
-        except Exception as e:
-            raise Exception(f'加载标签文件"{self.labels_path}"失败: {str(e)}')
+            net = self.registry.get(name)
+            labels = self.registry.labels(name)
+        except Exception:
+            if old is not None:
+                self.net = self.registry.get(old)
+                self.registry.pin(old)
+            raise
+        entry = self.registry.info(name)
+        self.registry.pin(name)
+        self.net = net
+        self.labels = labels
+        self.model_name = name
+        self.model_path = entry['model_path']
+        self.labels_path = entry['labels_path']
+        self.last_swap_ms = ticks_elapsed(start)
+        print(f"使用模型: {name} 标签: {self.labels} 切换耗时 {self.last_swap_ms} ms")
     
     def get_color(self, class_id):
         """
@@ -100,11 +125,14 @@ class FOMOModel:
 
         # 初始化检测结果列表
         detection_results = [[] for _ in range(oc)]
+        self.last_maps = [None] * oc
+        self.last_geometry = (x_offset, y_offset, scale)
 
         # 遍历每个输出通道（对应不同类别）
         for class_id in range(oc):
             # 将模型输出转换为0-255范围的图像
             confidence_map = image.Image(outputs[0][0, :, :, class_id] * 255)
+            self.last_maps[class_id] = confidence_map
             
             # 在置信度图中查找高置信度区域
             blobs = confidence_map.find_blobs(
@@ -126,6 +154,9 @@ class FOMOModel:
                     roi=rect
                 ).l_mean() / 255.0
 
+                # 置信度加权质心与二阶矩（网格坐标，亚网格精度）
+                gx, gy, sxx, syy, sxy = self._weighted_moments(confidence_map, rect)
+
                 # 将特征图坐标映射回原始图像坐标
                 x = int((x * scale) + x_offset)
                 y = int((y * scale) + y_offset)
@@ -135,6 +166,9 @@ class FOMOModel:
                 # 添加检测结果
                 detection_results[class_id].append({
                     'bbox': (x, y, w, h),
+                    'cx': gx * scale + x_offset,
+                    'cy': gy * scale + y_offset,
+                    'cov': (sxx * scale * scale, syy * scale * scale, sxy * scale * scale),
                     'score': score,
                     'class_id': class_id,
                     'class_name': self.labels[class_id] if class_id < len(self.labels) else f'class_{class_id}'
@@ -142,12 +176,49 @@ class FOMOModel:
 
         return detection_results
     
-    def predict(self, img):
+    def _weighted_moments(self, confidence_map, rect):
+        """
+        区域内高于阈值的网格按置信度加权的质心和二阶中心矩
+        
+        网格(i, j)的中心取(i + 0.5, j + 0.5)，因此质心可以落在网格之间，
+        映射回原图后的精度不再受网格尺寸（原图上几十个像素）限制。
+        
+        Args:
+            confidence_map: 0-255的置信度图
+            rect (tuple): 区域（网格坐标）
+            
+        Returns:
+            tuple: (cx, cy, sxx, syy, sxy)，网格坐标
+        """
+        x0, y0, w, h = rect
+        low = self.threshold_list[0][0]
+        sw = sx = sy = sxx = syy = sxy = 0
+        for j in range(y0, y0 + h):
+            for i in range(x0, x0 + w):
+                v = confidence_map.get_pixel(i, j)
+                if v < low:
+                    continue
+                sw += v
+                sx += v * i
+                sy += v * j
+                sxx += v * i * i
+                syy += v * j * j
+                sxy += v * i * j
+        if not sw:
+            return x0 + w / 2, y0 + h / 2, 0.0, 0.0, 0.0
+        mx = sx / sw
+        my = sy / sw
+        return (mx + 0.5, my + 0.5,
+                sxx / sw - mx * mx, syy / sw - my * my, sxy / sw - mx * my)
+    
+    def predict(self, img, roi=None):
         """
         对输入图像进行预测
         
         Args:
             img: 输入图像
+            roi (tuple): 只对该区域推理 (x, y, w, h)；None为整帧。
+                区域坐标随输入传给post_process，检测框仍为整帧坐标
             
         Returns:
             list: 检测结果列表
@@ -155,8 +226,20 @@ class FOMOModel:
         if self.net is None:
             raise Exception("模型未加载")
         
+        if roi is not None:
+            img = ml.preprocessing.Normalization(roi=roi)(img)
         return self.net.predict([img], callback=self.post_process)
     
+    def input_size(self):
+        """
+        模型输入尺寸
+        
+        Returns:
+            tuple: (width, height)
+        """
+        _, ih, iw, _ = self.net.input_shape[0]
+        return iw, ih
+    
     def draw_detections(self, img, detections, draw_background=False):
         """
         在图像上绘制检测结果
@@ -264,7 +347,7 @@ class FOMOModel:
     
     def get_detection_center(self, detection):
         """
-        获取检测框的中心点坐标
+        获取检测的中心点坐标（有置信度加权质心时使用质心，否则为检测框中心）
         
         Args:
             detection (dict): 检测结果
@@ -272,6 +355,8 @@ class FOMOModel:
         Returns:
             tuple: (center_x, center_y)
         """
+        if 'cx' in detection:
+            return (int(detection['cx'] + 0.5), int(detection['cy'] + 0.5))
         x, y, w, h = detection['bbox']
         return (x + w // 2, y + h // 2)
     
@@ -296,17 +381,21 @@ class FOMOModel:
             return None
         
         return {
+            'model_name': self.model_name,
             'model_path': self.model_path,
             'labels_path': self.labels_path,
             'min_confidence': self.min_confidence,
             'num_classes': len(self.labels) if self.labels else 0,
             'labels': self.labels,
             'input_shape': self.net.input_shape,
-            'output_shape': self.net.output_shape
+            'output_shape': self.net.output_shape,
+            'last_swap_ms': self.last_swap_ms,
+            'peak_alloc': self.registry.peak_alloc
         }
     
     def __del__(self):
-        """析构函数，释放模型资源"""
+        """析构函数，释放模型资源（模型内存由注册表回收）"""
         if self.net:
             del self.net
-            self.net = None
\ No newline at end of file
+            self.net = None
+            self.registry.unpin(self.model_name)
\ No newline at end of file
@@ -0,0 +1,197 @@
+# fomo_tiles.py - 分块高分辨率FOMO推理（重叠分块、按优先级调度、跨块合并）
+
+from utils import ticks_ms, ticks_elapsed
+
+
+def tile_layout(frame_w, frame_h, tile_w, tile_h, overlap):
+    """
+    把画面划分为与模型输入同尺寸、相互重叠的分块，首尾分块贴齐画面边缘
+
+    Returns:
+        list: [(x, y, w, h), ...]
+    """
+    def starts(size, tile):
+        if tile >= size:
+            return [0]
+        n = -(-(size - overlap) // (tile - overlap))   # 向上取整
+        n = max(n, 2)
+        return [round(i * (size - tile) / (n - 1)) for i in range(n)]
+
+    tile_w = min(tile_w, frame_w)
+    tile_h = min(tile_h, frame_h)
+    return [(x, y, tile_w, tile_h) for y in starts(frame_h, tile_h) for x in starts(frame_w, tile_w)]
+
+
+def overlap_area(a, b):
+    w = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    h = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    return w * h if w > 0 and h > 0 else 0
+
+
+def merge_detections(detections, merge_dist):
+    """
+    合并同一类别中中心距离小于merge_dist的检测（分块重叠处的重复检测）
+
+    按置信度从高到低，每个检测并入第一个足够近的已有检测（外接矩形取并集、置信度取最大）
+
+    Returns:
+        list: 合并后的检测
+    """
+    merged = []
+    for det in sorted(detections, key=lambda d: -d['score']):
+        x, y, w, h = det['bbox']
+        cx, cy = x + w / 2, y + h / 2
+        for m in merged:
+            mx, my, mw, mh = m['bbox']
+            if abs(mx + mw / 2 - cx) < merge_dist and abs(my + mh / 2 - cy) < merge_dist:
+                x0 = min(mx, x)
+                y0 = min(my, y)
+                x1 = max(mx + mw, x + w)
+                y1 = max(my + mh, y + h)
+                m['bbox'] = (x0, y0, x1 - x0, y1 - y0)
+                break
+        else:
+            merged.append(dict(det))
+    return merged
+
+
+class GridMap:
+    """整帧置信度网格，接口与置信度图（image.Image）的width()/height()/get_pixel()相同"""
+
+    def __init__(self, cols, rows):
+        self.cols = cols
+        self.rows = rows
+        self.data = bytearray(cols * rows)
+
+    def width(self):
+        return self.cols
+
+    def height(self):
+        return self.rows
+
+    def get_pixel(self, x, y):
+        return self.data[y * self.cols + x]
+
+
+class TiledFOMO:
+    """
+    分块推理
+
+    每个分块按模型原生输入尺寸裁剪推理（不缩放），所有分块共用模型的同一个输入张量。
+    每帧根据上一次测得的单块耗时，只运行预算内能完成的分块：
+      优先级 = 与热点区域的重叠 + 分块内的帧差运动 + 距上次扫描的帧数
+    因此热点/有动静的分块几乎每帧都扫，其余分块轮流扫描，保证全画面都会被覆盖。
+    未扫描分块沿用其上次的结果，最后对全部分块的结果做跨块合并。
+    """
+
+    def __init__(self, model, frame_w, frame_h, overlap=16, budget_ms=150, merge_dist=None, motion=None):
+        """
+        Args:
+            model: FOMOModel实例
+            frame_w, frame_h (int): 画面尺寸
+            overlap (int): 相邻分块重叠像素
+            budget_ms (int): 每帧推理时间预算（ms）
+            merge_dist (int): 跨块合并的中心距离（默认为重叠宽度）
+            motion: motion(roi) -> 区域内帧差能量（如RateGovernor.motion_in），可选
+        """
+        self.model = model
+        self.frame_w = frame_w
+        self.frame_h = frame_h
+        self.overlap = overlap
+        self.budget_ms = budget_ms
+        self.merge_dist = merge_dist if merge_dist is not None else max(8, overlap)
+        self.motion = motion
+        self.hot_zones = []             # 优先扫描的区域（如热力图热点区域），由调用方更新
+        self.scanned = []               # 本帧扫描的分块序号
+        self._layout(model.input_size())
+
+    def _layout(self, tile_size):
+        """按模型输入尺寸重新分块（模型切换后输入尺寸可能不同）"""
+        self.tile_size = tile_size
+        self.tiles = tile_layout(self.frame_w, self.frame_h, tile_size[0], tile_size[1], self.overlap)
+        n = len(self.tiles)
+        self.results = [None] * n       # 每个分块最近一次的检测结果
+        self.maps = [None] * n          # 每个分块最近一次的置信度图和映射关系（model.last_maps/last_geometry）
+        self.geometry = [None] * n
+        self.age = [n] * n              # 距上次扫描的帧数
+        self.tile_ms = 0                # 单块推理耗时（滑动平均）
+
+    def _priority(self, i):
+        tile = self.tiles[i]
+        area = tile[2] * tile[3]
+        p = self.age[i]
+        for zone in self.hot_zones:
+            p += 4 * overlap_area(tile, zone) / area
+        if self.motion:
+            p += self.motion(tile) / 8
+        return p
+
+    def predict(self, img):
+        """
+        分块推理一帧（接口与FOMOModel.predict相同）
+
+        Returns:
+            list: 每个类别的检测结果列表（整帧坐标，已合并）
+        """
+        if self.model.input_size() != self.tile_size:
+            self._layout(self.model.input_size())
+        n = len(self.tiles)
+        if self.tile_ms:
+            count = max(1, min(n, self.budget_ms // self.tile_ms))
+        else:
+            count = n
+        order = sorted(range(n), key=lambda i: -self._priority(i))
+        self.scanned = order[:count]
+
+        start = ticks_ms()
+        for i in self.scanned:
+            self.results[i] = self.model.predict(img, roi=self.tiles[i])
+            self.maps[i] = self.model.last_maps
+            self.geometry[i] = self.model.last_geometry
+        elapsed = ticks_elapsed(start) / count
+        self.tile_ms = int(elapsed if not self.tile_ms else (self.tile_ms * 3 + elapsed) / 4) or 1
+
+        for i in range(n):
+            self.age[i] = 0 if i in self.scanned else self.age[i] + 1
+
+        classes = max(len(r) for r in self.results if r is not None)
+        detections = []
+        for c in range(classes):
+            combined = []
+            for r in self.results:
+                if r is not None and c < len(r):
+                    combined.extend(r[c])
+            detections.append(merge_detections(combined, self.merge_dist))
+        return detections
+
+    def grid_maps(self):
+        """
+        把各分块最近一次的置信度图拼成整帧网格（类别网格帧使用），重叠处取最大值
+
+        分块按模型原生尺寸裁剪，各分块网格尺寸相同；分块原点按网格取整（误差不超过半格）。
+
+        Returns:
+            tuple: (maps, geometry)，格式同FOMOModel.last_maps/last_geometry，没有结果时maps为[]
+        """
+        done = [i for i in range(len(self.tiles)) if self.maps[i]]
+        if not done:
+            return [], (0, 0, 1)
+        scale = self.geometry[done[0]][2]
+        cols = int(-(-self.frame_w // scale))
+        rows = int(-(-self.frame_h // scale))
+        classes = max(len(self.maps[i]) for i in done)
+        maps = [None] + [GridMap(cols, rows) for _ in range(1, classes)]
+        for i in done:
+            ox = int(self.geometry[i][0] / scale + 0.5)
+            oy = int(self.geometry[i][1] / scale + 0.5)
+            for c in range(1, len(self.maps[i])):
+                src = self.maps[i][c]
+                data = maps[c].data
+                w = min(src.width(), cols - ox)
+                for y in range(min(src.height(), rows - oy)):
+                    row = (oy + y) * cols + ox
+                    for x in range(w):
+                        v = src.get_pixel(x, y)
+                        if v > data[row + x]:
+                            data[row + x] = v
+        return maps, (0, 0, scale)
@@ -0,0 +1,134 @@
+# fomo_tracker.py - 跟踪模式：只在当前目标附近的区域上运行FOMO
+
+# 扫描方式
+SCAN_FULL = 0   # 整帧
+SCAN_ROI = 1    # 跟踪区域
+
+
+def track_roi(cx, cy, roi_w, roi_h, frame_w, frame_h):
+    """
+    以(cx, cy)为中心、大小为roi_w×roi_h的区域，超出画面时平移到画面内
+
+    Returns:
+        tuple: (x, y, w, h)
+    """
+    roi_w = min(roi_w, frame_w)
+    roi_h = min(roi_h, frame_h)
+    x = max(0, min(frame_w - roi_w, cx - roi_w // 2))
+    y = max(0, min(frame_h - roi_h, cy - roi_h // 2))
+    return (x, y, roi_w, roi_h)
+
+
+class FOMOTracker:
+    """
+    FOMO跟踪推理
+
+    跟踪开启且有目标时，只在以目标为中心、与模型输入同尺寸的区域上推理，
+    不需要缩放，小目标的分辨率与整帧推理相比提高 画面/输入 倍。
+    区域坐标通过预处理对象传给FOMOModel.post_process，检测框仍为整帧坐标。
+
+    每隔full_scan_interval帧、或区域内丢失目标后的下一帧，回到整帧扫描重新找目标。
+    跟踪以外的类别沿用最近一次整帧扫描的结果。
+    """
+
+    def __init__(self, model, frame_w, frame_h, class_id, full_scan_interval=10, max_jump=None,
+                 scanner=None):
+        """
+        Args:
+            model: FOMOModel实例
+            frame_w, frame_h (int): 画面尺寸
+            class_id (int): 跟踪的类别
+            full_scan_interval (int): 跟踪时每隔多少帧做一次整帧扫描（K）
+            max_jump (int): 整帧扫描时与原目标距离超过该值视为新目标（默认为区域宽度的一半）
+            scanner: 整帧扫描使用的对象（如fomo_tiles.TiledFOMO），默认为model
+        """
+        self.model = model
+        self.scanner = scanner or model
+        self.frame_w = frame_w
+        self.frame_h = frame_h
+        self.class_id = class_id
+        self.full_scan_interval = full_scan_interval
+        self.max_jump = max_jump if max_jump is not None else model.input_size()[0] // 2
+
+        self.enabled = False
+        self.center = None          # 当前跟踪目标中心（整帧坐标）
+        self.roi = None
+        self.frames_since_full = 0
+        self.last_full = None       # 最近一次整帧扫描的结果
+        self.scan = SCAN_FULL
+        self.lost_count = 0
+
+    def set_enabled(self, enabled):
+        """开启/关闭跟踪（如喷淋对准期间开启）"""
+        if enabled != self.enabled:
+            self.enabled = enabled
+            if not enabled:
+                self.center = None
+
+    def predict(self, img):
+        """
+        推理一帧（接口与FOMOModel.predict相同）
+
+        Returns:
+            list: 每个类别的检测结果列表
+        """
+        use_roi = (self.enabled and self.center is not None
+                   and self.frames_since_full < self.full_scan_interval)
+
+        if not use_roi:
+            detections = self.scanner.predict(img)
+            self.last_full = detections
+            self.frames_since_full = 0
+            self.scan = SCAN_FULL
+            self._update_track(detections[self.class_id] if self.class_id < len(detections) else [])
+            return detections
+
+        # 区域大小取当前模型的输入尺寸（模型可在运行时切换）
+        roi_w, roi_h = self.model.input_size()
+        self.roi = track_roi(self.center[0], self.center[1], roi_w, roi_h,
+                             self.frame_w, self.frame_h)
+        detections = self.model.predict(img, roi=self.roi)
+        self.frames_since_full += 1
+        self.scan = SCAN_ROI
+        tracked = detections[self.class_id] if self.class_id < len(detections) else []
+        self._update_track(tracked)
+
+        # 其他类别用最近一次整帧结果
+        if self.last_full:
+            for c in range(len(detections)):
+                if c != self.class_id and c < len(self.last_full):
+                    detections[c] = self.last_full[c]
+        return detections
+
+    def _update_track(self, detections):
+        """用本次检测更新目标中心：优先选离原目标最近的检测"""
+        if not detections:
+            if self.center is not None:
+                self.lost_count += 1
+            self.center = None   # 丢失目标，下一帧整帧扫描
+            return
+
+        best = None
+        best_d = None
+        for det in detections:
+            x, y, w, h = det['bbox']
+            cx, cy = x + w // 2, y + h // 2
+            if self.center is None:
+                d = -det['score']   # 没有原目标时取置信度最高的
+            else:
+                d = abs(cx - self.center[0]) + abs(cy - self.center[1])
+            if best_d is None or d < best_d:
+                best_d = d
+                best = (cx, cy)
+
+        if self.center is not None and best_d > self.max_jump and self.scan == SCAN_ROI:
+            # 区域内只有远离原目标的检测，视为丢失
+            self.lost_count += 1
+            self.center = None
+            return
+        self.center = best
+
+    def get_status_text(self):
+        if self.scan == SCAN_ROI:
+            return f"ROI {self.roi[0]},{self.roi[1]}"
+        return "FULL"
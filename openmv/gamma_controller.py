@@ -0,0 +1,239 @@
+# gamma_controller.py - Gamma/对比度/亮度按键调节（中断驱动按键输入）
+
+import time
+import pyb
+from button_input import ButtonInput, EV_PRESS, EV_REPEAT, EV_CHORD
+
+# 按键引脚（序号与handle_button_press一致）
+# 中断线：P7=PD12(12) P8=PD13(13) P9=PD14(14) P4=PB10(10) P3=PB12(12) P5=PB11(11)
+# P3与P7共用中断线12，P3由ButtonInput轮询
+BUTTON_PINS = ('P7', 'P8', 'P9', 'P4', 'P3', 'P5')
+
+# 组合键
+CHORD_RESET = (1 << 0) | (1 << 1)    # P7+P8: 重置参数
+CHORD_PRESET = (1 << 2) | (1 << 3)   # P9+P4: 切换预设
+CHORD_SAVE = (1 << 4) | (1 << 5)     # P3+P5: 保存当前参数
+CHORD_AUTO = (1 << 0) | (1 << 2)     # P7+P9: 开关自动调节
+
+# LED反馈（位掩码对应pyb.LED(1/2/3)：红/绿/蓝）
+LED_GAMMA = 1 << 0
+LED_CONTRAST = 1 << 1
+LED_BRIGHTNESS = 1 << 2
+LED_ALL = LED_GAMMA | LED_CONTRAST | LED_BRIGHTNESS
+BLINK_MS = 50           # 调节参数时闪烁时间（ms）
+RESET_BLINK_MS = 200    # 重置参数时全部LED闪烁时间（ms）
+
+
+class GammaController:
+    def __init__(self, config=None):
+        """
+        Args:
+            config: config_store.ConfigStore，用于保存/恢复参数（可选）
+        """
+        # 按键：ExtInt中断 + 事件队列，主循环无事件时不读取引脚
+        self.buttons = ButtonInput(BUTTON_PINS, chords=(CHORD_RESET, CHORD_PRESET, CHORD_SAVE, CHORD_AUTO))
+        self.config = config
+
+        # LED反馈：点亮后由check_buttons()到时熄灭，不阻塞主循环
+        try:
+            self.leds = (pyb.LED(1), pyb.LED(2), pyb.LED(3))
+        except Exception:
+            self.leds = ()
+        self.leds_lit = 0
+        self.leds_off_at = 0
+
+        # 初始参数值
+        self.gamma = 1.0        # 范围: 0.1 - 3.0
+        self.contrast = 1.0     # 范围: 0.1 - 3.0
+        self.brightness = 0.0   # 范围: -1.0 - 1.0
+
+        # 调整步长
+        self.gamma_step = 0.1
+        self.contrast_step = 0.1
+        self.brightness_step = 0.1
+
+        # 参数范围限制
+        self.gamma_range = (0.1, 3.0)
+        self.contrast_range = (0.1, 3.0)
+        self.brightness_range = (-1.0, 1.0)
+
+        # 预设参数组合
+        self.presets = [
+            {"name": "默认", "gamma": 1.0, "contrast": 1.0, "brightness": 0.0},
+            {"name": "提亮", "gamma": 0.7, "contrast": 1.2, "brightness": 0.2},
+            {"name": "增强", "gamma": 0.8, "contrast": 1.5, "brightness": 0.1},
+            {"name": "柔和", "gamma": 1.2, "contrast": 0.8, "brightness": 0.1},
+            {"name": "高对比", "gamma": 0.9, "contrast": 2.0, "brightness": 0.0},
+            {"name": "低光", "gamma": 0.6, "contrast": 1.3, "brightness": 0.3}
+        ]
+        self.preset_index = 0
+
+        # 自动调节（由auto_exposure.AutoExposure写入参数），手动调节时自动关闭
+        self.auto = True
+
+        if config:
+            self.load_saved_params()
+            config.add_listener(self._on_config_change)
+
+        print("Gamma校正控制系统启动")
+        self.print_current_params()
+
+    def print_controls(self):
+        print("\n=== 按键控制 ===")
+        print("P7: Gamma +     P8: Gamma -")
+        print("P9: Contrast +  P4: Contrast -")
+        print("P3: Brightness+ P5: Brightness-")
+        print("长按: 连续调节")
+        print("P7+P8: 重置     P9+P4: 预设")
+        print("P3+P5: 保存     P7+P9: 开关自动调节")
+        print("(P3与P7共用中断线，P3为轮询)")
+        print("================\n")
+
+    def print_current_params(self):
+        print(f"参数: G={self.gamma:.1f}, C={self.contrast:.1f}, B={self.brightness:.1f}")
+
+    def clamp_value(self, value, min_val, max_val):
+        return max(min_val, min(max_val, value))
+
+    def blink_led(self, mask, ms=BLINK_MS):
+        """点亮mask中的LED，ms毫秒后在check_buttons()中熄灭"""
+        for i, led in enumerate(self.leds):
+            if mask & (1 << i):
+                led.on()
+        self.leds_lit |= mask
+        self.leds_off_at = time.ticks_add(time.ticks_ms(), ms)
+
+    def _update_leds(self):
+        if self.leds_lit and time.ticks_diff(time.ticks_ms(), self.leds_off_at) >= 0:
+            for i, led in enumerate(self.leds):
+                if self.leds_lit & (1 << i):
+                    led.off()
+            self.leds_lit = 0
+
+    def update_gamma(self, delta):
+        self.gamma = self.clamp_value(self.gamma + delta, *self.gamma_range)
+        print(f"Gamma: {self.gamma:.1f}")
+        self.blink_led(LED_GAMMA)
+
+    def update_contrast(self, delta):
+        self.contrast = self.clamp_value(self.contrast + delta, *self.contrast_range)
+        print(f"Contrast: {self.contrast:.1f}")
+        self.blink_led(LED_CONTRAST)
+
+    def update_brightness(self, delta):
+        self.brightness = self.clamp_value(self.brightness + delta, *self.brightness_range)
+        print(f"Brightness: {self.brightness:.1f}")
+        self.blink_led(LED_BRIGHTNESS)
+
+    def reset_params(self):
+        self.gamma = 1.0
+        self.contrast = 1.0
+        self.brightness = 0.0
+        print("参数已重置")
+        self.print_current_params()
+        self.blink_led(LED_ALL, RESET_BLINK_MS)
+
+    def load_preset(self):
+        preset = self.presets[self.preset_index]
+        self.gamma = preset["gamma"]
+        self.contrast = preset["contrast"]
+        self.brightness = preset["brightness"]
+        print(f"预设: {preset['name']}")
+        self.print_current_params()
+
+        # 循环到下一个预设
+        self.preset_index = (self.preset_index + 1) % len(self.presets)
+
+    def apply_preset(self, name):
+        """按名称套用预设（场景切换时调用，不改变按键循环的位置）"""
+        for preset in self.presets:
+            if preset["name"] == name:
+                self.gamma = preset["gamma"]
+                self.contrast = preset["contrast"]
+                self.brightness = preset["brightness"]
+                print(f"预设: {name}")
+                return True
+        return False
+
+    def load_saved_params(self):
+        """从配置存储恢复参数"""
+        self.gamma = self.config.get("gamma")
+        self.contrast = self.config.get("contrast")
+        self.brightness = self.config.get("brightness")
+        self.auto = self.config.get("auto_exposure")
+
+    def save_params(self):
+        """把当前参数写入配置存储并保存到flash"""
+        if not self.config:
+            print("未配置参数存储，无法保存")
+            return
+        self.config.set("gamma", round(self.gamma, 2))
+        self.config.set("contrast", round(self.contrast, 2))
+        self.config.set("brightness", round(self.brightness, 2))
+        self.config.set("auto_exposure", self.auto)
+        self.config.save()
+        print("参数已保存")
+        self.print_current_params()
+
+    def _on_config_change(self, name, value):
+        # 串口命令修改参数时同步（save_params写回自身的值时结果相同）
+        if name == "gamma":
+            self.gamma = value
+        elif name == "contrast":
+            self.contrast = value
+        elif name == "brightness":
+            self.brightness = value
+        elif name == "auto_exposure":
+            self.auto = value
+
+    def check_buttons(self):
+        """处理按键事件（每帧调用，没有待处理事件时立即返回）"""
+        self._update_leds()
+        self.buttons.poll(self._on_button)
+
+    def _on_button(self, event, value):
+        if event == EV_CHORD:
+            if value == CHORD_RESET:
+                self.reset_params()
+            elif value == CHORD_PRESET:
+                self.auto = False
+                self.load_preset()
+            elif value == CHORD_SAVE:
+                self.save_params()
+            elif value == CHORD_AUTO:
+                self.auto = not self.auto
+                print(f"自动调节: {'开' if self.auto else '关'}")
+        elif event == EV_PRESS or event == EV_REPEAT:
+            if self.auto:
+                self.auto = False
+                print("手动调节，自动调节已关闭")
+            self.handle_button_press(value)
+
+    def handle_button_press(self, button_index):
+        if button_index == 0:      # P7: Gamma +
+            self.update_gamma(self.gamma_step)
+        elif button_index == 1:    # P8: Gamma -
+            self.update_gamma(-self.gamma_step)
+        elif button_index == 2:    # P9: Contrast +
+            self.update_contrast(self.contrast_step)
+        elif button_index == 3:    # P4: Contrast -
+            self.update_contrast(-self.contrast_step)
+        elif button_index == 4:    # P3: Brightness +（轮询）
+            self.update_brightness(self.brightness_step)
+        elif button_index == 5:    # P5: Brightness -
+            self.update_brightness(-self.brightness_step)
+
+    def apply_gamma_correction(self, img):
+        try:
+            return img.gamma_corr(
+                gamma=self.gamma,
+                contrast=self.contrast,
+                brightness=self.brightness
+            )
+        except Exception as e:
+            print(f"Gamma校正错误: {e}")
+            return img
+
+    def get_status_text(self):
+        mode = "A" if self.auto else "M"
+        return f"{mode} G:{self.gamma:.2f} C:{self.contrast:.2f} B:{self.brightness:.1f}"
@@ -0,0 +1,91 @@
+# latency_trace.py - 每帧各处理阶段的时间戳（拍照 -> 发送），用于端到端延迟分析
+
+from array import array
+from my_uart import set_trace_tag
+from utils import ticks_ms, ticks_elapsed
+
+# 阶段（相对拍照时间的毫秒数）
+ST_CAPTURE = 0      # sensor.snapshot()返回
+ST_PREPROCESS = 1   # Gamma/曝光预处理完成
+ST_INFER = 2        # FOMO推理完成
+ST_POST = 3         # 检测结果处理完成（颜色细化、目标中心）
+ST_SEND = 4         # 目标帧（类型1）发送完成
+STAGES = ("capture", "preprocess", "infer", "post", "send")
+
+HISTORY = 64        # 内存中保留的帧数
+
+# 串口终端输出（每帧一行，由tools/latency_trace.py与单片机日志对照）：
+#   TRACE,帧号,拍照时间(ticks_ms),capture,preprocess,infer,post,send
+# 拍照时间为调用sensor.snapshot()的时间，阶段为相对拍照时间的毫秒数，没有经过的阶段为-1。
+
+
+class LatencyTracer:
+    """
+    每帧阶段时间记录
+
+    begin()在拍照前调用，同时设置串口帧附加的帧号和拍照时间；mark()记录各阶段完成时间；
+    end()把本帧的记录写入环形缓冲并输出一行TRACE。关闭时各方法直接返回。
+    """
+
+    def __init__(self, enabled=False, history=HISTORY):
+        self.history = history
+        self.frame_ids = array('H', [0] * history)
+        self.starts = array('I', [0] * history)
+        self.marks = array('h', [-1] * (history * len(STAGES)))
+        self.index = 0
+        self.count = 0
+        self.frame_id = 0
+        self.start = 0
+        self.enabled = False
+        self.set_enabled(enabled)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        if not enabled:
+            set_trace_tag(None, 0)
+
+    def begin(self, frame_id):
+        """拍照前调用"""
+        if not self.enabled:
+            return
+        self.frame_id = frame_id
+        self.start = ticks_ms()
+        base = self.index * len(STAGES)
+        for i in range(len(STAGES)):
+            self.marks[base + i] = -1
+        set_trace_tag(frame_id, self.start & 0xffff)
+
+    def mark(self, stage):
+        """记录阶段完成时间"""
+        if self.enabled:
+            self.marks[self.index * len(STAGES) + stage] = min(32767, ticks_elapsed(self.start))
+
+    def end(self):
+        """本帧结束：保存记录并输出TRACE行"""
+        if not self.enabled:
+            return
+        i = self.index
+        self.frame_ids[i] = self.frame_id
+        self.starts[i] = self.start
+        base = i * len(STAGES)
+        print("TRACE,%d,%d,%s" % (self.frame_id, self.start,
+                                  ",".join(str(self.marks[base + k]) for k in range(len(STAGES)))))
+        self.index = (i + 1) % self.history
+        self.count = min(self.count + 1, self.history)
+
+    def stage_means(self):
+        """最近HISTORY帧各阶段的平均时间（ms），没有数据的阶段为-1"""
+        means = []
+        for k in range(len(STAGES)):
+            total = n = 0
+            for i in range(self.count):
+                v = self.marks[i * len(STAGES) + k]
+                if v >= 0:
+                    total += v
+                    n += 1
+            means.append(total // n if n else -1)
+        return means
+
+    def get_status_text(self):
+        means = self.stage_means()
+        return "Lat " + "/".join(str(v) for v in means[1:])
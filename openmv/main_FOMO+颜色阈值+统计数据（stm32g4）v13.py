@@ -1,54 +1,82 @@
 # main.py - 使用模块化FOMO模型的主程序
 
-import sensor, image, time, math, pyb, camera_setup, display
+import sensor, image, time, pyb, camera_setup, display
 from my_uart import send_custom_packet
-from utils import set_time, get_time_str, get_unix_timestamp
+from utils import set_time, get_time_str, get_unix_timestamp, ticks_ms, ticks_elapsed, MinuteTicker
+from rolling_stats import RollingStats, ROLL_NONE, ROLL_DAY, HOURS, date_code
+from command_channel import (CommandChannel, CommandError, u32_bytes,
+                             CMD_STATS_HOUR, CMD_STATS_DAY, CMD_STATS_CURVE, CMD_RATE_STATUS,
+                             CMD_MODEL_INFO, CMD_MODEL_SELECT)
+from config_store import ConfigStore
 from gamma_controller import GammaController
+from auto_exposure import AutoExposure
 from fomo_model import FOMOModel  # 导入模块化的FOMO模型
+from model_registry import ModelRegistry
+from fomo_tracker import FOMOTracker, SCAN_ROI
+from fomo_tiles import TiledFOMO
+from feces_refine import FecesRefiner
+from feces_heatmap import FecesHeatmap
+from event_log import (EventLog, EV_BOOT, EV_DETECT_START, EV_DETECT_END, EV_ALARM, EV_UART_FAIL,
+                       EV_DAILY_RESET, EV_RATE_TIER, EV_SCENE, EV_LINK, EV_SNAPSHOT)
+from rate_governor import RateGovernor
+from scene_condition import DayNightScheduler
+from class_grid import ClassGridEncoder, FRAME_CLASS_GRID
+from uart_link import LinkManager
+from snapshot import SnapshotSender, SNAP_ALARM
+from latency_trace import LatencyTracer, ST_CAPTURE, ST_PREPROCESS, ST_INFER, ST_POST, ST_SEND
 
 # 常量定义
 TARGET_W = 128
 TARGET_H = 160
-DETECTION_TIMEOUT = 1000  # 检测超时时间（ms）
-ALARM_THRESHOLD = 10000   # 声光报警阈值（ms）
-FAIL_SEND_LIMIT = 25      # 串口发送失败次数限制
-STAT_INTERVAL = 5000      # 统计数据打印间隔（ms）
-DAILY_REPORT_HOUR = 13    # 每日报告时间（小时）
-MIN_CONFIDENCE = 0.8      # 最小置信度阈值
+HEATMAP_SAVE_INTERVAL = 60000  # 热力图写入flash间隔（ms）
 
 # 类别ID定义
 CLASS_BACKGROUND = 0
 CLASS_PIG = 1
 CLASS_FECES = 2
 
-# 颜色检测阈值（屎黄色）
-FECES_COLOR_THRESHOLD = (18, 61, -21, 15, 31, 63)
+# 置信度、颜色阈值、参考点、各时间参数保存在flash的config.json中（默认值见config_store.CONFIG_SCHEMA）
 
 class AnimalMonitoringSystem:
     """动物监控系统主类"""
 
     def __init__(self):
+        # 参数存储（启动时一次读取，串口命令可在线修改）
+        self.config = ConfigStore()
+        self.cfg = self.config.values
+
         # 初始化显示和控制器
         self.lcd = display.SPIDisplay()
-        self.gamma_ctrl = GammaController()
+        self.gamma_ctrl = GammaController(self.config)
         self.gamma_ctrl.print_controls()
+        self.auto_exposure = AutoExposure(self.gamma_ctrl, sensor.width(), sensor.height())
+
+        # 模型注册表：flash上的全部.tflite模型，首次使用时加载，可通过串口命令切换
+        self.models = ModelRegistry()
+        print("可用模型:", self.models.scan())
 
         # 初始化FOMO模型
         self.fomo_model = FOMOModel(
-            model_path="trained.tflite",
-            labels_path="labels.txt",
-            min_confidence=MIN_CONFIDENCE
+            registry=self.models,
+            model_name="trained",
+            min_confidence=self.cfg['min_confidence']
         )
 
+        # 跟踪模式：检测持续期间只在粪便目标附近推理，定期整帧扫描
+        self.tracker = FOMOTracker(self.fomo_model, sensor.width(), sensor.height(), CLASS_FECES)
+
+        # 粪便颜色细化（合并重叠的辅助检测区域）
+        self.feces_refiner = FecesRefiner(self.cfg['feces_color_threshold'])
+
+        # 事件日志
+        self.event_log = EventLog()
+        self.event_log.log(EV_BOOT)
+
         # 计算缩放参数
         self.scale_x = TARGET_W / 320
         self.scale_y = TARGET_H / 240
         self.scale_ratio = min(self.scale_x, self.scale_y)
 
-        # 参考点
-        self.x_under = 141
-        self.y_under = 215
-
         # 初始化时间和RTC
         self.rtc = pyb.RTC()
         set_time(2025, 6, 30, 13, 12, 0)
@@ -61,13 +89,55 @@ class AnimalMonitoringSystem:
         self.error_led = False
 
         # 统计变量
-        self.last_stat_time = pyb.millis()
-        self.last_day = self.rtc.datetime()[2]
-        self.daily_report_sent = False
+        self.last_stat_time = ticks_ms()
         self.fail_send_count = 0
 
-        # 初始化每日统计
-        self.reset_daily_stats()
+        # 滚动统计（24个小时桶 + 7天汇总，字段见daily_stats.STATS_SCHEMA）
+        # 小时/天的切换只在RTC分钟变化时检查
+        self.stats = RollingStats(self.rtc.datetime())
+        self.minute_ticker = MinuteTicker()
+
+        # 粪便位置热力图（从flash恢复当天数据，文件头日期不是当天时丢弃）
+        self.heatmap = FecesHeatmap(sensor.width(), sensor.height(), date_code(self.rtc.datetime()))
+        self.last_heatmap_save = ticks_ms()
+
+        # 帧率调节：空栏1Hz、有动静5Hz、检测中全速
+        self.governor = RateGovernor(sensor.width(), sensor.height(), minute_ticker=self.minute_ticker)
+
+        # 分块推理：整帧扫描按模型原生尺寸分块，优先扫描热点区域和有动静的分块
+        self.tiler = TiledFOMO(self.fomo_model, sensor.width(), sensor.height(),
+                               budget_ms=self.cfg['tile_budget_ms'], motion=self.governor.motion_in)
+        self.tiler.hot_zones = self.heatmap.hot_zones()
+        self._update_scanner()
+
+        # 类别网格帧：把FOMO网格直接发给单片机，由单片机做目标选择
+        self.frame_id = 0
+        self.grid_encoder = None
+        self._update_grid_encoder(self.cfg['grid_bits'])
+
+        # 延迟追踪：记录每帧各阶段时间，串口帧附加帧号和拍照时间
+        self.tracer = LatencyTracer(self.cfg['latency_trace'])
+
+        # 白天/夜间：按原始画面亮度切换模型（trained/night）和预处理，接近阈值时预加载
+        self.scene = DayNightScheduler(self.fomo_model, self.gamma_ctrl, self.auto_exposure)
+
+        # 串口命令通道（统计查询）
+        self.commands = CommandChannel()
+        self.commands.register(CMD_STATS_HOUR, self._cmd_stats_hour)
+        self.commands.register(CMD_STATS_DAY, self._cmd_stats_day)
+        self.commands.register(CMD_STATS_CURVE, self._cmd_stats_curve)
+        self.config.register_commands(self.commands)
+        self.commands.register(CMD_RATE_STATUS, self._cmd_rate_status)
+        self.commands.register(CMD_MODEL_INFO, self._cmd_model_info)
+        self.commands.register(CMD_MODEL_SELECT, self._cmd_model_select)
+        self.config.add_listener(self._on_config_change)
+
+        # 串口链路：与单片机协商更高的波特率，错误率过高时回退到115200
+        self.link = LinkManager(self.commands, self.cfg['uart_baud'])
+
+        # 事件快照：报警（或单片机请求）时发送目标附近的JPEG小图，低优先级分块发送
+        self.snapshots = SnapshotSender(self.cfg['snapshot_rate'], self.cfg['snapshot_quality'])
+        self.snapshots.register_commands(self.commands)
 
         # 初始化帧率计时器
         self.clock = time.clock()
@@ -75,146 +145,175 @@ class AnimalMonitoringSystem:
         # 发送初始参数
         self._send_initial_params()
 
-    def reset_daily_stats(self):
-        """重置每日统计数据"""
-        self.daily_frame_count = 0
-        self.daily_target_count = 0
-        self.daily_red_detect_count = 0
-        self.daily_uart_send_count = 0
-        self.daily_fail_count = 0
-        self.daily_blob_count = 0
-        self.daily_largest_blob_pixels = 0
-        self.daily_total_blob_pixels = 0
-        self.daily_label_1_detects = 0
-        self.daily_label_2_detects = 0
-
     def _send_initial_params(self):
         """发送初始参数到串口"""
         img = sensor.snapshot().lens_corr(1.8)
         send_custom_packet(0, [
             (img.width() >> 8) & 0xff, img.width() & 0xff,
             (img.height() >> 8) & 0xff, img.height() & 0xff,
-            (self.x_under >> 8) & 0xff, self.x_under & 0xff,
-            (self.y_under >> 8) & 0xff, self.y_under & 0xff
+            (self.cfg['ref_x'] >> 8) & 0xff, self.cfg['ref_x'] & 0xff,
+            (self.cfg['ref_y'] >> 8) & 0xff, self.cfg['ref_y'] & 0xff
         ])
-        self.daily_uart_send_count += 1
-
-    def process_feces_detection(self, img, detection):
+        self.stats.update('uart_send_count')
+
+    def _on_config_change(self, name, value):
+        """串口命令修改参数后立即生效"""
+        print(f"参数修改: {name} = {value}")
+        if name == 'min_confidence':
+            self.fomo_model.set_confidence_threshold(value)
+        elif name == 'feces_color_threshold':
+            self.feces_refiner.color_threshold = value
+        elif name == 'ref_x' or name == 'ref_y':
+            self._send_initial_params()
+        elif name == 'tiled_inference':
+            self._update_scanner()
+        elif name == 'tile_budget_ms':
+            self.tiler.budget_ms = value
+        elif name == 'grid_bits':
+            self._update_grid_encoder(value)
+        elif name == 'uart_baud':
+            self.link.set_target(value)
+        elif name == 'snapshot_rate':
+            self.snapshots.rate = value
+        elif name == 'snapshot_quality':
+            self.snapshots.quality = value
+        elif name == 'latency_trace':
+            self.tracer.set_enabled(value)
+
+    def _update_grid_encoder(self, bits):
+        """grid_bits为0时关闭类别网格帧"""
+        try:
+            self.grid_encoder = ClassGridEncoder(bits) if bits else None
+        except Exception as e:
+            print(f"类别网格帧参数错误: {e}")
+            self.grid_encoder = None
+
+    def _send_class_grid(self):
+        """发送本帧的类别网格（分块推理时拼成整帧网格，跟踪模式时只有跟踪区域并带标志）"""
+        roi = self.tracker.scan == SCAN_ROI
+        if not roi and self.cfg['tiled_inference']:
+            maps, geometry = self.tiler.grid_maps()
+        else:
+            maps, geometry = self.fomo_model.last_maps, self.fomo_model.last_geometry
+        payload = self.grid_encoder.encode(maps, geometry, self.fomo_model.threshold_list[0][0],
+                                           self.frame_id, roi)
+        if payload:
+            send_custom_packet(FRAME_CLASS_GRID, payload)
+            self.stats.update('uart_send_count')
+
+    def _update_scanner(self):
+        """按参数选择整帧扫描方式（整帧缩放推理/分块推理）"""
+        self.tracker.scanner = self.tiler if self.cfg['tiled_inference'] else self.fomo_model
+
+    def process_feces_detections(self, img, detections):
         """
-        处理粪便检测的辅助色块检测
+        处理一帧内所有粪便检测的辅助色块检测
+
+        各检测的3倍辅助区域先合并，每个合并区域只查找一次色块
 
         Args:
             img: 输入图像
-            detection: FOMO检测结果
+            detections: FOMO粪便检测结果列表
 
         Returns:
             tuple: (target_blob, max_pixels)
         """
-        x, y, w, h = detection['bbox']
-
-        # 计算辅助色块检测区域
-        color_x = max(0, math.ceil(x - w))
-        color_y = max(0, math.ceil(y - h))
-        color_w = min(img.width() - color_x, 3 * w)
-        color_h = min(img.height() - color_y, 3 * h)
-        color_roi = (color_x, color_y, color_w, color_h)
+        blobs, matches, regions = self.feces_refiner.refine(img, detections)
 
-        # 绘制检测区域
-        img.draw_rectangle(color_roi, color=(0, 0, 255))  # 蓝色
+        # 绘制实际扫描的区域
+        for region in regions:
+            img.draw_rectangle(region, color=(0, 0, 255))  # 蓝色
 
-        # 在检测区域内查找红色色块
-        blobs = img.find_blobs([FECES_COLOR_THRESHOLD], roi=color_roi, merge=True)
+        self.stats.update('naive_scan_pixels', self.feces_refiner.naive_scan_pixels)
+        self.stats.update('merged_scan_pixels', self.feces_refiner.merged_scan_pixels)
 
         target_blob = None
         max_pixels = 0
 
-        if blobs:
-            for blob in blobs:
-                self.daily_blob_count += 1
-                self.daily_total_blob_pixels += blob.pixels()
-
-                # 找到最大的色块
-                if blob.pixels() > max_pixels:
-                    max_pixels = blob.pixels()
-                    target_blob = blob
+        for blob in blobs:
+            self.stats.update('blob_count')
+            self.stats.update('total_blob_pixels', blob.pixels())
 
-                    # 绘制目标色块
-                    img.draw_rectangle(target_blob.rect(), color=(255, 0, 0))
+            # 找到最大的色块
+            if blob.pixels() > max_pixels:
+                max_pixels = blob.pixels()
+                target_blob = blob
 
-                    # 更新检测时间
-                    self._update_detection_time()
+        if target_blob:
+            # 绘制目标色块并更新检测时间
+            img.draw_rectangle(target_blob.rect(), color=(255, 0, 0))
+            self._update_detection_time()
 
         return target_blob, max_pixels
 
     def _update_detection_time(self):
         """更新检测时间状态"""
-        now = pyb.millis()
+        now = ticks_ms()
         if not self.detection_active:
             self.detection_start_time = now
             self.detection_active = True
             print("[开始检测] 时间戳(ms):", self.detection_start_time)
+            self.event_log.log(EV_DETECT_START)
         self.last_detection_time = now
 
     def _check_detection_timeout(self):
         """检查检测超时"""
         if self.detection_active:
-            now = pyb.millis()
-            if now - self.last_detection_time > DETECTION_TIMEOUT:
+            if ticks_elapsed(self.last_detection_time) > self.cfg['detection_timeout']:
                 self.detection_active = False
-                self.last_detection_duration = self.last_detection_time - self.detection_start_time
+                self.last_detection_duration = ticks_elapsed(self.detection_start_time, self.last_detection_time)
                 print("[检测结束] 持续时间(ms):", self.last_detection_duration)
+                self.event_log.log(EV_DETECT_END, self.last_detection_duration)
                 return True
         return False
 
     def _update_alarm_status(self):
         """更新声光报警状态"""
         if self.detection_active:
-            current_duration = pyb.millis() - self.detection_start_time
-            if current_duration >= ALARM_THRESHOLD:
+            current_duration = ticks_elapsed(self.detection_start_time)
+            if current_duration >= self.cfg['alarm_threshold']:
+                if not self.error_led:
+                    self.event_log.log(EV_ALARM, current_duration)
+                    self.snapshots.request(SNAP_ALARM)
                 self.error_led = True
-                print("检测持续时间超过10秒，触发声光报警！")
+                print("检测持续时间超过报警阈值，触发声光报警！")
                 return current_duration
         elif not self.detection_active:
             self.error_led = False
         return 0
 
-    def _send_detection_data(self, target_blob):
+    def _send_detection_data(self, target_center):
         """发送检测数据到串口"""
-        if target_blob and not self.error_led:
-            center_x, center_y = self.fomo_model.get_detection_center({
-                'bbox': (target_blob.cx() - target_blob.w()//2,
-                        target_blob.cy() - target_blob.h()//2,
-                        target_blob.w(), target_blob.h())
-            })
-
-            # 实际上直接使用blob的中心点
-            center_x, center_y = target_blob.cx(), target_blob.cy()
+        if target_center and not self.error_led:
+            center_x, center_y = target_center
 
             send_custom_packet(1, [
                 1,
                 (center_x >> 8) & 0xFF, center_x & 0xFF,
                 (center_y >> 8) & 0xFF, center_y & 0xFF
             ])
-            self.daily_uart_send_count += 1
+            self.stats.update('uart_send_count')
             print(f"发送检测中心点: cx={center_x}, cy={center_y}")
 
     def _handle_no_detection(self):
         """处理未检测到目标的情况"""
-        if self.fail_send_count < FAIL_SEND_LIMIT:
+        if self.fail_send_count < self.cfg['fail_send_limit']:
             self.fail_send_count += 1
             send_custom_packet(1, [0])
-            self.daily_uart_send_count += 1
-            self.daily_fail_count += 1
+            self.stats.update('uart_send_count')
+            self.stats.update('fail_count')
             print(f"未检测到目标，发送0 (第{self.fail_send_count}次)")
+            if self.fail_send_count == self.cfg['fail_send_limit']:
+                self.event_log.log(EV_UART_FAIL, self.fail_send_count)
         else:
             print(f"未检测到目标，已达到发送上限 ({self.fail_send_count})")
 
     def _send_realtime_stats(self, pig_count, feces_count):
         """发送实时统计数据"""
-        if pyb.millis() - self.last_stat_time >= STAT_INTERVAL:
+        if ticks_elapsed(self.last_stat_time) >= self.cfg['stat_interval']:
             print("===== 实时监控数据 =======================================")
             print("日期:", self.rtc.datetime())
-            print("串口发送次数:", self.daily_uart_send_count)
+            print("今日串口发送次数:", self.stats.day_stats(0)[1].get('uart_send_count'))
             print("粪便数目:", feces_count)
             print("猪的数目:", pig_count)
             print(f"声光报警: {self.error_led}")
@@ -226,50 +325,107 @@ class AnimalMonitoringSystem:
                 (pig_count >> 8) & 0xff, pig_count & 0xff,
                 1 if self.error_led else 0
             ])
-            self.daily_uart_send_count += 1
-            self.last_stat_time = pyb.millis()
-
-    def _check_daily_report(self):
-        """检查并发送每日报告"""
-        current_time = self.rtc.datetime()
-        hour = current_time[4]
-        current_day = current_time[2]
-
-        # 每日13点报告
-        if hour == DAILY_REPORT_HOUR and not self.daily_report_sent:
-            print("=== [每日13:00统计报告] =====================================")
-            print("帧数:", self.daily_frame_count)
-            print("FOMO目标次数:", self.daily_target_count)
-            print("红色检测成功数:", self.daily_red_detect_count)
-            print("红色检测失败数:", self.daily_fail_count)
-            print("串口发送次数:", self.daily_uart_send_count)
-            print("色块总数:", self.daily_blob_count)
-            print("最大红色块像素数:", self.daily_largest_blob_pixels)
-            print("累计红色像素数:", self.daily_total_blob_pixels)
-            print("=========================================================")
-            self.daily_report_sent = True
-
-        # 0点重置报告状态并发送每日统计
-        if hour == 0:
-            self.daily_report_sent = False
-            send_custom_packet(3, [
-                (self.daily_frame_count >> 8) & 0xff, self.daily_frame_count & 0xff,
-                (self.daily_blob_count >> 8) & 0xff, self.daily_blob_count & 0xff,
-                (self.daily_total_blob_pixels >> 8) & 0xff, self.daily_total_blob_pixels & 0xff,
-                (self.daily_largest_blob_pixels >> 8) & 0xff, self.daily_largest_blob_pixels & 0xff
-            ])
-            self.daily_uart_send_count += 1
-
-        # 新的一天，重置统计数据
-        if current_day != self.last_day:
-            self.reset_daily_stats()
-            self.last_day = current_day
-            print("== 新的一天，统计数据已清零 ==")
+            self.stats.update('uart_send_count')
+            self.last_stat_time = ticks_ms()
+
+    def _check_rollover(self):
+        """RTC分钟变化时检查小时/天的切换，每个周期结束时只报告一次"""
+        dt = self.minute_ticker.poll()
+        if dt is None:
+            return
+        result = self.stats.roll(dt)
+        if result == ROLL_NONE:
+            return
+        self._report_hour(self.stats.closed_hour)
+        if result == ROLL_DAY:
+            self._report_day()
+
+    def _report_hour(self, hour):
+        """发送刚结束的小时统计"""
+        _, stats = self.stats.hour_stats(hour)
+        print(f"[{hour:02d}时统计] 帧数={stats.get('frame_count')} "
+              f"粪便检测={stats.get('label_1_detects')} 色块={stats.get('blob_count')}")
+        send_custom_packet(5, bytearray([hour]) + stats.uart_payload())
+        self.stats.update('uart_send_count')
+        for line in self.scene.report_lines():
+            print(line)
+        self.scene.reset_stats()
+
+    def _report_day(self):
+        """发送前一天的统计和热力图，热力图清零"""
+        date, stats = self.stats.day_stats(1)
+        print(f"=== [{date} 每日统计报告] =====================================")
+        for line in stats.report_lines():
+            print(line)
+        print("=========================================================")
+        send_custom_packet(3, stats.uart_payload())
+        self.event_log.log(EV_DAILY_RESET, stats.get('frame_count'))
+
+        send_custom_packet(4, self.heatmap.encode_frame())
+        print("热点区域:", self.heatmap.hot_zones())
+        self.heatmap.reset(self.stats.date)
+        self.stats.update('uart_send_count', 2)
+        print("== 新的一天，统计数据已清零 ==")
+
+    def _cmd_stats_hour(self, args):
+        """命令：查询某小时统计"""
+        if len(args) != 1 or args[0] >= HOURS:
+            raise CommandError()
+        date, stats = self.stats.hour_stats(args[0])
+        return bytearray([args[0]]) + u32_bytes(date) + stats.uart_payload()
+
+    def _cmd_stats_day(self, args):
+        """命令：查询某天统计（0为今天）"""
+        if len(args) != 1 or args[0] >= self.stats.days:
+            raise CommandError()
+        date, stats = self.stats.day_stats(args[0])
+        return bytearray([args[0]]) + u32_bytes(date) + stats.uart_payload()
+
+    def _cmd_stats_curve(self, args):
+        """命令：查询某字段的24小时曲线"""
+        if len(args) != 1 or args[0] >= self.stats.fields:
+            raise CommandError()
+        data = bytearray([args[0]])
+        for v in self.stats.hourly_curve(self.stats.schema[args[0]][0]):
+            data += u32_bytes(v)
+        return data
+
+    def _save_heatmap(self):
+        """定期把热力图的改动写入flash"""
+        if ticks_elapsed(self.last_heatmap_save) >= HEATMAP_SAVE_INTERVAL:
+            self.heatmap.save()
+            self.tiler.hot_zones = self.heatmap.hot_zones()
+            self.last_heatmap_save = ticks_ms()
+
+    def _cmd_rate_status(self, args):
+        """命令：查询帧率档位及各档位停留时间"""
+        data = bytearray([self.governor.tier])
+        for ms in self.governor.dwell():
+            data += u32_bytes(ms)
+        return data + u32_bytes(self.governor.switches)
+
+    def _cmd_model_info(self, args):
+        """命令：查询可用模型及切换耗时、内存峰值"""
+        names = self.models.names()
+        data = bytearray([len(names), names.index(self.fomo_model.model_name)])
+        data += u32_bytes(self.fomo_model.last_swap_ms) + u32_bytes(self.models.peak_alloc)
+        for name in names:
+            data += bytearray([1 if self.models.is_loaded(name) else 0])
+            data += u32_bytes(self.models.info(name)['size'])
+        return data
+
+    def _cmd_model_select(self, args):
+        """命令：切换模型"""
+        names = self.models.names()
+        if len(args) != 1 or args[0] >= len(names):
+            raise CommandError()
+        self.fomo_model.use_model(names[args[0]])
+        return bytearray([args[0]]) + u32_bytes(self.fomo_model.last_swap_ms)
 
     def _draw_image_info(self, img, pig_count, feces_count):
         """在图像上绘制信息"""
         # 绘制参考点
-        keypoints = [(self.x_under, self.y_under, 270)]
+        keypoints = [(self.cfg['ref_x'], self.cfg['ref_y'], 270)]
         img.draw_keypoints(keypoints, size=10, color=(0, 255, 0))
 
         # 绘制统计信息
@@ -279,6 +435,11 @@ class AnimalMonitoringSystem:
         # 显示gamma控制状态
         status_text = self.gamma_ctrl.get_status_text()
         img.draw_string(10, 60, status_text, color=(255, 0, 0), scale=1)
+        img.draw_string(10, 75, self.governor.get_status_text(), color=(255, 0, 0), scale=1)
+        img.draw_string(10, 90, self.tracker.get_status_text(), color=(255, 0, 0), scale=1)
+        img.draw_string(10, 105, self.scene.get_status_text(), color=(255, 0, 0), scale=1)
+        if self.tracer.enabled:
+            img.draw_string(10, 120, self.tracer.get_status_text(), color=(255, 0, 0), scale=1)
 
     def run(self):
         """主运行循环"""
@@ -291,17 +452,37 @@ class AnimalMonitoringSystem:
 
             # 开始帧计时
             self.clock.tick()
+            self.governor.frame_begin()
 
             # 捕获和预处理图像
+            self.frame_id = (self.frame_id + 1) & 0xffff
+            self.tracer.begin(self.frame_id)
             img = sensor.snapshot().lens_corr(1.8)
+            self.tracer.mark(ST_CAPTURE)
+            self.governor.observe_frame(img)
+            if self.scene.update(self.governor.small):
+                self.event_log.log(EV_SCENE, self.scene.condition)
             img = self.gamma_ctrl.apply_gamma_correction(img)
-            img = img.histeq(adaptive=True, clip_limit=3)
+            if self.gamma_ctrl.auto:
+                # 自动调节：低频测光并更新Gamma/对比度，不再每帧做自适应直方图均衡
+                self.auto_exposure.update(img)
+            else:
+                img = img.histeq(adaptive=True, clip_limit=3)
+            self.tracer.mark(ST_PREPROCESS)
 
             # 更新帧统计
-            self.daily_frame_count += 1
-
-            # 使用FOMO模型进行检测
-            detections = self.fomo_model.predict(img)
+            self.stats.update('frame_count')
+
+            # 使用FOMO模型进行检测（检测持续期间使用跟踪区域）
+            self.tracker.set_enabled(self.detection_active)
+            infer_start = ticks_ms()
+            detections = self.tracker.predict(img)
+            infer_ms = ticks_elapsed(infer_start)
+            self.tracer.mark(ST_INFER)
+            if self.grid_encoder:
+                self._send_class_grid()
+            if self.tracker.scan == SCAN_ROI:
+                img.draw_rectangle(self.tracker.roi, color=(255, 255, 0))
 
             # 绘制检测结果
             detection_stats = self.fomo_model.draw_detections(img, detections)
@@ -311,11 +492,13 @@ class AnimalMonitoringSystem:
             feces_count = 0
             found_feces = False
             target_blob = None
+            target_center = None
             max_pixels = 0
 
             # 处理猪的检测
             if CLASS_PIG in detection_stats:
                 pig_count = detection_stats[CLASS_PIG]['count']
+                self.stats.update('label_2_detects', pig_count)
 
             # 处理粪便检测
             if CLASS_FECES in detection_stats:
@@ -324,34 +507,50 @@ class AnimalMonitoringSystem:
                 self.fail_send_count = 0  # 重置失败计数
 
                 # 更新统计
-                self.daily_target_count += 1
-                self.daily_label_1_detects += feces_count
-                self.daily_red_detect_count += 1
-
-                # 处理每个粪便检测
-                for detection in detection_stats[CLASS_FECES]['detections']:
-                    blob, pixels = self.process_feces_detection(img, detection)
-                    if pixels > max_pixels:
-                        max_pixels = pixels
-                        target_blob = blob
-
-                # 更新最大像素统计
-                if max_pixels > self.daily_largest_blob_pixels:
-                    self.daily_largest_blob_pixels = max_pixels
+                self.stats.update('target_count')
+                self.stats.update('label_1_detects', feces_count)
+                self.stats.update('red_detect_count')
+
+                # 热力图只在一次检测开始（EV_DETECT_START）时计数，同一堆粪便停留多帧不重复累计
+                was_active = self.detection_active
+                if self.cfg['color_refine']:
+                    # 处理所有粪便检测
+                    target_blob, max_pixels = self.process_feces_detections(
+                        img, detection_stats[CLASS_FECES]['detections'])
+                    print(f"色块扫描像素: 合并前={self.feces_refiner.naive_scan_pixels}, "
+                          f"合并后={self.feces_refiner.merged_scan_pixels}")
+
+                    # 更新最大像素统计
+                    self.stats.update('largest_blob_pixels', max_pixels)
+                    if target_blob:
+                        target_center = (target_blob.cx(), target_blob.cy())
+                else:
+                    # 不做颜色细化：直接使用置信度最高的检测的加权质心
+                    best = self.fomo_model.get_best_detection(detections, CLASS_FECES)
+                    target_center = self.fomo_model.get_detection_center(best)
+                    self._update_detection_time()
 
                 # 绘制目标中心点
-                if target_blob:
-                    center_x, center_y = target_blob.cx(), target_blob.cy()
+                if target_center:
+                    center_x, center_y = target_center
                     img.draw_circle((center_x, center_y, 12), color=(0, 255, 0))
                     img.draw_cross((center_x, center_y), color=(0, 255, 0))
+                    if self.detection_active and not was_active:
+                        self.heatmap.add(center_x, center_y)
                     print(f"粪便检测中心点: cx={center_x}, cy={center_y}")
 
+            # 按白天/夜间分别统计推理耗时和颜色确认率
+            self.scene.record(infer_ms, detections[CLASS_FECES] if CLASS_FECES < len(detections) else [],
+                              target_blob is not None)
+
             # 发送检测数据或处理未检测情况
-            if found_feces and target_blob:
-                self._send_detection_data(target_blob)
+            self.tracer.mark(ST_POST)
+            if found_feces and target_center:
+                self._send_detection_data(target_center)
                 print("日期:", get_time_str())
             else:
                 self._handle_no_detection()
+            self.tracer.mark(ST_SEND)
 
             # 检查检测超时
             self._check_detection_timeout()
@@ -359,11 +558,22 @@ class AnimalMonitoringSystem:
             # 更新声光报警状态
             current_duration = self._update_alarm_status()
 
+            # 事件快照（在绘制状态文字之前截取）
+            reason = self.snapshots.capture(img, target_center)
+            if reason:
+                self.event_log.log(EV_SNAPSHOT, reason)
+
             # 发送实时统计数据
             self._send_realtime_stats(pig_count, feces_count)
 
-            # 检查每日报告
-            self._check_daily_report()
+            # 小时/每日统计报告、串口命令
+            self._check_rollover()
+            self.commands.poll()
+            if self.link.poll():
+                self.event_log.log(EV_LINK, self.link.baud)
+            self.snapshots.poll(self.link.baud)
+            self._save_heatmap()
+            self.event_log.poll()
 
             # 在图像上绘制信息
             self._draw_image_info(img, pig_count, feces_count)
@@ -378,7 +588,13 @@ class AnimalMonitoringSystem:
             elif self.last_detection_duration > 0:
                 print(f"上次检测持续时间: {self.last_detection_duration}ms")
 
+            # 按活跃度选择帧率档位，低档位休眠到下一帧
+            if self.governor.observe_detections(pig_count, feces_count,
+                                                busy=self.detection_active or self.error_led):
+                self.event_log.log(EV_RATE_TIER, self.governor.tier)
+            self.tracer.end()
             print()
+            self.governor.wait()
 
 # 主程序入口
 if __name__ == "__main__":
@@ -3,6 +3,7 @@ import sensor, image, time, ml, math, uos, gc
 from pid import PID
 from pyb import Servo, Pin
 from pyb import UART
+from config_store import ConfigStore
 
 uart = UART(1, 115200 , timeout_char=200)
 # 初始化摄像头传感器
@@ -27,18 +28,20 @@ def send_packet(data):
 pan_servo = Servo(1)  # 水平舵机（连接到P7）
 tilt_servo = Servo(2)  # 垂直舵机（连接到P8）
 
-PAN_MIN, PAN_MAX = 0, 180
-TILT_MIN, TILT_MAX = 0, 90
+# 舵机角度限制和PID参数从config.json读取（见config_store.CONFIG_SCHEMA）
+config = ConfigStore()
+PAN_MIN, PAN_MAX = config.get('pan_min'), config.get('pan_max')
+TILT_MIN, TILT_MAX = config.get('tilt_min'), config.get('tilt_max')
 
 pan_servo.calibration(500, 2500, 500)
 tilt_servo.calibration(500, 2500, 500)
 
 # -------------------- PID 控制器参数 --------------------
-pan_pid = PID(p=0.09, i=0.01, d=0.0009, imax=90)
-tilt_pid = PID(p=0.09, i=0.01, d=0.0009, imax=90)
+pan_pid = PID(p=config.get('pid_p'), i=config.get('pid_i'), d=config.get('pid_d'), imax=config.get('pid_imax'))
+tilt_pid = PID(p=config.get('pid_p'), i=config.get('pid_i'), d=config.get('pid_d'), imax=config.get('pid_imax'))
 # -------------------- 舵机初始化归位 --------------------
-pan_servo.angle(90)
-tilt_servo.angle(10)
+pan_servo.angle(max(min(90, PAN_MAX), PAN_MIN))
+tilt_servo.angle(max(min(10, TILT_MAX), TILT_MIN))
 
 
 def set_servo_angle(servo, angle, min_angle, max_angle):
@@ -0,0 +1,212 @@
+# model_registry.py - 模型管理（索引、按需加载、内存预算、运行时切换）
+
+import ml
+import uos
+import gc
+from utils import ticks_ms, ticks_elapsed
+
+MODEL_EXT = ".tflite"
+DEFAULT_LABELS = "labels.txt"
+HEAP_RESERVE = 64 * 1024      # 加载模型后堆上至少保留的空间（字节）
+
+
+class ModelRegistry:
+    """
+    模型注册表
+
+    索引flash上的模型文件（大小、标签、首次加载后记录输入/输出尺寸），
+    模型在第一次使用时才加载。已加载的模型按最近使用顺序保存在内存中，
+    总大小超过预算时卸载最久未用的模型（del后gc.collect()，释放其张量区），
+    因此可以同时保留两个模型（如白天/夜间模型）以便无停顿切换。
+    正在使用的模型用pin()标记，不会被卸载（使用方仍持有引用，卸载也无法释放内存）。
+
+    放不进堆的模型加载到帧缓冲区（load_to_fb），单独计入帧缓冲区预算。
+    """
+
+    def __init__(self, heap_budget=None, fb_budget=None, heap_reserve=HEAP_RESERVE):
+        """
+        Args:
+            heap_budget (int): 堆上模型总大小上限（字节），None为不限（只受剩余堆限制）
+            fb_budget (int): 帧缓冲区上模型总大小上限（字节），None为不限，0为不使用帧缓冲区
+            heap_reserve (int): 加载后堆上至少保留的空间（字节）
+        """
+        self.heap_budget = heap_budget
+        self.fb_budget = fb_budget
+        self.heap_reserve = heap_reserve
+        self.entries = {}       # 名称 -> 模型信息
+        self.order = []         # 注册顺序（串口命令按序号访问）
+        self.loaded = []        # 已加载的模型名称，最近使用的在最后
+        self.nets = {}          # 名称 -> ml.Model
+        self.pinned = set()     # 正在使用、不能卸载的模型名称
+        self.label_cache = {}   # 标签文件路径 -> 标签列表
+
+        # 切换统计
+        self.loads = 0
+        self.evictions = 0
+        self.last_load_ms = 0
+        self.peak_alloc = 0     # 加载过程中观察到的最大堆占用（字节）
+
+    def add(self, name, model_path, labels_path=DEFAULT_LABELS):
+        """
+        注册一个模型（只读取文件大小，不加载）
+
+        Returns:
+            dict: 模型信息
+        """
+        try:
+            size = uos.stat(model_path)[6]
+        except OSError:
+            raise Exception(f'模型文件"{model_path}"不存在')
+        entry = {
+            'name': name,
+            'model_path': model_path,
+            'labels_path': labels_path,
+            'size': size,
+            'input_shape': None,    # 首次加载后记录
+            'output_shape': None,
+            'on_fb': False,
+        }
+        if name not in self.entries:
+            self.order.append(name)
+        self.entries[name] = entry
+        return entry
+
+    def scan(self, path=""):
+        """
+        注册目录中的全部模型：xxx.tflite使用xxx.txt作为标签，没有时使用labels.txt
+
+        Returns:
+            list: 注册的模型名称
+        """
+        prefix = path + "/" if path and not path.endswith("/") else path
+        files = uos.listdir(path) if path else uos.listdir()
+        names = []
+        for fname in sorted(files):
+            if not fname.endswith(MODEL_EXT):
+                continue
+            name = fname[:-len(MODEL_EXT)]
+            labels = name + ".txt"
+            if labels not in files:
+                labels = DEFAULT_LABELS
+            self.add(name, prefix + fname, prefix + labels)
+            names.append(name)
+        return names
+
+    def names(self):
+        return list(self.order)
+
+    def info(self, name):
+        return self.entries[name]
+
+    def labels(self, name):
+        """模型的标签列表（同一标签文件只解析一次）"""
+        path = self.entries[name]['labels_path']
+        labels = self.label_cache.get(path)
+        if labels is None:
+            try:
+                with open(path, 'r') as f:
+                    labels = [line.rstrip('\n') for line in f]
+            except Exception as e:
+                raise Exception(f'加载标签文件"{path}"失败: {str(e)}')
+            self.label_cache[path] = labels
+        return labels
+
+    def get(self, name):
+        """
+        取得模型（未加载时加载，必要时卸载最久未用的模型）
+
+        Returns:
+            ml.Model
+        """
+        if name not in self.entries:
+            raise Exception(f"未注册的模型: {name}")
+        net = self.nets.get(name)
+        if net is not None:
+            self.loaded.remove(name)
+            self.loaded.append(name)
+            return net
+        return self._load(self.entries[name])
+
+    def is_loaded(self, name):
+        return name in self.nets
+
+    def pin(self, name):
+        """标记正在使用的模型（内存不足时不卸载）"""
+        self.pinned.add(name)
+
+    def unpin(self, name):
+        self.pinned.discard(name)
+
+    def unload(self, name):
+        """卸载模型并回收内存"""
+        if name not in self.nets:
+            return
+        del self.nets[name]
+        self.loaded.remove(name)
+        self.pinned.discard(name)
+        gc.collect()
+        print(f"模型已卸载: {name}")
+
+    def _resident(self, on_fb):
+        return sum(self.entries[n]['size'] for n in self.loaded if self.entries[n]['on_fb'] == on_fb)
+
+    def _fits_heap(self, size):
+        if self.heap_budget is not None and self._resident(False) + size > self.heap_budget:
+            return False
+        return size <= gc.mem_free() - self.heap_reserve
+
+    def _fits_fb(self, size):
+        return self.fb_budget is None or self._resident(True) + size <= self.fb_budget
+
+    def _load(self, entry):
+        start = ticks_ms()
+        size = entry['size']
+        gc.collect()
+
+        # 先在堆上腾出空间（只卸载未pin的模型），仍放不下再考虑帧缓冲区
+        on_fb = False
+        while not self._fits_heap(size):
+            victim = self._lru_unpinned()
+            if victim is None:
+                break
+            if self._fits_fb(size):
+                on_fb = True
+                break
+            self._evict(victim)
+        if not on_fb and not self._fits_heap(size):
+            if not self._fits_fb(size):
+                raise Exception(f'模型"{entry["name"]}"({size}字节)超出内存预算')
+            on_fb = True
+
+        try:
+            net = ml.Model(entry['model_path'], load_to_fb=on_fb)
+        except Exception as e:
+            raise Exception(f'加载模型"{entry["model_path"]}"失败: {str(e)}')
+
+        self.peak_alloc = max(self.peak_alloc, gc.mem_alloc())
+        entry['on_fb'] = on_fb
+        entry['input_shape'] = net.input_shape
+        entry['output_shape'] = net.output_shape
+        self.nets[entry['name']] = net
+        self.loaded.append(entry['name'])
+        self.loads += 1
+        self.last_load_ms = ticks_elapsed(start)
+        print(f"模型加载成功: {entry['model_path']} ({size}字节, {'帧缓冲区' if on_fb else '堆'}, "
+              f"{self.last_load_ms} ms, 堆峰值 {self.peak_alloc}字节)")
+        return net
+
+    def _lru_unpinned(self):
+        """最久未用且未pin的模型名称，没有时为None"""
+        for name in self.loaded:
+            if name not in self.pinned:
+                return name
+        return None
+
+    def _evict(self, name):
+        """卸载最久未用的模型"""
+        self.evictions += 1
+        self.unload(name)
+
+    def get_status_text(self):
+        current = self.loaded[-1] if self.loaded else "-"
+        return f"{current} {len(self.loaded)}/{len(self.order)} {self.last_load_ms}ms"
@@ -9,7 +9,7 @@
 
 import sensor
 import time
-from pyb import Pin
+from button_input import ButtonInput
 
 gamma=1.0
 contrast=1.0
@@ -21,19 +21,24 @@ sensor.set_framesize(sensor.QVGA)
 sensor.skip_frames(time=2000)
 clock = time.clock()
 
-pin_gamma_add =     Pin('P7', Pin.IN, Pin.PULL_UP)
-pin_gamma_reduce = Pin('P8', Pin.IN, Pin.PULL_UP)
-pin_contrast_add = Pin('P9', Pin.IN, Pin.PULL_UP)
-pin_contrast_reduce = Pin('P0', Pin.IN, Pin.PULL_UP)
-pin_brightness_add = Pin('P3', Pin.IN, Pin.PULL_UP)
-pin_brightness_reduce = Pin('P2', Pin.IN, Pin.PULL_UP)
-
-print(f"pin_gamma_add:{pin_gamma_add.value()}")
-print(f"pin_gamma_reduce:{pin_gamma_reduce.value()}")
-print(f"pin_contrast_add:{pin_contrast_add.value()}")
-print(f"pin_contrast_reduce:{pin_contrast_reduce.value()}")
-print(f"pin_brightness_add:{pin_brightness_add.value()}")
-print(f"pin_brightness_reduce:{pin_brightness_reduce.value()}")
+# 按键：ExtInt中断驱动，按住时自动连发
+# P3/P7共用中断线12、P2/P8共用中断线13，P3和P2由ButtonInput轮询
+buttons = ButtonInput(('P7', 'P8', 'P9', 'P0', 'P3', 'P2'))
+
+def on_button(event, index):
+    global gamma, contrast, brightness
+    if index == 0:
+        gamma += 0.1
+    elif index == 1:
+        gamma = max(0.1, gamma - 0.1)
+    elif index == 2:
+        contrast += 0.1
+    elif index == 3:
+        contrast = max(0.1, contrast - 0.1)
+    elif index == 4:
+        brightness = min(1.0, brightness + 0.1)
+    elif index == 5:
+        brightness = max(-1.0, brightness - 0.1)
 
 while True:
     clock.tick()
@@ -42,11 +47,7 @@ while True:
     # 数值会根据图像类型及每个颜色通道的范围进行缩放...
     img = sensor.snapshot().gamma_corr(gamma=gamma, contrast=contrast, brightness=brightness)
 
-    if pin_gamma_add.value() == 0:
-        while pin_gamma_add.value() == False:
-            gamma +=0.1
-            img = img.gamma_corr(gamma=gamma)
-        print(f"Gamma增加,pin_gamma_add:{pin_gamma_add.value()}")
+    buttons.poll(on_button)
 
     status_text = f"Gamma:{gamma:.1f}, Contrast:{contrast:.1f}, Brightness:{brightness:.1f}"
     img.draw_string(10, 10, status_text, color=(255, 255, 255), scale=1)
@@ -1,20 +1,58 @@
 from pyb import UART
 
 
-uart = UART(1, 115200 , timeout_char=200)
+UART_BAUD = 115200   # 上电时的波特率，更高的波特率由uart_link协商
+
+uart = UART(1, UART_BAUD, timeout_char=200)
+
+# 延迟追踪（参数latency_trace）：开启后每帧在帧尾之前附加4字节
+#   帧号(2) | 拍照时间低16位(2, ms)
+# 帧号与拍照时间对应本轮主循环拍摄的图像（见latency_trace.py），链路帧（类型7）不附加。
+_trace_tag = bytearray(4)
+_trace_on = False
+
+
+def set_trace_tag(frame_id, capture_ms):
+    """设置之后发送的帧附加的帧号和拍照时间，frame_id为None时关闭"""
+    global _trace_on
+    if frame_id is None:
+        _trace_on = False
+        return
+    _trace_tag[0] = (frame_id >> 8) & 0xff
+    _trace_tag[1] = frame_id & 0xff
+    _trace_tag[2] = (capture_ms >> 8) & 0xff
+    _trace_tag[3] = capture_ms & 0xff
+    _trace_on = True
+
 
 #--------------------串口------------------
-def send_custom_packet(frame_type, data):
+# 帧类型（帧头0xF0+类型，帧尾0xE0+类型）：
+#   0: 初始参数（图像宽高、参考点）
+#   1: 检测目标中心点
+#   2: 实时统计（粪便数、猪数、报警状态）
+#   3: 每日统计，每天结束时发送一次（版本号 + 各字段32位大端，字段顺序见daily_stats.STATS_SCHEMA）
+#   4: 每日粪便位置热力图（数据以2字节长度开头，见feces_heatmap.py）
+#   5: 每小时统计，每小时结束时发送一次（小时号 + 与类型3相同的统计数据）
+#   6: 类别网格，每帧推理后发送（参数grid_bits非0时，格式见class_grid.py）
+#   7: 链路帧，波特率协商与回环校验（双向，见uart_link.py）
+#   8: 命令（单片机 -> OpenMV，见command_channel.py）
+#   9: 命令应答
+#   10: 事件快照分块（JPEG，低优先级，见snapshot.py）
+def send_custom_packet(frame_type, data, trace=True):
     """
     发送指定帧类型的数据包。
     参数：
         frame_type: int (1~15)，例如1表示帧头0xF1、帧尾0xE1
         data: list 或 bytearray，要发送的数据内容
+        trace: 延迟追踪开启时是否附加帧号和拍照时间
     """
     #assert 1 <= frame_type <= 15, "帧类型必须在1~15之间"
     header = 0xF0 + frame_type
     footer = 0xE0 + frame_type
-    packet = bytearray([header]) + bytearray(data) + bytearray([footer])
+    packet = bytearray([header]) + bytearray(data)
+    if trace and _trace_on:
+        packet += _trace_tag
+    packet += bytearray([footer])
     uart.write(packet)
 
 if __name__ == "__main__":
@@ -0,0 +1,175 @@
+# rate_governor.py - 按场景活跃度自适应调整帧率（替代QVGA/QQVGA二档节能模式）
+
+import pyb
+import sensor, image
+from array import array
+from utils import ticks_ms, ticks_elapsed
+
+# 帧率档位：(名称, 帧周期ms)
+TIER_IDLE = 0     # 空栏：1 Hz
+TIER_WATCH = 1    # 有动静：5 Hz（猪在栏里但不动时也会降到watch/idle）
+TIER_ACTIVE = 2   # 检测/跟踪/报警中：不限速
+TIERS = (
+    ("idle", 1000),
+    ("watch", 200),
+    ("active", 0),
+)
+
+MOTION_THRESHOLD = 6      # 帧差能量阈值（降采样灰度差的均值，0-255）
+WATCH_HOLD = 30000        # 无检测变化多久后从active降到watch（ms）
+IDLE_HOLD = 120000        # 无动静多久后从watch降到idle（ms）
+STOP_MIN = 300            # 剩余等待时间超过该值才进入stop模式（ms）
+
+
+class RateGovernor:
+    """
+    帧率调节
+
+    活跃度来自两部分：
+      - 检测变化：猪的数目与上一帧不同、本帧有粪便检测
+      - 帧差能量：原始画面降采样为灰度小图，与上一帧小图做差的均值
+    只看猪的数目变化而不看有没有猪：猪全天在栏里（夜间趴着不动），数目不变且没有动静时照常降档。
+    有检测变化或处于跟踪/喷淋/报警时立即升到active；有动静时至少为watch；
+    降档需要在保持时间内没有对应的活动，避免频繁切换。
+
+    低档位在帧间休眠：默认用pyb.wfi()浅睡眠（串口、按键中断照常工作）；
+    use_stop=True时在idle档用pyb.stop()深睡眠，由RTC唤醒，
+    期间ticks_ms暂停、串口不能接收，唤醒后需要重新对齐分钟定时器。
+    """
+
+    def __init__(self, width, height, decimate=8, motion_threshold=MOTION_THRESHOLD,
+                 watch_hold=WATCH_HOLD, idle_hold=IDLE_HOLD, use_stop=False, minute_ticker=None):
+        """
+        Args:
+            width, height (int): 帧尺寸
+            decimate (int): 帧差降采样倍数
+            motion_threshold (float): 帧差能量阈值
+            watch_hold, idle_hold (int): 降档保持时间（ms）
+            use_stop (bool): idle档是否使用pyb.stop()
+            minute_ticker: utils.MinuteTicker（use_stop时唤醒后重新对齐）
+        """
+        self.decimate = decimate
+        self.motion_threshold = motion_threshold
+        self.watch_hold = watch_hold
+        self.idle_hold = idle_hold
+        self.use_stop = use_stop
+        self.minute_ticker = minute_ticker
+        self.rtc = pyb.RTC()
+
+        w, h = width // decimate, height // decimate
+        self.small = sensor.alloc_extra_fb(w, h, sensor.GRAYSCALE)
+        self.prev = sensor.alloc_extra_fb(w, h, sensor.GRAYSCALE)
+        self.diff = sensor.alloc_extra_fb(w, h, sensor.GRAYSCALE)
+        self.has_prev = False
+
+        self.tier = TIER_ACTIVE
+        self.tier_since = ticks_ms()
+        self.dwell_ms = array('I', [0] * len(TIERS))   # 各档位累计停留时间
+        self.switches = 0
+
+        now = ticks_ms()
+        self.frame_start = now
+        self.last_detection = now
+        self.last_motion = now
+        self.last_count = 0
+        self.motion = 0.0
+
+    def frame_begin(self):
+        """每帧开始（拍照前）调用"""
+        self.frame_start = ticks_ms()
+
+    def observe_frame(self, img):
+        """计算帧差能量（在拍照后、Gamma校正前调用）"""
+        scale = 1 / self.decimate
+        self.small.draw_image(img, 0, 0, x_scale=scale, y_scale=scale, hint=image.AREA)
+        if self.has_prev:
+            self.diff.draw_image(self.small, 0, 0)
+            self.diff.difference(self.prev)
+            self.motion = self.diff.get_statistics().mean()
+        self.prev.draw_image(self.small, 0, 0)
+        self.has_prev = True
+        if self.motion >= self.motion_threshold:
+            self.last_motion = ticks_ms()
+
+    def motion_in(self, roi):
+        """
+        画面区域内的帧差能量
+
+        Args:
+            roi (tuple): 整帧坐标 (x, y, w, h)
+
+        Returns:
+            float: 降采样帧差图在该区域的均值
+        """
+        if not self.has_prev:
+            return 0.0
+        d = self.decimate
+        r = (roi[0] // d, roi[1] // d, max(1, roi[2] // d), max(1, roi[3] // d))
+        return self.diff.get_statistics(roi=r).mean()
+
+    def observe_detections(self, pigs, feces=0, busy=False):
+        """
+        记录本帧检测结果并选择档位
+
+        Args:
+            pigs (int): 本帧猪的数目（只用数目变化）
+            feces (int): 本帧粪便检测数
+            busy (bool): 是否处于跟踪/喷淋/报警等需要全速的状态
+
+        Returns:
+            bool: 档位是否改变
+        """
+        now = ticks_ms()
+        churn = pigs != self.last_count
+        self.last_count = pigs
+        if feces or churn or busy:
+            self.last_detection = now
+
+        if busy or feces or ticks_elapsed(self.last_detection, now) < self.watch_hold:
+            tier = TIER_ACTIVE
+        elif ticks_elapsed(self.last_motion, now) < self.idle_hold:
+            tier = TIER_WATCH
+        else:
+            tier = TIER_IDLE
+        return self._set_tier(tier, now)
+
+    def _set_tier(self, tier, now):
+        if tier == self.tier:
+            return False
+        self.dwell_ms[self.tier] += ticks_elapsed(self.tier_since, now)
+        self.tier_since = now
+        self.tier = tier
+        self.switches += 1
+        print(f"帧率档位: {TIERS[tier][0]}")
+        return True
+
+    def wait(self):
+        """每帧结束时调用：低档位休眠到下一帧"""
+        period = TIERS[self.tier][1]
+        if not period:
+            return
+        remaining = period - ticks_elapsed(self.frame_start)
+        if remaining <= 0:
+            return
+        if self.use_stop and self.tier == TIER_IDLE and remaining >= STOP_MIN:
+            self.rtc.wakeup(remaining)
+            pyb.stop()
+            if self.minute_ticker:
+                self.minute_ticker.resync()
+            return
+        while ticks_elapsed(self.frame_start) < period:
+            pyb.wfi()
+
+    def dwell(self):
+        """
+        各档位累计停留时间（含当前档位）
+
+        Returns:
+            list: [idle_ms, watch_ms, active_ms]
+        """
+        result = list(self.dwell_ms)
+        result[self.tier] += ticks_elapsed(self.tier_since)
+        return result
+
+    def get_status_text(self):
+        return f"{TIERS[self.tier][0]} M:{self.motion:.1f}"
@@ -0,0 +1,136 @@
+# rolling_stats.py - 按小时分桶的滚动统计（24个小时桶 + 7天汇总环）
+#
+# 本模块不依赖pyb，时间由调用方传入（RTC的datetime元组）。
+
+from array import array
+from daily_stats import Stats, STATS_SCHEMA
+
+HOURS = 24
+DAYS = 7
+
+# roll() 的返回值
+ROLL_NONE = 0   # 仍在同一小时
+ROLL_HOUR = 1   # 上一小时结束
+ROLL_DAY = 2    # 上一小时及上一天结束
+
+
+def date_code(dt):
+    """RTC datetime元组 -> 日期编码 YYYYMMDD"""
+    return dt[0] * 10000 + dt[1] * 100 + dt[2]
+
+
+class RollingStats:
+    """
+    滚动统计
+
+    当前小时的计数累加在 current 中；小时结束时整体复制到该小时号对应的桶，并入当天汇总。
+    小时桶按小时号索引、循环覆盖，因此始终保存最近24小时的数据；
+    一天结束时当天汇总写入7天环。所有存储都是固定大小的array，运行中不再分配。
+    """
+
+    def __init__(self, dt, schema=STATS_SCHEMA, days=DAYS):
+        """
+        Args:
+            dt (tuple): 当前RTC时间 rtc.datetime()
+            schema: 统计字段表
+            days (int): 日汇总环的天数
+        """
+        self.schema = schema
+        self.fields = len(schema)
+        self.days = days
+
+        self.current = Stats(schema)      # 当前小时
+        self.today = Stats(schema)        # 当天已结束小时的汇总
+        self.scratch = Stats(schema)      # 查询用的临时对象
+
+        empty = Stats(schema).values      # 清零后的初值（取最小值字段为U32_MAX）
+        self.hours = array('I', list(empty) * HOURS)
+        self.hour_dates = array('I', [0] * HOURS)
+        self.day_values = array('I', list(empty) * days)
+        self.day_dates = array('I', [0] * days)
+        self.day_head = 0                 # 下一个写入位置
+
+        self.hour = dt[4]
+        self.date = date_code(dt)
+        self.closed_hour = None           # 最近结束的小时号
+        self.closed_date = None           # 最近结束的日期编码
+
+    def update(self, name, value=1):
+        """更新当前小时的计数"""
+        self.current.update(name, value)
+
+    def roll(self, dt):
+        """
+        RTC分钟变化时调用，跨小时/跨天时结束对应的周期
+
+        Args:
+            dt (tuple): 当前RTC时间 rtc.datetime()
+
+        Returns:
+            int: ROLL_NONE / ROLL_HOUR / ROLL_DAY
+        """
+        hour = dt[4]
+        date = date_code(dt)
+        if hour == self.hour and date == self.date:
+            return ROLL_NONE
+
+        # 结束上一小时
+        offset = self.hour * self.fields
+        self.current.store(self.hours, offset)
+        self.hour_dates[self.hour] = self.date
+        self.today.merge(self.hours, offset)
+        self.current.reset()
+        self.closed_hour = self.hour
+        result = ROLL_HOUR
+
+        # 结束上一天
+        if date != self.date:
+            self.today.store(self.day_values, self.day_head * self.fields)
+            self.day_dates[self.day_head] = self.date
+            self.day_head = (self.day_head + 1) % self.days
+            self.today.reset()
+            self.closed_date = self.date
+            result = ROLL_DAY
+
+        self.hour = hour
+        self.date = date
+        return result
+
+    def hour_stats(self, hour):
+        """
+        某小时号最近一次结束时的统计（当前小时返回进行中的数据）
+
+        Returns:
+            tuple: (日期编码, Stats)，无数据时日期为0
+        """
+        if hour == self.hour:
+            return self.date, self.current
+        self.scratch.load(self.hours, hour * self.fields)
+        return self.hour_dates[hour], self.scratch
+
+    def day_stats(self, days_ago=0):
+        """
+        日汇总：0为今天（截至当前），1为昨天，依此类推
+
+        Returns:
+            tuple: (日期编码, Stats)，无数据时日期为0
+        """
+        if days_ago == 0:
+            self.scratch.load(self.today.values)
+            self.scratch.merge(self.current.values)
+            return self.date, self.scratch
+        i = (self.day_head - days_ago) % self.days
+        self.scratch.load(self.day_values, i * self.fields)
+        return self.day_dates[i], self.scratch
+
+    def hourly_curve(self, name):
+        """
+        某字段最近24小时按小时号排列的数值（例如每小时粪便检测数，用于水泵排程）
+
+        Returns:
+            list: 长度24，下标为小时号
+        """
+        i = self.current.index[name]
+        curve = [self.hours[h * self.fields + i] for h in range(HOURS)]
+        curve[self.hour] = self.current.values[i]
+        return curve
@@ -0,0 +1,215 @@
+# scene_condition.py - 按画面亮度区分白天/夜间，切换对应的模型和预处理
+
+from array import array
+from utils import ticks_ms, ticks_elapsed
+
+COND_DAY = 0
+COND_NIGHT = 1
+CONDITIONS = ("day", "night")
+
+NIGHT_ENTER = 0.18      # 亮度低于该值一段时间后切到夜间
+DAY_ENTER = 0.28        # 亮度高于该值一段时间后切回白天（两者之间为滞回区）
+PREWARM_MARGIN = 0.05   # 亮度距切换阈值不足该值时预加载另一个模型
+SWITCH_HOLD = 20000     # 越过阈值需要持续的时间（ms）
+
+# 各状态的模型与预处理：(模型名称, GammaController预设名称, 自动调节目标亮度中位数)
+DEFAULT_PROFILES = (
+    ("trained", "默认", 0.45),
+    ("night", "低光", 0.40),
+)
+
+# 每个状态的统计项
+_FRAMES = 0
+_INFER_MS = 1
+_DETECT_FRAMES = 2
+_CONFIRMED = 3
+_SCORE_SUM = 4      # 置信度之和 ×1000
+_DETECTIONS = 5
+_FIELDS = 6
+
+
+class SceneClassifier:
+    """
+    场景亮度分类
+
+    特征取自降采样灰度图的直方图：亮度 = 0.7×P50 + 0.3×P95
+    （只看中位数时，夜间补光灯照亮的一小块区域会被忽略）。
+    用原始画面（Gamma校正之前）计算，不受预处理参数影响。
+    进入夜间和回到白天使用不同阈值，并要求持续SWITCH_HOLD，避免在黄昏时来回切换。
+    """
+
+    def __init__(self, interval=1000, night_enter=NIGHT_ENTER, day_enter=DAY_ENTER,
+                 hold=SWITCH_HOLD, prewarm_margin=PREWARM_MARGIN):
+        self.interval = interval
+        self.night_enter = night_enter
+        self.day_enter = day_enter
+        self.hold = hold
+        self.prewarm_margin = prewarm_margin
+
+        self.condition = COND_DAY
+        self.luminance = 0.0
+        self.pending_since = None   # 越过阈值的开始时间
+        self.last_update = None
+
+    def update(self, small):
+        """
+        每帧调用，到达间隔时测光
+
+        Args:
+            small: 降采样的原始灰度图（如RateGovernor.small）
+
+        Returns:
+            bool: 状态是否改变
+        """
+        now = ticks_ms()
+        if self.last_update is not None and ticks_elapsed(self.last_update, now) < self.interval:
+            return False
+        first = self.last_update is None
+        self.last_update = now
+
+        hist = small.get_histogram(bins=64)
+        self.luminance = (0.7 * hist.get_percentile(0.5).value()
+                          + 0.3 * hist.get_percentile(0.95).value()) / 255
+
+        if first:
+            # 启动时直接按当前亮度选择，不等待保持时间
+            self.condition = COND_NIGHT if self.luminance < self.night_enter else COND_DAY
+            return self.condition == COND_NIGHT
+
+        if self.condition == COND_DAY:
+            crossed = self.luminance < self.night_enter
+        else:
+            crossed = self.luminance > self.day_enter
+        if not crossed:
+            self.pending_since = None
+            return False
+        if self.pending_since is None:
+            self.pending_since = now
+        if ticks_elapsed(self.pending_since, now) < self.hold:
+            return False
+        self.pending_since = None
+        self.condition = COND_NIGHT if self.condition == COND_DAY else COND_DAY
+        return True
+
+    def near_switch(self):
+        """亮度接近（或已越过）切换阈值，需要准备另一个状态"""
+        if self.condition == COND_DAY:
+            return self.luminance < self.night_enter + self.prewarm_margin
+        return self.luminance > self.day_enter - self.prewarm_margin
+
+
+class DayNightScheduler:
+    """
+    白天/夜间双模型调度
+
+    亮度接近切换阈值时先通过ModelRegistry预加载另一个模型（需要注册表的内存预算能同时放下两个模型），
+    真正切换时FOMOModel.use_model()只是替换引用，不会出现加载模型造成的长帧。
+    切换时同时套用对应的Gamma预设（自动调节模式下）和自动调节目标亮度。
+    另一个状态的模型不存在时只切换预处理。
+
+    每个状态分别统计推理耗时和准确率指标（没有人工标注，以粪便检测被颜色细化确认的比例
+    和平均置信度作为参考）。
+    """
+
+    def __init__(self, fomo_model, gamma_ctrl, auto_exposure, classifier=None, profiles=DEFAULT_PROFILES):
+        """
+        Args:
+            fomo_model: FOMOModel实例（通过其registry预加载/切换模型）
+            gamma_ctrl: GammaController实例
+            auto_exposure: AutoExposure实例
+            classifier: SceneClassifier实例
+            profiles: 各状态的(模型名称, 预设名称, 目标亮度中位数)
+        """
+        self.model = fomo_model
+        self.registry = fomo_model.registry
+        self.gamma_ctrl = gamma_ctrl
+        self.auto_exposure = auto_exposure
+        self.classifier = classifier or SceneClassifier()
+        self.profiles = profiles
+        self.switches = 0
+        self.prewarm_failed = None      # 预加载失败的模型（内存不足），切换前不再重试
+        self.stats = [array('I', [0] * _FIELDS) for _ in CONDITIONS]
+
+    @property
+    def condition(self):
+        return self.classifier.condition
+
+    def _has_model(self, condition):
+        return self.profiles[condition][0] in self.registry.entries
+
+    def update(self, small):
+        """
+        每帧调用（拍照后、推理前）
+
+        Returns:
+            bool: 是否切换了状态
+        """
+        if not self.classifier.update(small):
+            if self.classifier.near_switch():
+                self._prewarm(1 - self.condition)
+            return False
+        self._apply(self.condition)
+        return True
+
+    def _prewarm(self, condition):
+        name = self.profiles[condition][0]
+        if self._has_model(condition) and not self.registry.is_loaded(name) and name != self.prewarm_failed:
+            print(f"预加载{CONDITIONS[condition]}模型: {name}")
+            try:
+                self.registry.get(name)
+            except Exception as e:
+                self.prewarm_failed = name
+                print(f"预加载失败，切换时再加载: {e}")
+
+    def _apply(self, condition):
+        name, preset, target_median = self.profiles[condition]
+        self.switches += 1
+        self.prewarm_failed = None
+        if self._has_model(condition) and name != self.model.model_name:
+            self.model.use_model(name)
+        if self.gamma_ctrl.auto:
+            # 手动调节模式下保留用户的参数
+            self.gamma_ctrl.apply_preset(preset)
+        self.auto_exposure.target_median = target_median
+        print(f"场景切换: {CONDITIONS[condition]} 亮度={self.classifier.luminance:.2f} "
+              f"模型={self.model.model_name} 切换耗时 {self.model.last_swap_ms} ms")
+
+    def record(self, infer_ms, detections, confirmed):
+        """
+        记录一帧的推理结果
+
+        Args:
+            infer_ms (int): 推理耗时
+            detections (list): 粪便检测结果
+            confirmed (bool): 颜色细化是否确认了目标
+        """
+        s = self.stats[self.condition]
+        s[_FRAMES] += 1
+        s[_INFER_MS] += infer_ms
+        if detections:
+            s[_DETECT_FRAMES] += 1
+            if confirmed:
+                s[_CONFIRMED] += 1
+            for det in detections:
+                s[_SCORE_SUM] += int(det['score'] * 1000)
+            s[_DETECTIONS] += len(detections)
+
+    def report_lines(self):
+        """各状态的推理耗时、确认率、平均置信度"""
+        lines = []
+        for c, s in enumerate(self.stats):
+            if not s[_FRAMES]:
+                continue
+            confirm = s[_CONFIRMED] / s[_DETECT_FRAMES] if s[_DETECT_FRAMES] else 0
+            score = s[_SCORE_SUM] / s[_DETECTIONS] / 1000 if s[_DETECTIONS] else 0
+            lines.append(f"{CONDITIONS[c]}: 帧数={s[_FRAMES]} 平均推理={s[_INFER_MS] // s[_FRAMES]}ms "
+                         f"检测帧={s[_DETECT_FRAMES]} 颜色确认率={confirm:.2f} 平均置信度={score:.2f}")
+        return lines
+
+    def reset_stats(self):
+        for s in self.stats:
+            for i in range(_FIELDS):
+                s[i] = 0
+
+    def get_status_text(self):
+        return f"{CONDITIONS[self.condition]} L:{self.classifier.luminance:.2f}"
@@ -0,0 +1,202 @@
+# snapshot.py - 事件快照：报警时把目标附近的JPEG小图分块低优先级发给单片机
+
+from my_uart import send_custom_packet
+from uart_link import crc16
+from command_channel import CommandError, u32_bytes, CMD_SNAPSHOT_TAKE, CMD_SNAPSHOT_NAK, CMD_SNAPSHOT_ACK
+from utils import ticks_ms, ticks_elapsed, get_unix_timestamp
+
+FRAME_SNAPSHOT = 10
+
+# 触发原因
+SNAP_ALARM = 1      # 检测持续时间超过报警阈值
+SNAP_PUMP = 2       # 单片机请求：水泵连续运行超过40秒
+SNAP_REQUEST = 3    # 单片机/上位机手动请求
+
+ROI_SIZE = 120          # 目标周围截取的区域边长（原图像素）
+SNAP_SIZE = 80          # 缩小后的最大边长
+CHUNK_SIZE = 128        # 每块JPEG数据字节数
+MAX_BURST = 4           # 每次poll最多发送的块数（发送时间在115200下约45ms）
+LINK_SHARE = 0.2        # 最多占用当前波特率的比例
+INFO_SIZE = 18
+
+# 传输对象 = 信息头(INFO_SIZE) + JPEG数据，按CHUNK_SIZE分块，每块一帧：
+#   长度(2) | 快照号(2) | 块序号(2) | 总块数(2) | 数据 | CRC16(2)
+#   长度 = 6 + 数据字节数 + 2，CRC为快照号到数据结尾的CRC16-CCITT（见uart_link.crc16）
+# 信息头（大端）：原因(1) | JPEG质量(1) | 时间戳(4) | ROI x,y,w,h(各2) | JPEG字节数(4)
+# 单片机收到缺块/CRC错误时用CMD_SNAPSHOT_NAK从缺的块开始重发，收齐后用CMD_SNAPSHOT_ACK确认。
+
+
+class SnapshotSender:
+    """
+    事件快照的截取与分块发送
+
+    request()只记录请求，下一帧调用capture()时截取目标附近的ROI、缩小并压缩成JPEG。
+    poll()每帧在控制帧发送之后调用，按令牌桶限制发送速率（rate字节/秒，且不超过
+    当前波特率的LINK_SHARE），每次最多MAX_BURST块，控制帧的延迟最多增加几十毫秒。
+    只保留一张快照：上一张还没发送完时新的请求被丢弃（计入dropped）。
+    """
+
+    def __init__(self, rate=2000, quality=50):
+        """
+        Args:
+            rate (int): 发送速率上限（字节/秒），0为关闭快照
+            quality (int): JPEG质量（10-100）
+        """
+        self.rate = rate
+        self.quality = quality
+        self.snap_id = 0
+        self.data = None            # 当前快照的传输对象
+        self.total = 0
+        self.next_seq = 0
+        self.pending = 0            # 等待截取的触发原因
+        self.tokens = 0.0
+        self.last_poll = ticks_ms()
+
+        # 统计
+        self.taken = 0
+        self.dropped = 0
+        self.chunks_sent = 0
+        self.resends = 0
+        self.acked = 0
+
+    @property
+    def busy(self):
+        """当前快照还有块没有发送"""
+        return self.data is not None and self.next_seq < self.total
+
+    def request(self, reason):
+        """请求在下一帧截取快照"""
+        if not self.rate:
+            return
+        if self.busy or self.pending:
+            self.dropped += 1
+            return
+        self.pending = reason
+
+    def capture(self, img, center=None):
+        """
+        有请求时截取快照（在绘制状态文字之前调用）
+
+        Args:
+            img: 当前帧
+            center (tuple): 目标中心(cx, cy)，没有时截取整帧
+
+        Returns:
+            int: 截取的快照的触发原因，没有截取时为0
+        """
+        if not self.pending:
+            return 0
+        reason = self.pending
+        self.pending = 0
+
+        if center:
+            w = min(ROI_SIZE, img.width())
+            h = min(ROI_SIZE, img.height())
+            x = min(max(0, center[0] - w // 2), img.width() - w)
+            y = min(max(0, center[1] - h // 2), img.height() - h)
+        else:
+            x, y, w, h = 0, 0, img.width(), img.height()
+        scale = min(1.0, SNAP_SIZE / max(w, h))
+        small = img.copy(roi=(x, y, w, h), x_scale=scale, y_scale=scale)
+        jpeg = small.compress(quality=self.quality).bytearray()
+
+        info = bytearray([reason, self.quality]) + u32_bytes(get_unix_timestamp())
+        for v in (x, y, w, h):
+            info += bytearray([(v >> 8) & 0xff, v & 0xff])
+        info += u32_bytes(len(jpeg))
+        self.data = info + jpeg
+        self.snap_id = (self.snap_id + 1) & 0xffff
+        self.total = (len(self.data) + CHUNK_SIZE - 1) // CHUNK_SIZE
+        self.next_seq = 0
+        self.taken += 1
+        print(f"事件快照{self.snap_id}: 原因={reason} ROI=({x},{y},{w},{h}) "
+              f"JPEG {len(jpeg)}字节 {self.total}块")
+        return reason
+
+    def _send_chunk(self, seq):
+        start = seq * CHUNK_SIZE
+        chunk = self.data[start:start + CHUNK_SIZE]
+        body = bytearray([(self.snap_id >> 8) & 0xff, self.snap_id & 0xff,
+                          (seq >> 8) & 0xff, seq & 0xff,
+                          (self.total >> 8) & 0xff, self.total & 0xff]) + chunk
+        crc = crc16(body)
+        body += bytearray([(crc >> 8) & 0xff, crc & 0xff])
+        send_custom_packet(FRAME_SNAPSHOT, bytearray([(len(body) >> 8) & 0xff, len(body) & 0xff]) + body)
+        self.chunks_sent += 1
+        return len(body) + 4
+
+    def poll(self, baud):
+        """
+        每帧调用（在其他帧发送之后），按速率上限发送若干块
+
+        Args:
+            baud (int): 当前串口波特率
+
+        Returns:
+            int: 本次发送的块数
+        """
+        now = ticks_ms()
+        elapsed = ticks_elapsed(self.last_poll, now)
+        self.last_poll = now
+        if not self.busy:
+            self.tokens = 0.0
+            return 0
+
+        # 8N1每字节10位
+        rate = min(self.rate, baud * LINK_SHARE / 10)
+        frame_size = CHUNK_SIZE + 12
+        self.tokens = min(self.tokens + rate * elapsed / 1000, frame_size * MAX_BURST)
+        sent = 0
+        while self.busy and self.tokens >= frame_size:
+            self.tokens -= self._send_chunk(self.next_seq)
+            self.next_seq += 1
+            sent += 1
+        return sent
+
+    # ---------------- 命令 ----------------
+
+    def _snap_arg(self, args, size):
+        if len(args) != size:
+            raise CommandError()
+        snap_id = (args[0] << 8) | args[1]
+        if self.data is None or snap_id != self.snap_id:
+            # 快照已被确认或被新的快照替换
+            raise CommandError()
+        return snap_id
+
+    def _cmd_take(self, args):
+        """命令：请求快照，参数[原因]（如SNAP_PUMP）"""
+        if len(args) != 1 or not args[0]:
+            raise CommandError()
+        self.request(args[0])
+        return bytearray([1 if self.pending else 0])
+
+    def _cmd_nak(self, args):
+        """命令：从指定块开始重发，参数[快照号(2), 块序号(2)]"""
+        self._snap_arg(args, 4)
+        seq = (args[2] << 8) | args[3]
+        if seq >= self.total:
+            raise CommandError()
+        if seq < self.next_seq:
+            self.resends += self.next_seq - seq
+            self.next_seq = seq
+        return b""
+
+    def _cmd_ack(self, args):
+        """命令：快照已收齐，参数[快照号(2)]"""
+        self._snap_arg(args, 2)
+        self.data = None
+        self.total = 0
+        self.next_seq = 0
+        self.acked += 1
+        return b""
+
+    def register_commands(self, channel):
+        channel.register(CMD_SNAPSHOT_TAKE, self._cmd_take)
+        channel.register(CMD_SNAPSHOT_NAK, self._cmd_nak)
+        channel.register(CMD_SNAPSHOT_ACK, self._cmd_ack)
+
+    def get_status_text(self):
+        if self.busy:
+            return f"Snap {self.snap_id}: {self.next_seq}/{self.total}"
+        return f"Snap {self.snap_id} ok:{self.acked}"
@@ -1,6 +1,7 @@
 import time
 import sensor
 from pyb import Servo, Pin
+from config_store import ConfigStore
 # -------------------- 系统参数 --------------------
 
 # 初始化两个舵机（水平方向-Pan，垂直方向-Tilt）
@@ -8,11 +9,12 @@ from pyb import Servo, Pin
 pan_servo = Servo(1)  # 舵机1接P7（水平方向）白线
 tilt_servo = Servo(2) # 舵机2接P8（垂直方向）黑线
 
-# 设置舵机角度限制（防止过度旋转）
-PAN_MIN = 45
-PAN_MAX = 150
-TILT_MIN = 45
-TILT_MAX = 135
+# 设置舵机角度限制（防止过度旋转），从config.json读取（见config_store.CONFIG_SCHEMA）
+config = ConfigStore()
+PAN_MIN = config.get('pan_min')
+PAN_MAX = config.get('pan_max')
+TILT_MIN = config.get('tilt_min')
+TILT_MAX = config.get('tilt_max')
 
 # 水泵控制
 pump_pin_red = Pin('P5', Pin.OUT)
@@ -0,0 +1,312 @@
+# uart_link.py - 串口波特率协商、回环校验与自动回退
+
+import time
+from my_uart import uart, send_custom_packet, UART_BAUD
+from command_channel import u32_bytes, CMD_LINK_STATUS
+from utils import ticks_ms, ticks_elapsed
+
+# 链路帧（双向）：
+#   0xF7, 长度高, 长度低, 操作, 数据..., CRC高, CRC低, 0xE7
+#   长度 = 1 + 数据字节数 + 2，CRC为操作和数据的CRC16-CCITT（初值0xFFFF）
+LINK_FRAME = 7
+
+OP_PROPOSE = 0x01       # OpenMV -> 单片机：[波特率(4字节)]，以当前波特率发送
+OP_ACCEPT = 0x02        # 单片机 -> OpenMV：[波特率]，发送完后单片机立即切换
+OP_REJECT = 0x03        # 单片机 -> OpenMV：[波特率]
+OP_ECHO = 0x04          # OpenMV -> 单片机：[序号(2字节)] + 测试数据，单片机原样返回
+OP_ECHO_REPLY = 0x05    # 单片机 -> OpenMV
+OP_COMMIT = 0x06        # OpenMV -> 单片机：[波特率]，校验通过，保持新波特率
+OP_FALLBACK = 0x07      # OpenMV -> 单片机：[基础波特率]，回到基础波特率
+# 单片机一端的规则：ACCEPT后VERIFY_TIMEOUT内没有收到COMMIT、
+# 或COMMIT后LINK_TIMEOUT内没有收到任何有效帧时，自行回到基础波特率。
+VERIFY_TIMEOUT = 2000
+LINK_TIMEOUT = 10000
+
+BAUD_RATES = (2000000, 921600, 460800, 230400)  # 由高到低依次尝试
+
+HANDSHAKE_TIMEOUT = 200     # 等待ACCEPT/REJECT（ms）
+SWITCH_DELAY = 20           # 收到ACCEPT后等待对方切换的时间（ms）
+ECHO_COUNT = 8              # 协商时的回环帧数
+ECHO_SIZE = 32              # 回环测试数据长度
+ECHO_TIMEOUT = 50           # 协商时每个回环帧的等待时间（ms）
+KEEPALIVE = 2000            # 高波特率下的回环间隔（ms）
+ERROR_LIMIT = 0.05          # 错误率上限
+WINDOW = 10                 # 每WINDOW次回环计算一次错误率
+MIN_SAMPLES = 5             # 错误率计算的最少帧数
+RETRY_MIN = 5000            # 协商失败后重试间隔（ms），每次失败加倍
+RETRY_MAX = 300000
+
+# 链路状态
+L_BASE = 0      # 基础波特率
+L_ACTIVE = 1    # 高波特率
+
+
+def crc16(data, crc=0xFFFF):
+    """CRC16-CCITT（多项式0x1021）"""
+    for b in data:
+        crc ^= b << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+            crc &= 0xFFFF
+    return crc
+
+
+def echo_pattern(seq):
+    """回环测试数据：序号 + 覆盖全部字节值的伪随机序列（含帧头帧尾字节）"""
+    data = bytearray(2 + ECHO_SIZE)
+    data[0] = (seq >> 8) & 0xff
+    data[1] = seq & 0xff
+    for i in range(ECHO_SIZE):
+        data[2 + i] = (seq * 37 + i * 73 + 0xE7) & 0xff
+    return data
+
+
+def _u32(data):
+    return (data[0] << 24) | (data[1] << 16) | (data[2] << 8) | data[3]
+
+
+class LinkManager:
+    """
+    串口链路管理
+
+    启动后以基础波特率发送PROPOSE，对方接受后双方切换，发送ECHO_COUNT个带CRC的回环帧，
+    错误不超过ERROR_LIMIT时发送COMMIT，否则回到基础波特率并在稍后尝试下一个较低的波特率。
+    高波特率运行期间定期发送回环帧，按回环失败、CRC错误、命令通道的坏帧统计错误率，
+    超过上限时自动回退（对方在LINK_TIMEOUT内收不到有效帧也会回退，不会两端失配）。
+
+    协商过程是阻塞的（最多约HANDSHAKE_TIMEOUT + ECHO_COUNT×ECHO_TIMEOUT），只在启动和重试时进行；
+    运行期间的回环检查不阻塞。
+    """
+
+    def __init__(self, channel, target_baud=UART_BAUD, port=uart, base_baud=UART_BAUD,
+                 error_limit=ERROR_LIMIT):
+        """
+        Args:
+            channel: CommandChannel实例（接收链路帧）
+            target_baud (int): 期望的最高波特率，等于base_baud时不协商
+            port: 串口对象
+            base_baud (int): 基础波特率（上电时双方的波特率）
+            error_limit (float): 错误率上限
+        """
+        self.channel = channel
+        self.uart = port
+        self.base_baud = base_baud
+        self.error_limit = error_limit
+        self.baud = base_baud
+        self.state = L_BASE
+        self.reply = None
+        channel.register_frame(LINK_FRAME, self._on_frame)
+        channel.register(CMD_LINK_STATUS, self._cmd_status)
+
+        # 统计
+        self.negotiations = 0
+        self.fallbacks = 0
+        self.echo_sent = 0
+        self.echo_ok = 0
+        self.crc_errors = 0
+        self.error_rate = 0.0
+
+        # 运行期间的回环检查
+        self.seq = 0
+        self.pending = None         # 等待应答的回环数据
+        self.last_keepalive = ticks_ms()
+        self._reset_window()
+
+        self.set_target(target_baud)
+
+    def set_target(self, target_baud):
+        """设置期望波特率（下一次poll时开始协商）"""
+        self.target_baud = target_baud
+        self.candidates = [b for b in BAUD_RATES if self.base_baud < b <= target_baud]
+        if target_baud > self.base_baud and target_baud not in self.candidates:
+            self.candidates.insert(0, target_baud)
+        if self.state == L_ACTIVE and self.baud != target_baud:
+            self.fallback()
+        self.candidate = 0
+        self.retry_ms = RETRY_MIN
+        self.next_attempt = ticks_ms()
+
+    # ---------------- 帧收发 ----------------
+
+    def _send(self, op, data=b""):
+        body = bytearray([op]) + bytearray(data)
+        crc = crc16(body)
+        length = len(body) + 2
+        send_custom_packet(LINK_FRAME, bytearray([(length >> 8) & 0xff, length & 0xff]) + body
+                           + bytearray([(crc >> 8) & 0xff, crc & 0xff]), trace=False)
+
+    def _on_frame(self, body):
+        if len(body) < 3 or crc16(body[:-2]) != ((body[-2] << 8) | body[-1]):
+            self.crc_errors += 1
+            self.window_errors += 1
+            return
+        op = body[0]
+        data = bytes(body[1:-2])
+        if op == OP_ECHO_REPLY and self.pending is not None:
+            # 运行期间的回环应答
+            self.window_total += 1
+            if data == self.pending:
+                self.echo_ok += 1
+            else:
+                self.window_errors += 1
+            self.pending = None
+            return
+        self.reply = (op, data)
+
+    def _wait(self, ops, timeout):
+        """阻塞等待指定操作的链路帧（期间照常处理命令）"""
+        start = ticks_ms()
+        while ticks_elapsed(start) < timeout:
+            self.channel.poll()
+            if self.reply is not None and self.reply[0] in ops:
+                reply = self.reply
+                self.reply = None
+                return reply
+            time.sleep_ms(1)
+        return None
+
+    def _set_baud(self, baud):
+        self.uart.init(baud, timeout_char=200)
+        self.baud = baud
+        self.channel.reset()
+
+    # ---------------- 协商 ----------------
+
+    def negotiate(self, baud):
+        """
+        协商并校验一个波特率
+
+        Returns:
+            bool: 是否切换成功
+        """
+        self.negotiations += 1
+        self.reply = None
+        self._send(OP_PROPOSE, u32_bytes(baud))
+        reply = self._wait((OP_ACCEPT, OP_REJECT), HANDSHAKE_TIMEOUT)
+        if reply is not None and reply[0] == OP_REJECT:
+            print(f"波特率{baud}被拒绝")
+            return False
+        if reply is None or _u32(reply[1]) != baud:
+            # 对方可能已经接受并切换（ACCEPT丢失或是之前的应答），等它超时回退后再尝试
+            self.next_attempt = time.ticks_add(ticks_ms(), VERIFY_TIMEOUT)
+            print(f"波特率{baud}无应答")
+            return False
+
+        time.sleep_ms(SWITCH_DELAY)
+        self._set_baud(baud)
+        ok = 0
+        for _ in range(ECHO_COUNT):
+            pattern = echo_pattern(self.seq)
+            self.seq = (self.seq + 1) & 0xffff
+            self._send(OP_ECHO, pattern)
+            reply = self._wait((OP_ECHO_REPLY,), ECHO_TIMEOUT)
+            if reply is not None and reply[1] == pattern:
+                ok += 1
+        self.echo_sent += ECHO_COUNT
+        self.echo_ok += ok
+        self.error_rate = (ECHO_COUNT - ok) / ECHO_COUNT
+        if self.error_rate > self.error_limit:
+            # 不发送COMMIT，对方超时后自行回到基础波特率，之前不能再发送PROPOSE
+            self._set_baud(self.base_baud)
+            self.next_attempt = time.ticks_add(ticks_ms(), VERIFY_TIMEOUT)
+            print(f"波特率{baud}校验失败: {ok}/{ECHO_COUNT}")
+            return False
+
+        self._send(OP_COMMIT, u32_bytes(baud))
+        self.state = L_ACTIVE
+        self.pending = None
+        self.last_keepalive = ticks_ms()
+        self._reset_window()
+        print(f"串口波特率: {baud}")
+        return True
+
+    def fallback(self):
+        """回到基础波特率，稍后尝试下一个较低的波特率"""
+        self._send(OP_FALLBACK, u32_bytes(self.base_baud))
+        time.sleep_ms(SWITCH_DELAY)
+        self._set_baud(self.base_baud)
+        self.state = L_BASE
+        self.pending = None
+        self.fallbacks += 1
+        self.candidate += 1
+        # 对方可能没有收到FALLBACK，等它超时回退后再协商
+        self.next_attempt = time.ticks_add(ticks_ms(), LINK_TIMEOUT)
+        print(f"串口回退到{self.base_baud} (错误率{self.error_rate:.2f})")
+
+    # ---------------- 每帧调用 ----------------
+
+    def poll(self):
+        """
+        每帧调用（在commands.poll()之后）
+
+        Returns:
+            bool: 波特率是否改变
+        """
+        now = ticks_ms()
+        if self.state == L_ACTIVE:
+            return self._check_active(now)
+
+        if not self.candidates or ticks_elapsed(self.next_attempt, now) < 0:
+            return False
+        if self.candidate >= len(self.candidates):
+            # 全部失败，从最高的重新开始
+            self.candidate = 0
+        if self.negotiate(self.candidates[self.candidate]):
+            self.retry_ms = RETRY_MIN
+            return True
+        self.candidate += 1
+        if self.candidate >= len(self.candidates):
+            # 所有波特率都失败，等待一段时间后重试
+            self.next_attempt = time.ticks_add(now, self.retry_ms)
+            self.retry_ms = min(RETRY_MAX, self.retry_ms * 2)
+        return False
+
+    def _reset_window(self):
+        self.window_count = 0
+        self.window_total = 0
+        self.window_errors = 0
+        self.window_frames = self.channel.frames
+        self.window_bad = self.channel.bad_frames
+
+    def _check_active(self, now):
+        if ticks_elapsed(self.last_keepalive, now) < KEEPALIVE:
+            return False
+        self.last_keepalive = now
+        if self.pending is not None:
+            # 上一个回环帧在整个间隔内没有应答
+            self.window_total += 1
+            self.window_errors += 1
+        self.pending = echo_pattern(self.seq)
+        self.seq = (self.seq + 1) & 0xffff
+        self._send(OP_ECHO, self.pending)
+        self.echo_sent += 1
+
+        self.window_count += 1
+        if self.window_count < WINDOW:
+            return False
+        bad = self.channel.bad_frames - self.window_bad
+        total = self.window_total + (self.channel.frames - self.window_frames) + bad
+        errors = self.window_errors + bad
+        if total >= MIN_SAMPLES:
+            self.error_rate = errors / total
+        self._reset_window()
+        if self.error_rate > self.error_limit:
+            self.fallback()
+            return True
+        return False
+
+    # ---------------- 状态 ----------------
+
+    def status_bytes(self):
+        """[状态] + 波特率 + 协商次数 + 回退次数 + 回环发送 + 回环成功 + CRC错误 + 错误率×1000（各4字节）"""
+        data = bytearray([self.state])
+        for v in (self.baud, self.negotiations, self.fallbacks, self.echo_sent, self.echo_ok,
+                  self.crc_errors, int(self.error_rate * 1000)):
+            data += u32_bytes(v)
+        return data
+
+    def _cmd_status(self, args):
+        return self.status_bytes()
+
+    def get_status_text(self):
+        return f"{self.baud} E:{self.error_rate:.2f}"
@@ -15,6 +15,65 @@ def get_unix_timestamp():
     dt = pyb.RTC().datetime()
     return time.mktime((dt[0], dt[1], dt[2], dt[4], dt[5], dt[6], 0, 0))
 
+def ticks_ms():
+    """毫秒计时（会回绕），只能用ticks_elapsed求差"""
+    return time.ticks_ms()
+
+def ticks_elapsed(start, end=None):
+    """
+    回绕安全的时间差（ms）
+
+    Args:
+        start: ticks_ms()的返回值
+        end: ticks_ms()的返回值，默认取当前时间
+
+    Returns:
+        int: end - start
+    """
+    if end is None:
+        end = time.ticks_ms()
+    return time.ticks_diff(end, start)
+
+class MinuteTicker:
+    """
+    RTC分钟变化通知
+
+    用RTC唤醒中断在每个整分钟置位标志，主循环只检查标志，不必每帧读取RTC。
+    每次触发后按当前秒数重新设定唤醒时间，保持与整分钟对齐。
+    """
+
+    def __init__(self):
+        self.rtc = pyb.RTC()
+        self.fired = False
+        self._arm()
+
+    def _callback(self, rtc):
+        # 中断上下文：只置位标志
+        self.fired = True
+
+    def _arm(self):
+        second = self.rtc.datetime()[6]
+        self.rtc.wakeup((60 - second) * 1000, self._callback)
+
+    def poll(self):
+        """
+        Returns:
+            tuple: 分钟变化后的rtc.datetime()，未变化时返回None
+        """
+        if not self.fired:
+            return None
+        self.fired = False
+        self._arm()
+        return self.rtc.datetime()
+
+    def resync(self):
+        """RTC唤醒定时器被其他用途（如pyb.stop()唤醒）占用后，重新对齐并检查一次"""
+        self.fired = True
+        self._arm()
+
+    def stop(self):
+        self.rtc.wakeup(None)
+
 if __name__ == "__main__":
     # 测试时间设置和获取
     set_time(2023, 10, 1, 12, 0, 0)
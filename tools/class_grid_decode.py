@@ -0,0 +1,211 @@
+# class_grid_decode.py - 类别网格帧（类型6）参考解码器（上位机/单片机移植参考）
+#
+# 只用Python内置类型，便于按同样的步骤移植到STM32的C代码。
+# 帧格式见 openmv/class_grid.py。
+#
+# 用法示例：
+#   python tools/class_grid_decode.py uart_capture.bin
+#   python tools/class_grid_decode.py uart_capture.bin --show --ref 141 215
+#   python tools/class_grid_decode.py uart_capture.bin --labels background pig feces --class 2
+#   python tools/class_grid_decode.py uart_capture.bin --trace
+
+import argparse
+
+FRAME_TYPE = 6
+GRID_ROI = 0x80     # 每格位数字节的最高位：网格只覆盖跟踪区域（区域外没有数据）
+TRACE_SIZE = 4      # 参数latency_trace开启时帧尾前附加的追踪标记（帧号2 + 拍照时间低16位2）
+
+
+def rle_decode(data, size):
+    """
+    零游程解码（与板端feces_heatmap.rle_encode对应）
+
+    Returns:
+        bytearray: 解码结果，长度为size
+    """
+    out = bytearray(size)
+    i = pos = 0
+    while i < len(data) and pos < size:
+        if data[i] == 0:
+            pos += data[i + 1]
+            i += 2
+        else:
+            out[pos] = data[i]
+            pos += 1
+            i += 1
+    return out
+
+
+def unpack_cells(packed, count, bits):
+    """打包字节 -> 每格的值（每字节从高位开始）"""
+    per_byte = 8 // bits
+    mask = (1 << bits) - 1
+    return [(packed[n // per_byte] >> (8 - bits * (n % per_byte + 1))) & mask for n in range(count)]
+
+
+def decode_payload(payload):
+    """
+    解析类型6帧的数据部分
+
+    Returns:
+        dict: {'frame_id', 'cols', 'rows', 'bits', 'roi', 'x_offset', 'y_offset', 'cell',
+               'grids': [类别1网格, 类别2网格, ...]}，网格为按行排列的列表；
+               roi为True时网格只覆盖跟踪区域，区域外的目标不在本帧中
+    """
+    length = (payload[0] << 8) | payload[1]
+    body = payload[2:2 + length]
+    if len(body) < length or length < 12:
+        raise Exception("帧长度错误")
+    frame = {
+        "frame_id": (body[0] << 8) | body[1],
+        "cols": body[2],
+        "rows": body[3],
+        "bits": body[4] & ~GRID_ROI,
+        "roi": bool(body[4] & GRID_ROI),
+        "x_offset": (body[6] << 8) | body[7],
+        "y_offset": (body[8] << 8) | body[9],
+        "cell": ((body[10] << 8) | body[11]) / 16,
+        "grids": [],
+    }
+    classes = body[5]
+    bits = frame["bits"]
+    if bits not in (1, 2, 4, 8):
+        raise Exception(f"每格位数错误: {bits}")
+    count = frame["cols"] * frame["rows"]
+    size = (count * bits + 7) // 8
+    i = 12
+    for _ in range(classes):
+        n = (body[i] << 8) | body[i + 1]
+        packed = rle_decode(body[i + 2:i + 2 + n], size)
+        frame["grids"].append(unpack_cells(packed, count, bits))
+        i += 2 + n
+    return frame
+
+
+def find_frames(raw, trace=False):
+    """在串口抓包数据中查找全部完整的类型6帧，返回解码结果列表（trace为True时跳过帧尾前的追踪标记）"""
+    header = 0xF0 + FRAME_TYPE
+    footer = 0xE0 + FRAME_TYPE
+    tail = TRACE_SIZE if trace else 0
+    frames = []
+    i = 0
+    while i < len(raw) - 3:
+        if raw[i] == header:
+            length = (raw[i + 1] << 8) | raw[i + 2]
+            end = i + 3 + length + tail
+            if end < len(raw) and raw[end] == footer:
+                try:
+                    frame = decode_payload(raw[i + 1:end - tail])
+                    frame["size"] = length + 4 + tail
+                    frames.append(frame)
+                    i = end + 1
+                    continue
+                except Exception:
+                    pass
+        i += 1
+    return frames
+
+
+def grid_targets(frame, class_index):
+    """
+    把某个类别的网格分成8连通区域，计算每个区域按网格值加权的中心（原图坐标）
+
+    Args:
+        frame (dict): decode_payload的结果
+        class_index (int): 类别序号（1为第一个非背景类别）
+
+    Returns:
+        list: [(cx, cy, weight, cells), ...]，按权重从大到小排列
+    """
+    cols, rows = frame["cols"], frame["rows"]
+    grid = frame["grids"][class_index - 1]
+    seen = [False] * len(grid)
+    targets = []
+    for start, v in enumerate(grid):
+        if not v or seen[start]:
+            continue
+        seen[start] = True
+        stack = [start]
+        sw = sx = sy = cells = 0
+        while stack:
+            n = stack.pop()
+            x, y = n % cols, n // cols
+            w = grid[n]
+            sw += w
+            sx += w * (x + 0.5)
+            sy += w * (y + 0.5)
+            cells += 1
+            for dy in (-1, 0, 1):
+                for dx in (-1, 0, 1):
+                    xx, yy = x + dx, y + dy
+                    if 0 <= xx < cols and 0 <= yy < rows:
+                        m = yy * cols + xx
+                        if grid[m] and not seen[m]:
+                            seen[m] = True
+                            stack.append(m)
+        targets.append((sx / sw * frame["cell"] + frame["x_offset"],
+                        sy / sw * frame["cell"] + frame["y_offset"], sw, cells))
+    targets.sort(key=lambda t: -t[2])
+    return targets
+
+
+def choose_target(targets, ref):
+    """示例决策：选离参考点（喷嘴对准点）最近的目标"""
+    if not targets:
+        return None
+    return min(targets, key=lambda t: (t[0] - ref[0]) ** 2 + (t[1] - ref[1]) ** 2)
+
+
+def show_grid(frame, class_index):
+    """以字符显示网格（1位为#，多位为十六进制值的高4位）"""
+    cols = frame["cols"]
+    grid = frame["grids"][class_index - 1]
+    shift = max(0, frame["bits"] - 4)
+    for y in range(frame["rows"]):
+        row = grid[y * cols:(y + 1) * cols]
+        if frame["bits"] == 1:
+            print("".join("#" if v else "." for v in row))
+        else:
+            print("".join(f"{max(1, v >> shift):x}" if v else "." for v in row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="类别网格帧解码")
+    parser.add_argument("input", help="串口抓包文件（原始字节）")
+    parser.add_argument("--labels", nargs="+", default=["background", "pig", "feces"], help="模型标签")
+    parser.add_argument("--class", dest="class_index", type=int, default=2, help="选择目标的类别序号")
+    parser.add_argument("--ref", type=int, nargs=2, default=(141, 215), help="参考点（喷嘴对准点）")
+    parser.add_argument("--show", action="store_true", help="显示网格")
+    parser.add_argument("--fps", type=float, default=10.0, help="估算带宽使用的帧率")
+    parser.add_argument("--baud", type=int, default=115200)
+    parser.add_argument("--trace", action="store_true", help="帧尾前有4字节追踪标记（参数latency_trace）")
+    args = parser.parse_args()
+
+    with open(args.input, "rb") as f:
+        frames = find_frames(f.read(), args.trace)
+    if not frames:
+        raise Exception("未找到完整的类别网格帧")
+
+    for frame in frames:
+        print(f"--- 帧{frame['frame_id']} {frame['cols']}x{frame['rows']} {frame['bits']}位 "
+              f"{frame['size']}字节" + (" 跟踪区域" if frame["roi"] else "") + " ---")
+        for c in range(1, len(frame["grids"]) + 1):
+            name = args.labels[c] if c < len(args.labels) else f"class_{c}"
+            targets = grid_targets(frame, c)
+            print(f"{name}: " + ", ".join(f"({t[0]:.0f},{t[1]:.0f}) w={t[2]}" for t in targets))
+            if args.show:
+                show_grid(frame, c)
+        best = choose_target(grid_targets(frame, args.class_index), args.ref)
+        if best:
+            print(f"目标: cx={best[0]:.0f}, cy={best[1]:.0f}")
+
+    sizes = [frame["size"] for frame in frames]
+    mean = sum(sizes) / len(sizes)
+    # 8N1每字节10位
+    usage = mean * args.fps * 10 / args.baud
+    print(f"帧数: {len(frames)} 平均 {mean:.1f} 字节 最大 {max(sizes)} 字节，"
+          f"{args.fps:g}帧/秒时占用 {args.baud} 波特率的 {usage:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+# clean_stream.py - 流式背景差分清洁度引擎（上位机）
+#
+# 由 test.ipynb 的单帧原型扩展而来：
+#   灰度 -> 与背景差分 -> 二值化 -> 去掉Otsu分割出的猪 -> 统计粪尿像素占比
+# 区别在于背景模型持续更新（只在无猪且未变化的像素上更新），
+# 所有中间结果使用预分配缓冲区原地计算，采集放在独立线程中。
+#
+# 用法示例：
+#   python tools/clean_stream.py --source 0
+#   python tools/clean_stream.py --source pen.mp4 --background background.png --csv clean.csv
+
+import os
+import csv
+import time
+import queue
+import argparse
+import threading
+
+import numpy as np
+
+T0 = 0.05              # 清洁度阈值（与test.ipynb一致）
+DIFF_THRESHOLD = 50    # 差分二值化阈值
+GRAY_WEIGHTS = np.array([0.114, 0.587, 0.299], dtype=np.float32)  # BGR -> 灰度
+
+
+def otsu_threshold(hist):
+    """
+    由256级直方图计算Otsu阈值
+
+    Args:
+        hist (np.ndarray): 长度256的像素计数
+
+    Returns:
+        int: 阈值
+    """
+    hist = hist.astype(np.float64)
+    levels = np.arange(256, dtype=np.float64)
+    w0 = np.cumsum(hist)
+    w1 = w0[-1] - w0
+    m0 = np.cumsum(hist * levels)
+    mean_total = m0[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mean_total * w0 - m0 * w0[-1]) ** 2 / (w0 * w1)
+    between[~np.isfinite(between)] = 0
+    return int(np.argmax(between))
+
+
+class FrameReader:
+    """独立线程采集视频帧；队列满时丢弃最旧的帧，保证处理的总是最新画面"""
+
+    def __init__(self, source, max_queue=2, realtime=None):
+        """
+        Args:
+            source: 摄像头编号或视频文件路径
+            max_queue (int): 缓冲帧数
+            realtime (bool): 是否丢帧追赶最新画面，默认摄像头丢帧、视频文件不丢帧
+        """
+        import cv2
+
+        self.capture = cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+        if not self.capture.isOpened():
+            raise Exception(f'无法打开视频源"{source}"')
+        self.realtime = str(source).isdigit() if realtime is None else realtime
+        self.frames = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while self.running:
+            ok, frame = self.capture.read()
+            if not ok:
+                break
+            item = (time.time(), frame)
+            if self.realtime:
+                while True:
+                    try:
+                        self.frames.put_nowait(item)
+                        break
+                    except queue.Full:
+                        try:
+                            self.frames.get_nowait()
+                            self.dropped += 1
+                        except queue.Empty:
+                            pass
+            else:
+                self.frames.put(item)
+        self.frames.put(None)
+
+    def __iter__(self):
+        while True:
+            item = self.frames.get()
+            if item is None:
+                return
+            yield item
+
+    def close(self):
+        self.running = False
+        self.capture.release()
+
+
+class CleanlinessEngine:
+    """
+    流式清洁度计算
+
+    背景模型两种更新方式：
+        'mean'   - 滑动平均 bg += alpha * (gray - bg)
+        'median' - 近似滑动中值 bg += step * sign(gray - bg)，对偶尔经过的猪更稳健
+    两种方式都只在无猪、且当前未判为粪尿的像素上更新，避免粪尿被吸收进背景。
+    """
+
+    def __init__(self, shape, background=None, mode="mean", alpha=0.02, step=1.0,
+                 diff_threshold=DIFF_THRESHOLD, clean_threshold=T0):
+        """
+        Args:
+            shape (tuple): 帧尺寸 (h, w)
+            background (np.ndarray): 初始背景灰度图，None表示使用第一帧
+            mode (str): 'mean' 或 'median'
+            alpha (float): 滑动平均系数
+            step (float): 近似中值每帧步长（灰度级）
+            diff_threshold (int): 差分二值化阈值
+            clean_threshold (float): 粪尿像素占比阈值
+        """
+        if mode not in ("mean", "median"):
+            raise Exception(f"未知的背景模式: {mode}")
+        h, w = shape
+        self.mode = mode
+        self.alpha = alpha
+        self.step = step
+        self.diff_threshold = diff_threshold
+        self.clean_threshold = clean_threshold
+
+        # 预分配缓冲区，处理过程中不再申请内存
+        self.gray = np.empty((h, w), dtype=np.float32)
+        self.gray_u8 = np.empty((h, w), dtype=np.uint8)
+        self.background = np.empty((h, w), dtype=np.float32)
+        self.diff = np.empty((h, w), dtype=np.float32)
+        self.update = np.empty((h, w), dtype=np.float32)
+        self.changed = np.empty((h, w), dtype=bool)
+        self.pig = np.empty((h, w), dtype=bool)
+        self.feces = np.empty((h, w), dtype=bool)
+        self.stable = np.empty((h, w), dtype=bool)
+        self.total_pixels = h * w
+        self.initialized = background is not None
+        if background is not None:
+            self.background[...] = background
+
+    def _to_gray(self, frame):
+        """BGR帧 -> 灰度（写入self.gray）"""
+        if frame.ndim == 2:
+            self.gray[...] = frame
+        else:
+            np.dot(frame, GRAY_WEIGHTS, out=self.gray)
+        np.clip(self.gray, 0, 255, out=self.gray)
+        self.gray_u8[...] = self.gray
+
+    def process(self, frame):
+        """
+        处理一帧
+
+        Args:
+            frame (np.ndarray): BGR或灰度帧
+
+        Returns:
+            dict: {'ratio', 'pig_ratio', 'dirty'}
+        """
+        self._to_gray(frame)
+        if not self.initialized:
+            self.background[...] = self.gray
+            self.initialized = True
+
+        # 差分并二值化
+        np.subtract(self.gray, self.background, out=self.diff)
+        np.abs(self.diff, out=self.diff)
+        np.greater(self.diff, self.diff_threshold, out=self.changed)
+
+        # Otsu分割猪（亮区域）
+        thr = otsu_threshold(np.bincount(self.gray_u8.ravel(), minlength=256))
+        np.greater(self.gray_u8, thr, out=self.pig)
+
+        # 粪尿 = 发生变化且不是猪的像素
+        np.logical_not(self.pig, out=self.stable)
+        np.logical_and(self.changed, self.stable, out=self.feces)
+
+        ratio = np.count_nonzero(self.feces) / self.total_pixels
+        pig_ratio = np.count_nonzero(self.pig) / self.total_pixels
+
+        # 只在无猪且未变化的像素上更新背景
+        np.logical_not(self.changed, out=self.changed)
+        np.logical_and(self.stable, self.changed, out=self.stable)
+        np.subtract(self.gray, self.background, out=self.update)
+        if self.mode == "mean":
+            self.update *= self.alpha
+        else:
+            np.sign(self.update, out=self.update)
+            self.update *= self.step
+        self.update *= self.stable
+        self.background += self.update
+
+        return {"ratio": ratio, "pig_ratio": pig_ratio, "dirty": ratio >= self.clean_threshold}
+
+
+def load_background(path, shape):
+    """读取背景图并转换为与视频帧同尺寸的灰度图"""
+    from PIL import Image
+
+    with Image.open(path) as img:
+        img = img.convert("L")
+        if img.size != (shape[1], shape[0]):
+            img = img.resize((shape[1], shape[0]), Image.BILINEAR)
+        return np.asarray(img, dtype=np.float32)
+
+
+def run(source, background_path=None, csv_path=None, mode="mean", alpha=0.02, every=30):
+    """
+    处理视频源并输出清洁度时间序列
+
+    Args:
+        source: 摄像头编号或视频文件路径
+        background_path (str): 初始背景图，None表示使用第一帧
+        csv_path (str): 时间序列输出文件
+        mode (str): 背景模式
+        alpha (float): 滑动平均系数
+        every (int): 每隔多少帧打印一次
+
+    Returns:
+        list: [(frame_index, timestamp, ratio, pig_ratio, dirty), ...]
+    """
+    reader = FrameReader(source)
+    engine = None
+    series = []
+    start = time.perf_counter()
+    try:
+        for index, (timestamp, frame) in enumerate(reader):
+            if engine is None:
+                shape = frame.shape[:2]
+                background = load_background(background_path, shape) if background_path else None
+                engine = CleanlinessEngine(shape, background, mode, alpha)
+            result = engine.process(frame)
+            series.append((index, timestamp, result["ratio"], result["pig_ratio"], result["dirty"]))
+            if index % every == 0:
+                fps = (index + 1) / (time.perf_counter() - start)
+                status = "猪舍需要清扫" if result["dirty"] else "猪舍洁净"
+                print(f"帧{index}: 占比={result['ratio']:.4f} {status} FPS={fps:.1f} 丢帧={reader.dropped}")
+    finally:
+        reader.close()
+
+    if csv_path:
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", "timestamp", "ratio", "pig_ratio", "dirty"])
+            writer.writerows(series)
+    return series
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式背景差分清洁度计算")
+    parser.add_argument("--source", default="0", help="摄像头编号或视频文件路径")
+    parser.add_argument("--background", default=None, help="初始背景图，如 background.png")
+    parser.add_argument("--csv", default=None, help="保存时间序列的CSV文件")
+    parser.add_argument("--mode", choices=("mean", "median"), default="mean")
+    parser.add_argument("--alpha", type=float, default=0.02)
+    args = parser.parse_args()
+
+    if args.background and not os.path.isfile(args.background):
+        raise Exception(f'背景图"{args.background}"不存在')
+    run(args.source, args.background, args.csv, args.mode, args.alpha)
+
+
+if __name__ == "__main__":
+    main()
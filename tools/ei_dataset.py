@@ -0,0 +1,124 @@
+# ei_dataset.py - Edge Impulse 导出数据集读取模块（上位机）
+
+import os
+import json
+
+import numpy as np
+
+
+LABELS_FILE = "info.labels"
+
+
+def find_labels_file(dataset_dir):
+    """
+    查找数据集目录下的info.labels文件
+
+    Args:
+        dataset_dir (str): 数据集目录（如 pig2.0-export/testing 或 pig-home-export）
+
+    Returns:
+        str: info.labels文件路径
+    """
+    path = os.path.join(dataset_dir, LABELS_FILE)
+    if not os.path.isfile(path):
+        raise Exception(f'数据集目录"{dataset_dir}"下没有{LABELS_FILE}')
+    return path
+
+
+def load_samples(dataset_dir, category=None):
+    """
+    读取info.labels中的样本列表
+
+    Args:
+        dataset_dir (str): 数据集目录
+        category (str): 只保留指定划分 ('training', 'testing')，None表示全部
+
+    Returns:
+        list: 样本列表，每项为 {'path', 'name', 'category', 'width', 'height', 'boxes'}，
+              width/height为图片尺寸（同一数据集中可能有多种尺寸），boxes为 [(label, x, y, w, h), ...]
+    """
+    with open(find_labels_file(dataset_dir), "r", encoding="utf-8") as f:
+        info = json.load(f)
+
+    samples = []
+    for item in info["files"]:
+        if category and item.get("category") != category:
+            continue
+        path = os.path.join(dataset_dir, item["path"])
+        if not os.path.isfile(path):
+            # 部分导出文件名编码异常，找不到图片的样本直接跳过
+            print(f"跳过缺失图片: {path}")
+            continue
+        boxes = [
+            (b["label"], b["x"], b["y"], b["width"], b["height"])
+            for b in item.get("boundingBoxes", [])
+        ]
+        width, height = image_size(path)
+        samples.append({
+            "path": path,
+            "name": item.get("name", ""),
+            "category": item.get("category", ""),
+            "width": width,
+            "height": height,
+            "boxes": boxes,
+        })
+
+    # 固定顺序，保证缓存和测试划分可复现
+    samples.sort(key=lambda s: s["path"])
+    return samples
+
+
+def load_labels(labels_path):
+    """
+    读取模型的labels.txt（与板端ModelRegistry.labels一致）
+
+    Args:
+        labels_path (str): 标签文件路径
+
+    Returns:
+        list: 标签列表，第0个为background
+    """
+    with open(labels_path, "r", encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+
+def image_size(path):
+    """
+    读取图片尺寸（只读文件头，不解码）
+
+    Returns:
+        tuple: (w, h)
+    """
+    from PIL import Image
+
+    with Image.open(path) as img:
+        return img.size
+
+
+def load_rgb(path):
+    """
+    读取图片为RGB数组
+
+    Args:
+        path (str): 图片路径
+
+    Returns:
+        np.ndarray: (H, W, 3) uint8
+    """
+    from PIL import Image
+
+    with Image.open(path) as img:
+        return np.asarray(img.convert("RGB"), dtype=np.uint8)
+
+
+def load_rgb_batch(paths):
+    """
+    批量读取同尺寸图片
+
+    Args:
+        paths (list): 图片路径列表
+
+    Returns:
+        np.ndarray: (N, H, W, 3) uint8
+    """
+    return np.stack([load_rgb(p) for p in paths])
@@ -0,0 +1,141 @@
+# event_log_decode.py - 板端事件日志解码与汇总（上位机）
+#
+# 读取板端 evlog0.bin ~ evlogN.bin 分段文件，按序号顺序逐条输出记录，并按天汇总。
+#
+# 用法示例：
+#   python tools/event_log_decode.py /media/openmv --dump
+#   python tools/event_log_decode.py /media/openmv --prefix evlog
+
+import os
+import glob
+import struct
+import argparse
+from datetime import datetime, timedelta
+from collections import namedtuple, defaultdict
+
+RECORD_FORMAT = "<IIHBBi"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+CHECK_OFFSET = 11
+
+EVENT_NAMES = {
+    1: "boot",
+    2: "detect_start",
+    3: "detect_end",
+    4: "alarm",
+    5: "pump_on",
+    6: "pump_off",
+    7: "uart_fail",
+    8: "daily_reset",
+    9: "rate_tier",
+    10: "scene",
+    11: "link",
+    12: "snapshot",
+}
+
+Record = namedtuple("Record", "seq unix ms event name value")
+
+# MicroPython的time.mktime以2000-01-01为纪元，RTC为本地时间
+EPOCH = datetime(2000, 1, 1)
+
+
+def record_check(rec):
+    """与板端event_log.record_check一致"""
+    return (~(sum(rec) - rec[CHECK_OFFSET])) & 0xff
+
+
+def iter_segment(path):
+    """
+    逐条读取一个分段中有效且序号连续的记录
+
+    Yields:
+        Record
+    """
+    expected = None
+    with open(path, "rb") as f:
+        while True:
+            rec = f.read(RECORD_SIZE)
+            if len(rec) < RECORD_SIZE or rec[CHECK_OFFSET] != record_check(rec):
+                return
+            seq, unix, ms, event, _, value = struct.unpack(RECORD_FORMAT, rec)
+            if expected is not None and seq != expected:
+                return
+            expected = seq + 1
+            yield Record(seq, unix, ms, event, EVENT_NAMES.get(event, f"event_{event}"), value)
+
+
+def iter_records(directory, prefix="evlog"):
+    """
+    按序号顺序读取全部分段（最旧的分段在前）
+
+    Yields:
+        Record
+    """
+    segments = []
+    for path in glob.glob(os.path.join(directory, f"{prefix}*.bin")):
+        first = next(iter_segment(path), None)
+        if first is not None:
+            segments.append((first.seq, path))
+    last = None
+    for _, path in sorted(segments):
+        for record in iter_segment(path):
+            # 轮转覆盖后旧分段的开头可能与新分段重叠，跳过重复序号
+            if last is not None and record.seq <= last:
+                continue
+            last = record.seq
+            yield record
+
+
+def summarize(records):
+    """
+    按天汇总事件
+
+    Returns:
+        dict: {日期: {'counts': {事件名: 次数}, 'detect_ms': [...], 'alarm_ms': max, 'pump_ms': 总运行时间}}
+    """
+    days = defaultdict(lambda: {"counts": defaultdict(int), "detect_ms": [], "alarm_ms": 0, "pump_ms": 0})
+    for r in records:
+        day = (EPOCH + timedelta(seconds=r.unix)).strftime("%Y-%m-%d")
+        d = days[day]
+        d["counts"][r.name] += 1
+        if r.name == "detect_end":
+            d["detect_ms"].append(r.value)
+        elif r.name == "alarm":
+            d["alarm_ms"] = max(d["alarm_ms"], r.value)
+        elif r.name == "pump_off":
+            d["pump_ms"] += r.value
+    return days
+
+
+def print_summary(days):
+    for day in sorted(days):
+        d = days[day]
+        counts = ", ".join(f"{k}={v}" for k, v in sorted(d["counts"].items()))
+        print(f"{day}: {counts}")
+        if d["detect_ms"]:
+            ms = d["detect_ms"]
+            print(f"    检测持续时间(ms): 次数={len(ms)} 平均={sum(ms) / len(ms):.0f} 最长={max(ms)}")
+        if d["alarm_ms"]:
+            print(f"    最长报警持续时间(ms): {d['alarm_ms']}")
+        if d["pump_ms"]:
+            print(f"    水泵累计运行(ms): {d['pump_ms']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="事件日志解码")
+    parser.add_argument("directory", help="分段文件所在目录（板端U盘或SD卡）")
+    parser.add_argument("--prefix", default="evlog")
+    parser.add_argument("--dump", action="store_true", help="逐条打印记录")
+    args = parser.parse_args()
+
+    def records():
+        for r in iter_records(args.directory, args.prefix):
+            if args.dump:
+                t = (EPOCH + timedelta(seconds=r.unix)).strftime("%Y-%m-%d %H:%M:%S")
+                print(f"{r.seq:>8} {t} {r.name:<13} {r.value}")
+            yield r
+
+    print_summary(summarize(records()))
+
+
+if __name__ == "__main__":
+    main()
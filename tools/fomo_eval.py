@@ -0,0 +1,540 @@
+# fomo_eval.py - FOMO热力图真值生成与评估模块（上位机）
+#
+# 用法示例：
+#   python tools/fomo_eval.py --dataset pig2.0-export/testing --model ei-pig2.0-openmv-v14
+#   python tools/fomo_eval.py --dataset pig2.0-export/testing --model ei-pig2.0-openmv-v14 --recorded ml_outputs.npz
+#   python tools/fomo_eval.py --dataset pig2.0-export/testing --model ei-pig2.0-openmv-v14 --workers 4
+#   python tools/fomo_eval.py --dataset pig2.0-export/testing --model ei-pig2.0-openmv-v14 --centroid \
+#       --color 18 61 -21 15 31 63
+
+import os
+import sys
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ei_dataset import load_samples, load_labels, load_rgb, find_labels_file
+
+DEFAULT_THRESHOLDS = (0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9)
+DEFAULT_CACHE_DIR = ".fomo_cache"
+
+
+def grid_geometry(img_w, img_h, ow, oh):
+    """
+    计算输出特征图与原图之间的映射关系，与板端FOMOModel.post_process一致
+
+    Args:
+        img_w, img_h (int): 原图尺寸
+        ow, oh (int): 输出特征图尺寸
+
+    Returns:
+        tuple: (scale, x_offset, y_offset)，原图坐标 = 网格坐标 * scale + offset
+    """
+    scale = min(img_w / ow, img_h / oh)
+    x_offset = (img_w - ow * scale) / 2
+    y_offset = (img_h - oh * scale) / 2
+    return scale, x_offset, y_offset
+
+
+def sample_geometry(samples, ow, oh):
+    """
+    每个样本按自身图片尺寸计算grid_geometry（数据集中可能混有不同尺寸的图片）
+
+    Returns:
+        np.ndarray: (N, 3) float64，每行为 (scale, x_offset, y_offset)
+    """
+    geometry = [grid_geometry(s["width"], s["height"], ow, oh) for s in samples]
+    return np.asarray(geometry, dtype=np.float64).reshape(-1, 3)
+
+
+def build_targets(samples, labels, out_shape):
+    """
+    将标注框批量转换为FOMO逐格真值 (N, oh, ow, oc)
+
+    每个框的中心点所在网格置为该类别，其余网格为背景（通道0），
+    与Edge Impulse训练FOMO时的中心点标注方式一致。
+
+    Args:
+        samples (list): load_samples返回的样本列表（按每个样本的width/height换算网格）
+        labels (list): 模型标签列表，第0个为background
+        out_shape (tuple): 输出特征图尺寸 (oh, ow)
+
+    Returns:
+        np.ndarray: (N, oh, ow, oc) uint8
+    """
+    oh, ow = out_shape
+    oc = len(labels)
+    geometry = sample_geometry(samples, ow, oh)
+    class_index = {name: i for i, name in enumerate(labels)}
+
+    # 所有框展开成平铺数组，一次性计算网格坐标
+    rows = [
+        (n, class_index[label], x + w / 2, y + h / 2)
+        for n, sample in enumerate(samples)
+        for label, x, y, w, h in sample["boxes"]
+        if label in class_index
+    ]
+    targets = np.zeros((len(samples), oh, ow, oc), dtype=np.uint8)
+    if rows:
+        boxes = np.asarray(rows, dtype=np.float64)
+        n = boxes[:, 0].astype(np.int64)
+        scale, x_offset, y_offset = geometry[n].T
+        gx = np.floor((boxes[:, 2] - x_offset) / scale).astype(np.int64)
+        gy = np.floor((boxes[:, 3] - y_offset) / scale).astype(np.int64)
+        # 中心点落在中心裁剪区域外的框不参与评估
+        keep = (gx >= 0) & (gx < ow) & (gy >= 0) & (gy < oh)
+        c = boxes[keep, 1].astype(np.int64)
+        targets[n[keep], gy[keep], gx[keep], c] = 1
+
+    targets[..., 0] = targets[..., 1:].max(axis=-1, initial=0) == 0
+    return targets
+
+
+def cached_targets(dataset_dir, labels, out_shape, category=None, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    带缓存的真值生成，缓存键由标注文件内容、各样本图片尺寸和网格参数决定
+
+    Returns:
+        tuple: (samples, targets)
+    """
+    samples = load_samples(dataset_dir, category)
+
+    key = hashlib.sha1()
+    with open(find_labels_file(dataset_dir), "rb") as f:
+        key.update(f.read())
+    sizes = [(s["width"], s["height"]) for s in samples]
+    key.update(repr((labels, sizes, tuple(out_shape), category)).encode("utf-8"))
+    cache_path = os.path.join(cache_dir, f"targets_{key.hexdigest()[:16]}.npz")
+
+    if os.path.isfile(cache_path):
+        return samples, np.load(cache_path)["targets"]
+
+    targets = build_targets(samples, labels, out_shape)
+    os.makedirs(cache_dir, exist_ok=True)
+    np.savez_compressed(cache_path, targets=targets)
+    return samples, targets
+
+
+def _interpreter_class():
+    """按优先级查找可用的TFLite解释器"""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tensorflow.lite import Interpreter
+            except ImportError:
+                raise Exception("未找到TFLite解释器，请安装 tflite-runtime / ai-edge-litert / tensorflow")
+    return Interpreter
+
+
+class TFLiteRunner:
+    """
+    上位机TFLite推理封装，预处理与板端ml模块一致：
+    按输出网格中心裁剪 -> 缩放到模型输入 -> 量化
+    """
+
+    def __init__(self, model_content):
+        """
+        Args:
+            model_content (bytes): trained.tflite文件内容
+        """
+        self.interpreter = _interpreter_class()(model_content=model_content)
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        _, self.ih, self.iw, self.ic = self.input["shape"]
+        _, self.oh, self.ow, self.oc = self.output["shape"]
+
+    def preprocess(self, rgb):
+        """原图 (H, W, 3) uint8 -> 模型输入张量"""
+        from PIL import Image
+
+        h, w = rgb.shape[:2]
+        scale, x_offset, y_offset = grid_geometry(w, h, self.ow, self.oh)
+        box = (
+            int(round(x_offset)), int(round(y_offset)),
+            int(round(x_offset + self.ow * scale)), int(round(y_offset + self.oh * scale)),
+        )
+        img = Image.fromarray(rgb).crop(box)
+        img = img.convert("L" if self.ic == 1 else "RGB").resize((self.iw, self.ih), Image.BILINEAR)
+        x = np.asarray(img, dtype=np.float32).reshape(1, self.ih, self.iw, self.ic)
+
+        dtype = self.input["dtype"]
+        in_scale, zero_point = self.input["quantization"]
+        if dtype == np.float32:
+            return x / 255.0
+        q = np.round(x / 255.0 / in_scale + zero_point)
+        info = np.iinfo(dtype)
+        return np.clip(q, info.min, info.max).astype(dtype)
+
+    def invoke(self, tensor):
+        """执行一次推理，返回反量化后的输出 (oh, ow, oc) float32"""
+        self.interpreter.set_tensor(self.input["index"], tensor)
+        self.interpreter.invoke()
+        out = self.interpreter.get_tensor(self.output["index"])[0]
+        out_scale, zero_point = self.output["quantization"]
+        if out.dtype != np.float32:
+            out = (out.astype(np.float32) - zero_point) * out_scale
+        return out
+
+    def predict(self, rgb):
+        return self.invoke(self.preprocess(rgb))
+
+
+# 进程池工作进程内的推理器（每个进程各自加载一份模型）
+_worker_runner = None
+
+
+def _init_worker(model_content):
+    global _worker_runner
+    _worker_runner = TFLiteRunner(model_content)
+
+
+def _predict_paths(paths):
+    return np.stack([_worker_runner.predict(load_rgb(p)) for p in paths])
+
+
+def predict_heatmaps(model_content, paths, workers=1, chunk_size=16):
+    """
+    对图片列表运行模型，得到热力图 (N, oh, ow, oc)
+
+    Args:
+        model_content (bytes): 模型文件内容
+        paths (list): 图片路径
+        workers (int): 进程数，1表示在当前进程内运行
+        chunk_size (int): 每个任务包含的图片数
+
+    Returns:
+        np.ndarray: (N, oh, ow, oc) float32，范围0-1
+    """
+    if workers <= 1:
+        runner = TFLiteRunner(model_content)
+        return np.stack([runner.predict(load_rgb(p)) for p in paths])
+
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_content,)) as pool:
+        return np.concatenate(list(pool.map(_predict_paths, chunks)))
+
+
+def load_recorded(path, samples=None):
+    """
+    读取板端记录的ml输出
+
+    支持 .npy（直接为 (N, oh, ow, oc)）或 .npz（键 'heatmaps'，可选键 'names'
+    为图片文件名，用于与样本对齐；导出数据集的name字段有重复，不能用作对齐键）。uint8数据视为0-255的置信度。
+
+    Returns:
+        np.ndarray: (N, oh, ow, oc) float32，范围0-1
+    """
+    data = np.load(path)
+    names = None
+    if isinstance(data, np.lib.npyio.NpzFile):
+        heatmaps = data["heatmaps"]
+        if "names" in data:
+            names = [str(n) for n in data["names"]]
+    else:
+        heatmaps = data
+
+    if heatmaps.ndim == 5:  # 板端输出带batch维 (N, 1, oh, ow, oc)
+        heatmaps = heatmaps[:, 0]
+    byte_scaled = heatmaps.dtype == np.uint8 or (heatmaps.size > 0 and float(heatmaps.max()) > 1.0)
+    heatmaps = heatmaps.astype(np.float32)
+    if byte_scaled:
+        heatmaps /= 255.0
+
+    if names is not None and samples is not None:
+        order = {name: i for i, name in enumerate(names)}
+        heatmaps = heatmaps[[order[os.path.basename(s["path"])] for s in samples]]
+    return heatmaps
+
+
+def _dilate(mask, radius):
+    """在 (…, oh, ow, C) 的网格维度上做方形膨胀"""
+    if radius <= 0:
+        return mask
+    oh, ow = mask.shape[-3], mask.shape[-2]
+    pad = [(0, 0)] * mask.ndim
+    pad[-3] = (radius, radius)
+    pad[-2] = (radius, radius)
+    padded = np.pad(mask, pad)
+    out = np.zeros_like(mask)
+    for dy in range(2 * radius + 1):
+        for dx in range(2 * radius + 1):
+            out |= padded[..., dy:dy + oh, dx:dx + ow, :]
+    return out
+
+
+def evaluate(heatmaps, targets, thresholds=DEFAULT_THRESHOLDS, tolerance=1):
+    """
+    一次向量化计算所有阈值、所有类别的精确率/召回率/F1
+
+    预测网格 = 置信度 >= 阈值；真值网格 = 目标中心点所在网格。
+    预测网格在 tolerance 格范围内有真值中心即为正确检测；
+    真值中心在 tolerance 格范围内有预测网格即为被召回。
+
+    Args:
+        heatmaps (np.ndarray): (N, oh, ow, oc) 预测置信度
+        targets (np.ndarray): (N, oh, ow, oc) 真值
+        thresholds (tuple): 待评估的置信度阈值
+        tolerance (int): 中心匹配容差（网格数）
+
+    Returns:
+        dict: {'thresholds', 'precision', 'recall', 'f1', 'pred_cells', 'gt_cells'}，
+              指标数组形状为 (T, oc-1)，不含背景类
+    """
+    if heatmaps.shape != targets.shape:
+        raise Exception(f"预测形状{heatmaps.shape}与真值形状{targets.shape}不一致")
+
+    thr = np.asarray(thresholds, dtype=np.float32).reshape(-1, 1, 1, 1, 1)
+    pred = heatmaps[None, ..., 1:] >= thr                      # (T, N, oh, ow, C)
+    gt = targets[None, ..., 1:].astype(bool)                   # (1, N, oh, ow, C)
+
+    axes = (1, 2, 3)
+    pred_cells = pred.sum(axis=axes)
+    gt_cells = np.broadcast_to(gt.sum(axis=axes), pred_cells.shape)
+    tp_pred = (pred & _dilate(gt, tolerance)).sum(axis=axes)
+    tp_gt = (gt & _dilate(pred, tolerance)).sum(axis=axes)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(pred_cells > 0, tp_pred / pred_cells, 0.0)
+        recall = np.where(gt_cells > 0, tp_gt / gt_cells, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+    return {
+        "thresholds": np.asarray(thresholds, dtype=np.float32),
+        "precision": precision,
+        "recall": recall,
+        "f1": f1,
+        "pred_cells": pred_cells,
+        "gt_cells": gt_cells,
+    }
+
+
+def best_thresholds(report):
+    """
+    每个类别F1最高的阈值
+
+    Returns:
+        list: [(threshold, f1), ...]，按类别顺序（不含背景）
+    """
+    best = report["f1"].argmax(axis=0)
+    return [
+        (float(report["thresholds"][t]), float(report["f1"][t, c]))
+        for c, t in enumerate(best)
+    ]
+
+
+def print_report(report, labels):
+    """打印评估结果表格"""
+    names = labels[1:]
+    print(f"{'阈值':>6} " + " ".join(f"{n + ' P/R/F1':>24}" for n in names))
+    for t, thr in enumerate(report["thresholds"]):
+        cells = " ".join(
+            f"{report['precision'][t, c]:>7.3f} {report['recall'][t, c]:>7.3f} {report['f1'][t, c]:>7.3f} "
+            for c in range(len(names))
+        )
+        print(f"{thr:>6.2f} {cells}")
+    for name, (thr, f1) in zip(names, best_thresholds(report)):
+        print(f"{name}: 最佳阈值 {thr:.2f} (F1={f1:.3f})")
+
+
+def heatmap_blobs(conf, threshold):
+    """
+    置信度图上高于阈值的8连通区域（与板端find_blobs一致）
+
+    Args:
+        conf (np.ndarray): (oh, ow) 置信度
+        threshold (float): 阈值
+
+    Returns:
+        list: 每个区域的网格坐标数组 (K, 2)，列为 (row, col)
+    """
+    mask = conf >= threshold
+    seen = np.zeros_like(mask)
+    oh, ow = mask.shape
+    blobs = []
+    for r0, c0 in zip(*np.nonzero(mask)):
+        if seen[r0, c0]:
+            continue
+        seen[r0, c0] = True
+        stack = [(r0, c0)]
+        cells = []
+        while stack:
+            r, c = stack.pop()
+            cells.append((r, c))
+            for dr in (-1, 0, 1):
+                for dc in (-1, 0, 1):
+                    rr, cc = r + dr, c + dc
+                    if 0 <= rr < oh and 0 <= cc < ow and mask[rr, cc] and not seen[rr, cc]:
+                        seen[rr, cc] = True
+                        stack.append((rr, cc))
+        blobs.append(np.asarray(cells))
+    return blobs
+
+
+def blob_centers(conf, cells, scale, x_offset, y_offset):
+    """
+    区域的两种中心点（原图坐标）
+
+    Returns:
+        tuple: (检测框中心, 置信度加权质心)，与板端post_process/get_detection_center一致
+    """
+    rows, cols = cells[:, 0], cells[:, 1]
+    x = int(cols.min() * scale + x_offset)
+    y = int(rows.min() * scale + y_offset)
+    w = int((cols.max() - cols.min() + 1) * scale)
+    h = int((rows.max() - rows.min() + 1) * scale)
+    box_center = (x + w // 2, y + h // 2)
+
+    weights = conf[rows, cols]
+    cx = (np.sum(weights * (cols + 0.5)) / weights.sum()) * scale + x_offset
+    cy = (np.sum(weights * (rows + 0.5)) / weights.sum()) * scale + y_offset
+    return box_center, (cx, cy)
+
+
+def color_center(rgb, center, size, threshold, lab_table):
+    """
+    模拟板端颜色细化：以检测为中心的3倍区域内，LAB阈值内像素的中心
+    （板端取最大色块的中心，这里取全部阈值内像素，结果偏向多个色块之间）
+
+    Returns:
+        tuple: (cx, cy)，区域内没有阈值内像素时为None
+    """
+    from lab_threshold import rgb565_codes
+
+    h, w = rgb.shape[:2]
+    half = int(size * 1.5)
+    x0, x1 = max(0, int(center[0]) - half), min(w, int(center[0]) + half)
+    y0, y1 = max(0, int(center[1]) - half), min(h, int(center[1]) + half)
+    lab = lab_table[rgb565_codes(rgb[y0:y1, x0:x1])]
+    lo, hi = np.asarray(threshold[0::2]), np.asarray(threshold[1::2])
+    ys, xs = np.nonzero(np.all((lab >= lo) & (lab <= hi), axis=-1))
+    if not len(xs):
+        return None
+    return (x0 + xs.mean(), y0 + ys.mean())
+
+
+def centroid_errors(heatmaps, samples, labels, threshold=0.5, max_dist=2, color_threshold=None):
+    """
+    中心点精度：每个真值框中心与最近的预测区域中心的距离（像素）
+
+    分别计算检测框中心、置信度加权质心，以及（指定color_threshold时）颜色细化的中心，
+    用于评估关闭板端颜色细化后的精度损失。
+
+    Args:
+        max_dist (float): 匹配距离上限（网格数）
+        color_threshold (tuple): 颜色细化使用的LAB阈值
+
+    Returns:
+        dict: {方法名: 误差数组}，另含 'missed' 未匹配的真值数
+    """
+    oh, ow = heatmaps.shape[1:3]
+    geometry = sample_geometry(samples, ow, oh)
+    class_index = {name: i for i, name in enumerate(labels)}
+    errors = {"bbox": [], "weighted": []}
+    lab_table = None
+    if color_threshold is not None:
+        from lab_threshold import rgb565_lab_table
+        lab_table = rgb565_lab_table()
+        errors["color"] = []
+    missed = 0
+
+    for n, sample in enumerate(samples):
+        scale, x_offset, y_offset = geometry[n]
+        rgb = None
+        centers = {}
+        for label, x, y, w, h in sample["boxes"]:
+            c = class_index.get(label)
+            if not c:
+                continue
+            if c not in centers:
+                centers[c] = [blob_centers(heatmaps[n, :, :, c], cells, scale, x_offset, y_offset)
+                              for cells in heatmap_blobs(heatmaps[n, :, :, c], threshold)]
+            gt = np.array([x + w / 2, y + h / 2])
+            best = None
+            for box_center, weighted in centers[c]:
+                d = np.hypot(*(np.asarray(weighted) - gt))
+                if d <= max_dist * scale and (best is None or d < best[0]):
+                    best = (d, box_center, weighted)
+            if best is None:
+                missed += 1
+                continue
+            errors["bbox"].append(np.hypot(*(np.asarray(best[1]) - gt)))
+            errors["weighted"].append(best[0])
+            if lab_table is not None:
+                if rgb is None:
+                    rgb = load_rgb(sample["path"])
+                refined = color_center(rgb, best[2], scale, color_threshold, lab_table)
+                errors["color"].append(np.nan if refined is None else np.hypot(*(np.asarray(refined) - gt)))
+
+    result = {name: np.asarray(v, dtype=np.float64) for name, v in errors.items()}
+    result["missed"] = missed
+    return result
+
+
+def print_centroid_report(errors):
+    """打印各方法的中心点误差统计"""
+    print(f"中心点误差（像素），未匹配真值 {errors['missed']} 个")
+    print(f"{'方法':>10} {'样本':>6} {'平均':>8} {'中位数':>8} {'P90':>8}")
+    for name in ("bbox", "weighted", "color"):
+        if name not in errors:
+            continue
+        e = errors[name]
+        valid = e[~np.isnan(e)]
+        if not len(valid):
+            print(f"{name:>10} {0:>6}")
+            continue
+        print(f"{name:>10} {len(valid):>6} {valid.mean():>8.2f} {np.median(valid):>8.2f} "
+              f"{np.percentile(valid, 90):>8.2f}")
+        if len(valid) < len(e):
+            print(f"{'':>10} 颜色细化无结果 {len(e) - len(valid)} 个")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FOMO模型逐格评估")
+    parser.add_argument("--dataset", required=True, help="Edge Impulse导出数据集目录")
+    parser.add_argument("--category", default=None, help="只评估指定划分，如 testing")
+    parser.add_argument("--model", required=True, help="包含trained.tflite和labels.txt的模型目录")
+    parser.add_argument("--recorded", default=None, help="板端记录的ml输出(.npy/.npz)，不指定则在本机推理")
+    parser.add_argument("--workers", type=int, default=1, help="本机推理进程数")
+    parser.add_argument("--tolerance", type=int, default=1, help="中心匹配容差（网格数）")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=list(DEFAULT_THRESHOLDS))
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--centroid", action="store_true", help="评估中心点精度（检测框中心/加权质心）")
+    parser.add_argument("--centroid-threshold", type=float, default=0.5, help="中心点评估使用的置信度阈值")
+    parser.add_argument("--color", type=int, nargs=6, default=None, metavar="LAB",
+                        help="同时评估颜色细化，LAB阈值 Lmin Lmax Amin Amax Bmin Bmax")
+    args = parser.parse_args()
+
+    labels = load_labels(os.path.join(args.model, "labels.txt"))
+    with open(os.path.join(args.model, "trained.tflite"), "rb") as f:
+        model_content = f.read()
+
+    samples = load_samples(args.dataset, args.category)
+    if not samples:
+        raise Exception("数据集中没有样本")
+
+    if args.recorded:
+        heatmaps = load_recorded(args.recorded, samples)
+    else:
+        heatmaps = predict_heatmaps(model_content, [s["path"] for s in samples], args.workers)
+
+    oh, ow = heatmaps.shape[1:3]
+    samples, targets = cached_targets(args.dataset, labels, (oh, ow), args.category, args.cache_dir)
+    report = evaluate(heatmaps, targets, args.thresholds, args.tolerance)
+    print(f"样本数: {len(samples)}  网格: {oh}x{ow}  类别: {labels}")
+    print_report(report, labels)
+
+    if args.centroid:
+        errors = centroid_errors(heatmaps, samples, labels, args.centroid_threshold, color_threshold=args.color)
+        print_centroid_report(errors)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# heatmap_view.py - 粪便位置热力图查看与热点区域生成（上位机）
+#
+# 输入可以是板端flash上的 heatmap.bin，也可以是串口抓到的类型4热力图帧（原始字节文件）。
+#
+# 用法示例：
+#   python tools/heatmap_view.py heatmap.bin --out heatmap.png --background background.png
+#   python tools/heatmap_view.py uart_capture.bin --frame --cols 32 --rows 24
+#   python tools/heatmap_view.py uart_capture.bin --frame --trace
+
+import argparse
+
+import numpy as np
+
+FRAME_TYPE = 4
+TRACE_SIZE = 4      # 参数latency_trace开启时帧尾前附加的追踪标记（帧号2 + 拍照时间低16位2）
+FRAME_W = 320
+FRAME_H = 240
+
+
+def rle_decode(data, size):
+    """零游程解码（与板端feces_heatmap.rle_encode对应）"""
+    out = np.zeros(size, dtype=np.uint8)
+    i = pos = 0
+    while i < len(data) and pos < size:
+        if data[i] == 0:
+            pos += data[i + 1]
+            i += 2
+        else:
+            out[pos] = data[i]
+            pos += 1
+            i += 1
+    return out
+
+
+def decode_frame_payload(payload):
+    """
+    解析类型4帧的数据部分
+
+    Returns:
+        np.ndarray: (rows, cols) 按峰值还原的近似计数
+    """
+    length = (payload[0] << 8) | payload[1]
+    body = payload[2:2 + length]
+    cols, rows = body[0], body[1]
+    peak = (body[2] << 8) | body[3]
+    scaled = rle_decode(body[4:], cols * rows).astype(np.float64)
+    return (scaled * peak / 255.0).reshape(rows, cols)
+
+
+def find_frame(raw, trace=False):
+    """在串口抓包数据中查找最后一个完整的类型4帧，返回数据部分（trace为True时跳过帧尾前的追踪标记）"""
+    header = 0xF0 + FRAME_TYPE
+    footer = 0xE0 + FRAME_TYPE
+    tail = TRACE_SIZE if trace else 0
+    result = None
+    i = 0
+    while i < len(raw) - 3:
+        if raw[i] == header:
+            length = (raw[i + 1] << 8) | raw[i + 2]
+            end = i + 3 + length + tail
+            if end < len(raw) and raw[end] == footer:
+                result = raw[i + 1:end - tail]
+                i = end
+        i += 1
+    if result is None:
+        raise Exception("未找到完整的热力图帧")
+    return result
+
+
+def load_bin(path, cols, rows):
+    """读取板端heatmap.bin（4字节日期编码 + array('H')小端计数表）"""
+    raw = np.fromfile(path, dtype=np.uint8)
+    if raw.size != 4 + cols * rows * 2:
+        raise Exception(f"文件大小与网格 {cols}x{rows} 不符")
+    date = int(raw[:4].view("<u4")[0])
+    print(f"日期: {date}")
+    counts = raw[4:].view("<u2")
+    return counts.reshape(rows, cols).astype(np.float64)
+
+
+def hot_zones(grid, frame_w=FRAME_W, frame_h=FRAME_H, min_fraction=0.25, max_zones=4):
+    """
+    由热力图生成热点ROI：阈值化后按8邻域连通块取外接矩形（画面坐标）
+
+    Returns:
+        list: [(x, y, w, h), ...]，按连通块累计计数从大到小排列
+    """
+    peak = grid.max()
+    if peak <= 0:
+        return []
+    rows, cols = grid.shape
+    hot = grid >= max(1.0, peak * min_fraction)
+    labels = np.zeros(grid.shape, dtype=np.int32)
+    zones = []
+    for r, c in zip(*np.nonzero(hot)):
+        if labels[r, c]:
+            continue
+        label = len(zones) + 1
+        stack = [(r, c)]
+        labels[r, c] = label
+        cells = []
+        while stack:
+            y, x = stack.pop()
+            cells.append((y, x))
+            for dy in (-1, 0, 1):
+                for dx in (-1, 0, 1):
+                    ny, nx = y + dy, x + dx
+                    if 0 <= ny < rows and 0 <= nx < cols and hot[ny, nx] and not labels[ny, nx]:
+                        labels[ny, nx] = label
+                        stack.append((ny, nx))
+        ys, xs = np.array(cells).T
+        mass = grid[ys, xs].sum()
+        x0 = int(xs.min() * frame_w / cols)
+        y0 = int(ys.min() * frame_h / rows)
+        x1 = int(np.ceil((xs.max() + 1) * frame_w / cols))
+        y1 = int(np.ceil((ys.max() + 1) * frame_h / rows))
+        zones.append((mass, (x0, y0, x1 - x0, y1 - y0)))
+    zones.sort(key=lambda z: -z[0])
+    return [z[1] for z in zones[:max_zones]]
+
+
+def render(grid, out_path, zones=(), background=None, frame_w=FRAME_W, frame_h=FRAME_H):
+    """把热力图渲染为PNG（可叠加背景图和热点区域）"""
+    from PIL import Image, ImageDraw
+
+    norm = grid / grid.max() if grid.max() > 0 else grid
+    # 黑 -> 红 -> 黄 的简单色表
+    rgb = np.zeros(grid.shape + (3,), dtype=np.uint8)
+    rgb[..., 0] = np.clip(norm * 2, 0, 1) * 255
+    rgb[..., 1] = np.clip(norm * 2 - 1, 0, 1) * 255
+    heat = Image.fromarray(rgb).resize((frame_w, frame_h), Image.NEAREST)
+
+    if background:
+        with Image.open(background) as bg:
+            bg = bg.convert("RGB").resize((frame_w, frame_h))
+            alpha = Image.fromarray((np.clip(norm, 0, 1) * 180).astype(np.uint8)).resize((frame_w, frame_h))
+            heat = Image.composite(heat, bg, alpha)
+
+    draw = ImageDraw.Draw(heat)
+    for x, y, w, h in zones:
+        draw.rectangle((x, y, x + w - 1, y + h - 1), outline=(0, 255, 0))
+    heat.save(out_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="粪便位置热力图查看")
+    parser.add_argument("input", help="heatmap.bin 或串口抓包文件")
+    parser.add_argument("--frame", action="store_true", help="输入为串口抓包数据")
+    parser.add_argument("--trace", action="store_true", help="帧尾前有4字节追踪标记（参数latency_trace）")
+    parser.add_argument("--cols", type=int, default=32)
+    parser.add_argument("--rows", type=int, default=24)
+    parser.add_argument("--min-fraction", type=float, default=0.25, help="热点阈值（相对峰值）")
+    parser.add_argument("--out", default=None, help="输出PNG文件")
+    parser.add_argument("--background", default=None, help="叠加的背景图")
+    args = parser.parse_args()
+
+    if args.frame:
+        with open(args.input, "rb") as f:
+            grid = decode_frame_payload(find_frame(f.read(), args.trace))
+    else:
+        grid = load_bin(args.input, args.cols, args.rows)
+
+    zones = hot_zones(grid, min_fraction=args.min_fraction)
+    print(f"网格: {grid.shape[1]}x{grid.shape[0]}  峰值: {grid.max():.0f}  总计: {grid.sum():.0f}")
+    print(f"HOT_ZONES = {zones}")
+
+    if args.out:
+        render(grid, args.out, zones, args.background)
+        print(f"已保存: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
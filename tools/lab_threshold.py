@@ -0,0 +1,266 @@
+# lab_threshold.py - 根据标注框自动搜索LAB颜色阈值（上位机）
+#
+# 以板端相同的方式把图片量化为RGB565并换算成LAB，统计标注框内外的三维直方图，
+# 在误检像素预算内搜索F1最高的阈值盒，输出可直接粘贴到主程序的阈值元组，
+# 以及按RGB565编码索引的成员查找表（8KB位图）。
+#
+# 用法示例：
+#   python tools/lab_threshold.py --dataset pig2.0-export/testing --label shit pig
+#   python tools/lab_threshold.py --dataset pig2.0-export/testing --label shit --fp-budget 0.005 --lut luts
+#   python tools/lab_threshold.py --dataset pig2.0-export/testing --label shit --compare 18 61 -21 15 31 63
+
+import os
+import sys
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ei_dataset import load_samples, load_rgb
+
+L_RANGE = (0, 100)
+AB_RANGE = (-128, 127)
+BOX_CORE = 0.5   # 只取框中心区域作为正样本，避开框边缘的地面像素
+
+
+def rgb565_lab_table():
+    """
+    计算全部65536个RGB565编码对应的LAB值（与OpenMV的换算方式一致）
+
+    Returns:
+        np.ndarray: (65536, 3) int16，依次为L, A, B
+    """
+    code = np.arange(65536, dtype=np.uint32)
+    r5 = (code >> 11) & 0x1F
+    g6 = (code >> 5) & 0x3F
+    b5 = code & 0x1F
+    rgb = np.stack([(r5 << 3) | (r5 >> 2), (g6 << 2) | (g6 >> 4), (b5 << 3) | (b5 >> 2)], axis=-1)
+
+    c = rgb.astype(np.float64) / 255.0
+    c = np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+    xyz = c @ np.array([
+        [0.4124, 0.2126, 0.0193],
+        [0.3576, 0.7152, 0.1192],
+        [0.1805, 0.0722, 0.9505],
+    ])
+    xyz /= np.array([0.95047, 1.0, 1.08883])
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), (7.787 * xyz) + (16.0 / 116.0))
+
+    lab = np.empty((65536, 3), dtype=np.float64)
+    lab[:, 0] = 116.0 * f[:, 1] - 16.0
+    lab[:, 1] = 500.0 * (f[:, 0] - f[:, 1])
+    lab[:, 2] = 200.0 * (f[:, 1] - f[:, 2])
+    lab = np.round(lab)
+    lab[:, 0] = np.clip(lab[:, 0], *L_RANGE)
+    lab[:, 1:] = np.clip(lab[:, 1:], *AB_RANGE)
+    return lab.astype(np.int16)
+
+
+def rgb565_codes(rgb):
+    """(H, W, 3) uint8 -> (H, W) RGB565编码"""
+    rgb = rgb.astype(np.uint32)
+    return ((rgb[..., 0] >> 3) << 11) | ((rgb[..., 1] >> 2) << 5) | (rgb[..., 2] >> 3)
+
+
+def box_masks(shape, boxes, label):
+    """
+    生成正负样本掩码
+
+    Returns:
+        tuple: (positive, negative)，正样本为目标框中心区域，负样本为所有目标框之外
+    """
+    h, w = shape
+    positive = np.zeros((h, w), dtype=bool)
+    covered = np.zeros((h, w), dtype=bool)
+    for name, x, y, bw, bh in boxes:
+        if name != label:
+            continue
+        x, y, bw, bh = int(x), int(y), int(bw), int(bh)
+        covered[max(0, y):y + bh, max(0, x):x + bw] = True
+        mx = int(bw * (1 - BOX_CORE) / 2)
+        my = int(bh * (1 - BOX_CORE) / 2)
+        positive[max(0, y + my):y + bh - my, max(0, x + mx):x + bw - mx] = True
+    return positive, ~covered
+
+
+def collect_histograms(samples, label):
+    """
+    统计正负样本的RGB565直方图
+
+    Returns:
+        tuple: (pos_hist, neg_hist)，各为长度65536的计数数组
+    """
+    pos_hist = np.zeros(65536, dtype=np.int64)
+    neg_hist = np.zeros(65536, dtype=np.int64)
+    for sample in samples:
+        rgb = load_rgb(sample["path"])
+        codes = rgb565_codes(rgb)
+        positive, negative = box_masks(codes.shape, sample["boxes"], label)
+        pos_hist += np.bincount(codes[positive], minlength=65536)
+        neg_hist += np.bincount(codes[negative], minlength=65536)
+    return pos_hist, neg_hist
+
+
+class LabVolume:
+    """LAB三维直方图的累加表，任意阈值盒内的像素数可O(1)求出"""
+
+    def __init__(self, code_hist, lab_table):
+        hist = np.zeros((L_RANGE[1] + 1, 256, 256), dtype=np.int64)
+        np.add.at(hist, (lab_table[:, 0], lab_table[:, 1] + 128, lab_table[:, 2] + 128), code_hist)
+        self.total = int(hist.sum())
+        self.sat = np.zeros((hist.shape[0] + 1, 257, 257), dtype=np.int64)
+        self.sat[1:, 1:, 1:] = hist.cumsum(0).cumsum(1).cumsum(2)
+
+    def count(self, th):
+        """阈值盒 (l0, l1, a0, a1, b0, b1) 内的像素数"""
+        l0, l1, a0, a1, b0, b1 = th
+        l0, l1 = l0, l1 + 1
+        a0, a1 = a0 + 128, a1 + 129
+        b0, b1 = b0 + 128, b1 + 129
+        s = self.sat
+        return int(
+            s[l1, a1, b1] - s[l0, a1, b1] - s[l1, a0, b1] - s[l1, a1, b0]
+            + s[l0, a0, b1] + s[l0, a1, b0] + s[l1, a0, b0] - s[l0, a0, b0]
+        )
+
+
+def score(th, pos, neg):
+    """
+    Returns:
+        tuple: (f1, precision, recall, fp_rate)
+    """
+    tp = pos.count(th)
+    fp = neg.count(th)
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / pos.total if pos.total else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    fp_rate = fp / neg.total if neg.total else 0.0
+    return f1, precision, recall, fp_rate
+
+
+def _clamp(th):
+    l0, l1, a0, a1, b0, b1 = th
+    l0 = max(L_RANGE[0], min(l0, l1))
+    l1 = min(L_RANGE[1], max(l1, l0))
+    a0 = max(AB_RANGE[0], min(a0, a1))
+    a1 = min(AB_RANGE[1], max(a1, a0))
+    b0 = max(AB_RANGE[0], min(b0, b1))
+    b1 = min(AB_RANGE[1], max(b1, b0))
+    return (l0, l1, a0, a1, b0, b1)
+
+
+def initial_threshold(pos_hist, lab_table, low=5, high=95):
+    """以正样本各通道的分位数作为搜索起点"""
+    weights = pos_hist.astype(np.float64)
+    th = []
+    for ch in range(3):
+        order = np.argsort(lab_table[:, ch], kind="stable")
+        cdf = np.cumsum(weights[order])
+        cdf /= cdf[-1]
+        values = lab_table[order, ch]
+        th += [int(values[np.searchsorted(cdf, low / 100)]), int(values[np.searchsorted(cdf, high / 100)])]
+    return _clamp(tuple(th))
+
+
+def search_threshold(pos, neg, start, fp_budget=0.01, steps=(8, 4, 2, 1)):
+    """
+    坐标下降搜索阈值盒：逐个边界尝试扩张/收缩，只接受满足误检预算且F1提升的移动
+
+    Args:
+        pos, neg (LabVolume): 正负样本累加表
+        start (tuple): 初始阈值
+        fp_budget (float): 负样本中允许落入阈值的像素比例上限
+        steps (tuple): 由粗到细的步长
+
+    Returns:
+        tuple: 最优阈值盒
+    """
+    def objective(th):
+        f1, _, _, fp_rate = score(th, pos, neg)
+        # 超出预算时以误检率作为惩罚，引导搜索收缩回预算内
+        return f1 if fp_rate <= fp_budget else -fp_rate
+
+    best = start
+    best_value = objective(best)
+    for step in steps:
+        improved = True
+        while improved:
+            improved = False
+            for i in range(6):
+                for delta in (-step, step):
+                    th = list(best)
+                    th[i] += delta
+                    th = _clamp(tuple(th))
+                    value = objective(th)
+                    if value > best_value:
+                        best, best_value = th, value
+                        improved = True
+    return best
+
+
+def membership_lut(th, lab_table):
+    """
+    生成RGB565成员查找表：第code位为1表示该颜色落在阈值内
+
+    Returns:
+        bytes: 8192字节位图（小端位序）
+    """
+    l0, l1, a0, a1, b0, b1 = th
+    lab = lab_table
+    inside = (
+        (lab[:, 0] >= l0) & (lab[:, 0] <= l1)
+        & (lab[:, 1] >= a0) & (lab[:, 1] <= a1)
+        & (lab[:, 2] >= b0) & (lab[:, 2] <= b1)
+    )
+    return np.packbits(inside, bitorder="little").tobytes()
+
+
+def _format(th, pos, neg):
+    f1, precision, recall, fp_rate = score(th, pos, neg)
+    return f"{th}  F1={f1:.3f} P={precision:.3f} R={recall:.3f} 误检率={fp_rate:.4f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LAB颜色阈值自动搜索")
+    parser.add_argument("--dataset", required=True, help="Edge Impulse导出数据集目录")
+    parser.add_argument("--category", default=None, help="只使用指定划分，如 training")
+    parser.add_argument("--label", nargs="+", default=["shit"], help="目标类别名，可指定多个")
+    parser.add_argument("--fp-budget", type=float, default=0.01, help="负样本误检像素比例上限")
+    parser.add_argument("--compare", type=int, nargs=6, default=None, help="与现有阈值对比，如 18 61 -21 15 31 63")
+    parser.add_argument("--lut", default=None, help="保存RGB565成员查找表的目录")
+    args = parser.parse_args()
+
+    all_samples = load_samples(args.dataset, args.category)
+    lab_table = rgb565_lab_table()
+
+    for label in args.label:
+        samples = [s for s in all_samples if any(b[0] == label for b in s["boxes"])]
+        if not samples:
+            print(f'数据集中没有类别"{label}"的标注，跳过')
+            continue
+
+        pos_hist, neg_hist = collect_histograms(samples, label)
+        pos = LabVolume(pos_hist, lab_table)
+        neg = LabVolume(neg_hist, lab_table)
+        print(f"[{label}] 样本数: {len(samples)}  正样本像素: {pos.total}  负样本像素: {neg.total}")
+
+        start = initial_threshold(pos_hist, lab_table)
+        best = search_threshold(pos, neg, start, args.fp_budget)
+
+        print("初始阈值:", _format(start, pos, neg))
+        if args.compare:
+            print("现有阈值:", _format(tuple(args.compare), pos, neg))
+        print("搜索结果:", _format(best, pos, neg))
+        print(f"{label.upper().replace(' ', '_')}_COLOR_THRESHOLD = {best}")
+
+        if args.lut:
+            os.makedirs(args.lut, exist_ok=True)
+            path = os.path.join(args.lut, f"{label.replace(' ', '_')}_lut.bin")
+            with open(path, "wb") as f:
+                f.write(membership_lut(best, lab_table))
+            print(f"查找表已保存: {path}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
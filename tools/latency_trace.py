@@ -0,0 +1,262 @@
+# latency_trace.py - 拍照到单片机动作/水泵开启的端到端延迟分析（上位机）
+#
+# 对照两份日志：
+#   摄像头：OpenMV串口终端输出中的TRACE行（参数latency_trace开启，格式见openmv/latency_trace.py）
+#       TRACE,帧号,拍照时间(ticks_ms),capture,preprocess,infer,post,send
+#   单片机：CSV，每行 时间(ms),事件,帧号,拍照时间低16位 （帧号和拍照时间取自帧尾前附加的4字节）
+#       rx       收到并解析完类型1帧
+#       act      按该帧的目标中心执行动作（舵机/喷嘴）
+#       pump_on  因该帧的目标开启水泵
+# 两边时钟不同：按每个窗口内“单片机收到时间 - 摄像头发送时间”的最小值估计时钟差，窗口之间线性插值（跟踪漂移），
+# 所以串口传输一项是相对最小传输时间的抖动，不含固定的传输时间。
+#
+# 用法示例：
+#   python tools/latency_trace.py camera.log stm32.csv
+#   python tools/latency_trace.py camera.log stm32.csv --save-baseline latency_baseline.json
+#   python tools/latency_trace.py camera.log stm32.csv --baseline latency_baseline.json --tolerance 0.2
+
+import csv
+import sys
+import json
+import argparse
+from bisect import bisect_left
+
+STAGES = ("capture", "preprocess", "infer", "post", "send")
+
+# 输出的指标：(名称, 说明)
+METRICS = (
+    ("capture", "拍照（等待新图像）"),
+    ("preprocess", "预处理"),
+    ("infer", "FOMO推理"),
+    ("post", "检测结果处理"),
+    ("send", "发送目标帧"),
+    ("camera", "摄像头合计（拍照 -> 发送完成）"),
+    ("uart", "串口传输抖动"),
+    ("stm32", "单片机处理（收到 -> 动作）"),
+    ("photon_to_act", "拍照 -> 动作"),
+    ("photon_to_pump", "拍照 -> 水泵开启"),
+)
+
+
+def parse_camera_log(path):
+    """
+    读取摄像头TRACE行
+
+    Returns:
+        dict: (帧号, 拍照时间低16位) -> (拍照时间, [各阶段ms])
+    """
+    frames = {}
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            pos = line.find("TRACE,")
+            if pos < 0:
+                continue
+            fields = line[pos:].strip().split(",")
+            if len(fields) != 3 + len(STAGES):
+                continue
+            try:
+                frame_id, start = int(fields[1]), int(fields[2])
+                marks = [int(v) for v in fields[3:]]
+            except ValueError:
+                continue
+            frames[(frame_id, start & 0xffff)] = (start, marks)
+    return frames
+
+
+def parse_controller_log(path):
+    """
+    读取单片机日志
+
+    Returns:
+        list: [(时间ms, 事件, 帧号, 拍照时间低16位), ...]
+    """
+    records = []
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if len(row) < 4 or row[0].startswith("#"):
+                continue
+            try:
+                records.append((int(row[0]), row[1].strip(), int(row[2]), int(row[3]) & 0xffff))
+            except ValueError:
+                continue    # 表头
+    return records
+
+
+def estimate_offsets(samples, window):
+    """
+    估计时钟差：每个窗口取差值最小的样本（传输最快的一帧），窗口之间线性插值（跟踪时钟漂移）
+
+    Args:
+        samples (list): [(摄像头时间, 单片机时间 - 摄像头时间), ...]
+        window (int): 窗口宽度（摄像头ms）
+
+    Returns:
+        function: 摄像头时间 -> 时钟差
+    """
+    best = {}
+    for t, d in samples:
+        k = t // window
+        if k not in best or d < best[k][1]:
+            best[k] = (t, d)
+    points = sorted(best.values())
+    times = [t for t, _ in points]
+
+    def offset(t):
+        i = bisect_left(times, t)
+        if i == 0:
+            return points[0][1]
+        if i == len(points):
+            return points[-1][1]
+        (t0, d0), (t1, d1) = points[i - 1], points[i]
+        return round(d0 + (d1 - d0) * (t - t0) / (t1 - t0))
+
+    return offset
+
+
+def correlate(frames, records, window):
+    """
+    对照两份日志，计算每帧各项延迟
+
+    Returns:
+        tuple: ({指标: [ms, ...]}, 未匹配的单片机记录数)
+    """
+    values = {name: [] for name, _ in METRICS}
+    for start, marks in frames.values():
+        prev = 0
+        for name, v in zip(STAGES, marks):
+            if v >= 0:
+                values[name].append(v - prev)
+                prev = v
+        if marks[-1] >= 0:
+            values["camera"].append(marks[-1])
+
+    unmatched = 0
+    matched = []
+    for record in records:
+        frame = frames.get((record[2], record[3]))
+        if frame is None:
+            unmatched += 1
+        else:
+            matched.append((record, frame))
+
+    samples = [(start + marks[-1], ms - start - marks[-1])
+               for (ms, event, _, _), (start, marks) in matched if event == "rx" and marks[-1] >= 0]
+    if not samples:
+        raise Exception("没有可以对照的rx记录（确认单片机日志的帧号和拍照时间取自帧尾附加的4字节）")
+    offset = estimate_offsets(samples, window)
+
+    rx_times = {}
+    for (ms, event, frame_id, ms16), (start, marks) in matched:
+        if event == "rx":
+            rx_times[(frame_id, ms16)] = ms
+            if marks[-1] >= 0:
+                values["uart"].append(ms - offset(start + marks[-1]) - start - marks[-1])
+    for (ms, event, frame_id, ms16), (start, marks) in matched:
+        if event == "act":
+            values["photon_to_act"].append(ms - offset(start) - start)
+            rx = rx_times.get((frame_id, ms16))
+            if rx is not None:
+                values["stm32"].append(ms - rx)
+        elif event == "pump_on":
+            values["photon_to_pump"].append(ms - offset(start) - start)
+    return values, unmatched
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0
+    k = min(len(sorted_values) - 1, max(0, int(round(p / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def summarize(values):
+    """每个指标的 n/mean/p50/p90/p99/max"""
+    summary = {}
+    for name, _ in METRICS:
+        v = sorted(values[name])
+        if not v:
+            continue
+        summary[name] = {
+            "n": len(v),
+            "mean": sum(v) / len(v),
+            "p50": percentile(v, 50),
+            "p90": percentile(v, 90),
+            "p99": percentile(v, 99),
+            "max": v[-1],
+        }
+    return summary
+
+
+def print_summary(summary):
+    print(f"{'指标':<16}{'帧数':>7}{'平均':>9}{'P50':>7}{'P90':>7}{'P99':>7}{'最大':>7}  说明")
+    for name, desc in METRICS:
+        s = summary.get(name)
+        if s:
+            print(f"{name:<16}{s['n']:>7}{s['mean']:>9.1f}{s['p50']:>7}{s['p90']:>7}{s['p99']:>7}{s['max']:>7}  {desc}")
+
+    # 各阶段占拍照 -> 动作的比例，决定优化的方向
+    total = summary.get("photon_to_act")
+    if total and total["mean"] > 0:
+        print("拍照 -> 动作 平均构成:")
+        for name in STAGES + ("uart", "stm32"):
+            if name in summary:
+                print(f"  {name:<12}{summary[name]['mean']:>8.1f} ms  {summary[name]['mean'] / total['mean']:>6.1%}")
+
+
+def compare_baseline(summary, baseline, tolerance, min_ms):
+    """
+    与基线比较P50/P90
+
+    Returns:
+        list: 退化的指标说明
+    """
+    regressions = []
+    for name, base in baseline.items():
+        s = summary.get(name)
+        if s is None:
+            continue
+        for key in ("p50", "p90"):
+            if s[key] > base[key] * (1 + tolerance) and s[key] - base[key] >= min_ms:
+                regressions.append(f"{name} {key}: {base[key]} -> {s[key]} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端延迟分析")
+    parser.add_argument("camera_log", help="OpenMV串口终端输出（含TRACE行）")
+    parser.add_argument("controller_log", help="单片机日志CSV")
+    parser.add_argument("--window", type=int, default=10000, help="时钟差估计窗口（ms）")
+    parser.add_argument("--baseline", help="与基线JSON比较，有退化时返回1")
+    parser.add_argument("--save-baseline", help="把本次结果保存为基线JSON")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="允许的相对增加")
+    parser.add_argument("--min-ms", type=int, default=5, help="增加量小于该值时不算退化")
+    args = parser.parse_args()
+
+    frames = parse_camera_log(args.camera_log)
+    if not frames:
+        raise Exception("摄像头日志中没有TRACE行（确认参数latency_trace已开启）")
+    records = parse_controller_log(args.controller_log)
+    values, unmatched = correlate(frames, records, args.window)
+    print(f"摄像头帧: {len(frames)} 单片机记录: {len(records)} 未匹配: {unmatched}")
+    summary = summarize(values)
+    print_summary(summary)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(summary, f, indent=1)
+        print(f"基线已保存: {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_baseline(summary, baseline, args.tolerance, args.min_ms)
+        if regressions:
+            print("延迟退化:")
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print("与基线相比没有退化")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+# link_standin.py - 串口波特率协商的上位机替身（pty）
+#
+# 在pty的一端模拟单片机的链路协议（PROPOSE/ACCEPT、回环、COMMIT、超时回退），
+# 另一端直接运行板端的 openmv/uart_link.py 和 command_channel.py：
+# 本工具提供与pyb.UART接口相同的PtyUart，以及MicroPython的time.ticks_*函数。
+# pty本身不区分波特率，发送时两端波特率不一致、或高于--max-good时按线路模型打乱字节，
+# 以此复现“高波特率不可靠 -> 降档/回退”的过程。
+#
+# 用法示例：
+#   python tools/link_standin.py --target 921600
+#   python tools/link_standin.py --target 2000000 --max-good 460800
+#   python tools/link_standin.py --target 921600 --degrade-at 5 --keepalive 200 --seconds 20
+
+import os
+import sys
+import time
+import types
+import random
+import select
+import tty
+import argparse
+import threading
+
+OPENMV_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "openmv")
+TICKS_PERIOD = 1 << 30
+
+
+class Line:
+    """线路模型：两端当前的波特率和可靠传输的最高波特率"""
+
+    def __init__(self, base_baud, max_good, error_rate=0.2, seed=1):
+        self.device_baud = base_baud
+        self.stm32_baud = base_baud
+        self.max_good = max_good
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+    def transfer(self, data):
+        """按发送时两端的波特率处理一段发送的字节"""
+        if self.device_baud != self.stm32_baud:
+            # 波特率不一致时接收到的是乱码
+            return bytes((b ^ 0x5A) for b in data)
+        if self.device_baud > self.max_good:
+            return bytes((b ^ (1 << self.random.randrange(8))) if self.random.random() < self.error_rate else b
+                         for b in data)
+        return bytes(data)
+
+
+class PtyUart:
+    """与pyb.UART接口相同的pty串口（板端代码的一端）"""
+
+    line = None
+    fd = None
+
+    def __init__(self, bus, baudrate, timeout_char=0):
+        self.init(baudrate, timeout_char=timeout_char)
+
+    def init(self, baudrate, timeout_char=0, **kwargs):
+        self.baudrate = baudrate
+        PtyUart.line.device_baud = baudrate
+
+    def any(self):
+        return 1 if select.select([self.fd], [], [], 0)[0] else 0
+
+    def readinto(self, buf):
+        if not self.any():
+            return None
+        data = os.read(self.fd, len(buf))
+        buf[:len(data)] = data
+        return len(data)
+
+    def write(self, data):
+        os.write(self.fd, PtyUart.line.transfer(data))
+        return len(data)
+
+
+def install_device_shims(line, fd):
+    """让板端模块在本机运行：pyb.UART使用pty，补充time.ticks_*"""
+    PtyUart.line = line
+    PtyUart.fd = fd
+    pyb = types.ModuleType("pyb")
+    pyb.UART = PtyUart
+    sys.modules["pyb"] = pyb
+
+    time.ticks_ms = lambda: int(time.monotonic() * 1000) % TICKS_PERIOD
+    time.ticks_add = lambda t, delta: (t + delta) % TICKS_PERIOD
+    time.ticks_diff = lambda a, b: ((a - b + TICKS_PERIOD // 2) % TICKS_PERIOD) - TICKS_PERIOD // 2
+    time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+    sys.path.insert(0, OPENMV_DIR)
+
+
+class Stm32Link:
+    """
+    单片机一端的链路协议（参考实现）
+
+    收到PROPOSE且波特率在支持范围内时应答ACCEPT并立即切换；
+    VERIFY_TIMEOUT内没有COMMIT、或COMMIT后LINK_TIMEOUT内没有有效帧时回到基础波特率。
+    """
+
+    def __init__(self, fd, line, link, supported, log):
+        self.fd = fd
+        self.line = line
+        self.link = link            # uart_link模块（常量与CRC）
+        self.supported = supported
+        self.log = log
+        self.buf = bytearray()
+        self.state = "base"
+        self.deadline = None
+        self.echoes = 0
+        self.running = True
+
+    def _set_baud(self, baud, reason):
+        self.line.stm32_baud = baud
+        self.log(f"[STM32] 波特率 -> {baud} ({reason})")
+
+    def _send(self, op, data=b""):
+        link = self.link
+        body = bytes([op]) + bytes(data)
+        crc = link.crc16(body)
+        length = len(body) + 2
+        frame = bytes([0xF0 + link.LINK_FRAME, length >> 8, length & 0xff]) + body \
+            + bytes([crc >> 8, crc & 0xff, 0xE0 + link.LINK_FRAME])
+        os.write(self.fd, self.line.transfer(frame))
+
+    def _frames(self):
+        """从接收缓冲中取出完整的链路帧（其他帧丢弃）"""
+        header = 0xF0 + self.link.LINK_FRAME
+        footer = 0xE0 + self.link.LINK_FRAME
+        buf = self.buf
+        while True:
+            start = buf.find(bytes([header]))
+            if start < 0:
+                buf.clear()
+                return
+            del buf[:start]
+            if len(buf) < 3:
+                return
+            length = (buf[1] << 8) | buf[2]
+            if not 3 <= length <= 64:
+                del buf[:1]
+                continue
+            if len(buf) < length + 4:
+                return
+            if buf[3 + length] != footer:
+                del buf[:1]
+                continue
+            body = bytes(buf[3:3 + length])
+            del buf[:length + 4]
+            if self.link.crc16(body[:-2]) == ((body[-2] << 8) | body[-1]):
+                yield body[0], body[1:-2]
+
+    def _handle(self, op, data):
+        link = self.link
+        base = link.UART_BAUD
+        now = time.monotonic()
+        if self.state == "active":
+            self.deadline = now + link.LINK_TIMEOUT / 1000
+        if op == link.OP_PROPOSE:
+            baud = int.from_bytes(data[:4], "big")
+            if baud in self.supported:
+                self._send(link.OP_ACCEPT, data[:4])
+                self._set_baud(baud, "ACCEPT")
+                self.state = "verify"
+                self.deadline = now + link.VERIFY_TIMEOUT / 1000
+            else:
+                self._send(link.OP_REJECT, data[:4])
+                self.log(f"[STM32] 拒绝 {baud}")
+        elif op == link.OP_ECHO:
+            self.echoes += 1
+            self._send(link.OP_ECHO_REPLY, data)
+        elif op == link.OP_COMMIT:
+            self.state = "active"
+            self.deadline = now + link.LINK_TIMEOUT / 1000
+            self.log(f"[STM32] COMMIT {int.from_bytes(data[:4], 'big')}")
+        elif op == link.OP_FALLBACK:
+            self.state = "base"
+            self.deadline = None
+            self._set_baud(base, "FALLBACK")
+
+    def run(self):
+        while self.running:
+            if select.select([self.fd], [], [], 0.005)[0]:
+                try:
+                    self.buf += os.read(self.fd, 256)
+                except OSError:
+                    return
+            elif self.buf:
+                # 线路空闲时还没收完的帧是乱码造成的，丢掉帧头重新同步（相当于单片机的串口空闲中断）
+                del self.buf[:1]
+            for op, data in self._frames():
+                self._handle(op, data)
+            if self.deadline is not None and time.monotonic() > self.deadline:
+                reason = "COMMIT超时" if self.state == "verify" else "链路超时"
+                self.state = "base"
+                self.deadline = None
+                self._set_baud(self.link.UART_BAUD, reason)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="串口链路协商pty替身")
+    parser.add_argument("--target", type=int, default=921600, help="板端期望波特率（参数uart_baud）")
+    parser.add_argument("--max-good", type=int, default=921600, help="线路可靠传输的最高波特率")
+    parser.add_argument("--error-rate", type=float, default=0.2, help="超过max-good时的字节错误率")
+    parser.add_argument("--supported", type=int, nargs="+", default=[230400, 460800, 921600, 2000000],
+                        help="单片机支持的波特率")
+    parser.add_argument("--degrade-at", type=float, default=None,
+                        help="运行到该秒数时把max-good降到基础波特率，模拟线路变差")
+    parser.add_argument("--keepalive", type=int, default=None, help="覆盖板端回环间隔（ms），缩短演示时间")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    line = Line(115200, args.max_good, args.error_rate)
+    install_device_shims(line, slave)
+
+    import uart_link
+    from command_channel import CommandChannel
+
+    if args.keepalive:
+        uart_link.KEEPALIVE = args.keepalive
+
+    start = time.monotonic()
+
+    def log(msg):
+        print(f"{time.monotonic() - start:7.3f} {msg}")
+
+    stm32 = Stm32Link(master, line, uart_link, set(args.supported), log)
+    thread = threading.Thread(target=stm32.run, daemon=True)
+    thread.start()
+
+    channel = CommandChannel()
+    manager = uart_link.LinkManager(channel, args.target)
+    degraded = False
+    while time.monotonic() - start < args.seconds:
+        if args.degrade_at is not None and not degraded and time.monotonic() - start >= args.degrade_at:
+            degraded = True
+            line.max_good = uart_link.UART_BAUD
+            log("[线路] 变差，只有基础波特率可靠")
+        channel.poll()
+        if manager.poll():
+            log(f"[OpenMV] 波特率改变: {manager.baud}")
+        time.sleep(0.01)
+
+    stm32.running = False
+    thread.join(1)
+    print(f"OpenMV: 波特率={manager.baud} 协商={manager.negotiations} 回退={manager.fallbacks} "
+          f"回环={manager.echo_ok}/{manager.echo_sent} CRC错误={manager.crc_errors} "
+          f"错误率={manager.error_rate:.2f}")
+    print(f"STM32: 波特率={line.stm32_baud} 状态={stm32.state} 回环={stm32.echoes}")
+
+
+if __name__ == "__main__":
+    main()
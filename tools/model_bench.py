@@ -0,0 +1,266 @@
+# model_bench.py - 历代FOMO模型对比基准（上位机）
+#
+# 自动查找仓库中所有 trained.tflite + labels.txt（包括zip包内，不解压到磁盘），
+# 记录模型大小、输入输出形状、估算内存需求、推理耗时和测试集准确率。
+#
+# 用法示例：
+#   python tools/model_bench.py
+#   python tools/model_bench.py --root . --runs 50 --json bench.json
+
+import os
+import io
+import sys
+import json
+import time
+import hashlib
+import zipfile
+import argparse
+import posixpath
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ei_dataset import load_samples, load_rgb
+from fomo_eval import TFLiteRunner, build_targets, evaluate, best_thresholds
+
+MODEL_FILE = "trained.tflite"
+LABELS_FILE = "labels.txt"
+SKIP_DIRS = {".git", ".history", "__pycache__", ".fomo_cache"}
+
+# 固定测试划分：按模型标签自动匹配对应数据集
+DEFAULT_DATASETS = (
+    ("pig2.0-export/testing", None),
+    ("pig-home-export", "testing"),
+    ("pig1.0-export", "testing"),
+)
+DEPLOY_CONFIDENCE = 0.8   # 与主程序MIN_CONFIDENCE一致
+
+
+def _parse_labels(data):
+    return [line.rstrip("\r") for line in data.decode("utf-8").split("\n") if line.strip()]
+
+
+def _models_in_zip(zf, name, depth=0):
+    """在zip包内查找模型，支持zip内嵌zip（成员名总是以/分隔，与操作系统无关）"""
+    members = zf.namelist()
+    for member in members:
+        if posixpath.basename(member) != MODEL_FILE:
+            continue
+        labels_member = posixpath.join(posixpath.dirname(member), LABELS_FILE)
+        if labels_member in members:
+            yield {
+                "name": f"{name}:{member}" if posixpath.dirname(member) else name,
+                "content": zf.read(member),
+                "labels": _parse_labels(zf.read(labels_member)),
+                "in_zip": True,
+            }
+    if depth < 1:
+        for member in members:
+            if member.endswith(".zip"):
+                with zipfile.ZipFile(io.BytesIO(zf.read(member))) as inner:
+                    yield from _models_in_zip(inner, f"{name}:{member}", depth + 1)
+
+
+def discover_models(root):
+    """
+    查找目录下所有模型（目录形式和zip形式）
+
+    Args:
+        root (str): 仓库根目录
+
+    Returns:
+        list: [{'name', 'content', 'labels', 'sha1', 'aliases'}]，内容相同的模型只保留一份
+    """
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+        rel = os.path.relpath(dirpath, root)
+        if MODEL_FILE in filenames and LABELS_FILE in filenames:
+            with open(os.path.join(dirpath, MODEL_FILE), "rb") as f:
+                content = f.read()
+            with open(os.path.join(dirpath, LABELS_FILE), "rb") as f:
+                labels = _parse_labels(f.read())
+            found.append({"name": rel, "content": content, "labels": labels, "in_zip": False})
+        for filename in sorted(filenames):
+            if not filename.endswith(".zip"):
+                continue
+            path = os.path.join(dirpath, filename)
+            try:
+                with zipfile.ZipFile(path) as zf:
+                    found.extend(_models_in_zip(zf, os.path.relpath(path, root)))
+            except zipfile.BadZipFile:
+                print(f"跳过损坏的zip: {path}")
+
+    # 目录形式优先作为名称，zip副本记为别名
+    found.sort(key=lambda m: (m["in_zip"], m["name"]))
+    models = {}
+    for model in found:
+        sha1 = hashlib.sha1(model["content"]).hexdigest()
+        if sha1 in models:
+            models[sha1]["aliases"].append(model["name"])
+        else:
+            model["sha1"] = sha1
+            model["aliases"] = []
+            models[sha1] = model
+    return list(models.values())
+
+
+def static_info(runner):
+    """
+    读取模型的静态信息，并按张量生命周期估算运行时激活内存峰值
+
+    Returns:
+        dict: 输入输出形状、输入类型和估算arena大小
+    """
+    interp = runner.interpreter
+    tensors = {t["index"]: t for t in interp.get_tensor_details()}
+
+    def nbytes(index):
+        t = tensors[index]
+        return int(np.prod(t["shape"])) * np.dtype(t["dtype"]).itemsize
+
+    arena = None
+    if hasattr(interp, "_get_ops_details"):
+        ops = interp._get_ops_details()
+        # 激活张量：模型输入 + 各算子输出；其余（权重）常驻模型文件
+        first = {runner.input["index"]: 0}
+        last = {}
+        for i, op in enumerate(ops):
+            for t in op["outputs"]:
+                first.setdefault(int(t), i)
+            for t in op["inputs"]:
+                if int(t) in first:
+                    last[int(t)] = i
+        last[runner.output["index"]] = len(ops) - 1
+        arena = max(
+            sum(nbytes(t) for t, start in first.items() if start <= i <= last.get(t, start))
+            for i in range(len(ops))
+        )
+
+    return {
+        "input_shape": [int(v) for v in runner.input["shape"]],
+        "input_dtype": np.dtype(runner.input["dtype"]).name,
+        "output_shape": [int(v) for v in runner.output["shape"]],
+        "arena_bytes": arena,
+    }
+
+
+def measure_latency(runner, runs=30, warmup=3):
+    """
+    测量单次推理耗时（ms）
+
+    Returns:
+        dict: {'median_ms', 'p90_ms'}
+    """
+    tensor = np.zeros(runner.input["shape"], dtype=runner.input["dtype"])
+    for _ in range(warmup):
+        runner.invoke(tensor)
+    times = np.empty(runs)
+    for i in range(runs):
+        start = time.perf_counter()
+        runner.invoke(tensor)
+        times[i] = (time.perf_counter() - start) * 1000
+    return {"median_ms": float(np.median(times)), "p90_ms": float(np.percentile(times, 90))}
+
+
+class TestSplit:
+    """预加载的测试集图片（所有模型共用，只解码一次）"""
+
+    def __init__(self, dataset_dir, category):
+        self.name = dataset_dir if not category else f"{dataset_dir}[{category}]"
+        self.samples = load_samples(dataset_dir, category)
+        self.images = [load_rgb(s["path"]) for s in self.samples]
+        self.label_set = {b[0] for s in self.samples for b in s["boxes"]}
+
+    def covers(self, labels):
+        return set(labels[1:]) <= self.label_set
+
+
+def measure_accuracy(runner, labels, split, tolerance=1):
+    """
+    在测试集上评估模型
+
+    Returns:
+        dict: 部署阈值下的各类F1和最佳阈值
+    """
+    heatmaps = np.stack([runner.predict(img) for img in split.images])
+    targets = build_targets(split.samples, labels, (runner.oh, runner.ow))
+    thresholds = sorted({0.3, 0.4, 0.5, 0.6, 0.7, DEPLOY_CONFIDENCE, 0.9})
+    report = evaluate(heatmaps, targets, thresholds, tolerance)
+    deploy = thresholds.index(DEPLOY_CONFIDENCE)
+    return {
+        "dataset": split.name,
+        "f1_at_deploy": {labels[c + 1]: float(report["f1"][deploy, c]) for c in range(len(labels) - 1)},
+        "best": {
+            labels[c + 1]: {"threshold": thr, "f1": f1}
+            for c, (thr, f1) in enumerate(best_thresholds(report))
+        },
+    }
+
+
+def benchmark(models, splits, runs=30):
+    """对所有模型执行基准测试"""
+    results = []
+    for model in models:
+        runner = TFLiteRunner(model["content"])
+        row = {
+            "name": model["name"],
+            "aliases": model["aliases"],
+            "sha1": model["sha1"][:12],
+            "size_bytes": len(model["content"]),
+            "labels": model["labels"],
+        }
+        row.update(static_info(runner))
+        row.update(measure_latency(runner, runs))
+        split = next((s for s in splits if s.covers(model["labels"])), None)
+        row["accuracy"] = measure_accuracy(runner, model["labels"], split) if split else None
+        results.append(row)
+        print(f"完成: {model['name']}")
+    return results
+
+
+def print_table(results):
+    """以Markdown表格打印对比结果"""
+    print()
+    print("| 模型 | 大小(KB) | 输入 | 输出 | arena(KB) | 中位耗时(ms) | F1@0.8 | 测试集 |")
+    print("|---|---|---|---|---|---|---|---|")
+    for r in results:
+        acc = r["accuracy"]
+        f1 = ", ".join(f"{k}={v:.3f}" for k, v in acc["f1_at_deploy"].items()) if acc else "-"
+        arena = f"{r['arena_bytes'] / 1024:.0f}" if r["arena_bytes"] else "-"
+        print(
+            f"| {r['name']} | {r['size_bytes'] / 1024:.0f} | {'x'.join(map(str, r['input_shape'][1:]))} "
+            f"| {'x'.join(map(str, r['output_shape'][1:]))} | {arena} | {r['median_ms']:.2f} "
+            f"| {f1} | {acc['dataset'] if acc else '-'} |"
+        )
+    for r in results:
+        if r["aliases"]:
+            print(f"{r['name']} 与以下文件内容相同: {', '.join(r['aliases'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FOMO模型对比基准")
+    parser.add_argument("--root", default=".", help="仓库根目录")
+    parser.add_argument("--runs", type=int, default=30, help="每个模型的计时推理次数")
+    parser.add_argument("--json", default=None, help="保存完整结果到JSON文件")
+    args = parser.parse_args()
+
+    models = discover_models(args.root)
+    print(f"共找到 {len(models)} 个不同模型")
+
+    splits = []
+    for dataset_dir, category in DEFAULT_DATASETS:
+        path = os.path.join(args.root, dataset_dir)
+        if os.path.isdir(path):
+            splits.append(TestSplit(path, category))
+
+    results = benchmark(models, splits, args.runs)
+    print_table(results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,478 @@
+# pen_gateway.py - 多栏位串口数据汇总网关（上位机，asyncio + SQLite）
+#
+# 同时监听多个OpenMV的串口输出（每个栏位一路，通常是并接在OpenMV TX上的USB串口，或pty），
+# 解码全部帧类型，把检测、报警、实时/每小时/每日统计、热力图、事件快照批量写入本地SQLite。
+# 网关只接收不发送，不影响OpenMV与单片机之间的通信。
+#
+#   解析：每路一个接收缓冲，帧数据以memoryview交给解码函数，不复制（帧长度规则与stm32_sim.body_size相同）
+#   写入：记录先进入内存批次，达到--batch条或每--flush-ms毫秒，在单独的写线程中用
+#         executemany一次事务写入（WAL，synchronous=NORMAL，相同SQL复用预编译语句）
+#   指标：每--metrics-every秒输出一次；--metrics-port开启时 GET / 返回JSON
+#         （各路字节/帧/错误数、积压记录数、缓冲字节数、写入耗时、事件循环延迟、CPU占用）
+#
+# 用法示例：
+#   python tools/pen_gateway.py --port pen01=/dev/ttyUSB0 --port pen02=/dev/ttyUSB1 --db farm.db
+#   python tools/pen_gateway.py --port pen01=/dev/ttyUSB0:921600 --trace --metrics-port 8080
+#   python tools/pen_gateway.py --simulate 60 --fps 10 --seconds 120 --db /tmp/sim.db
+
+import os
+import sys
+import time
+import json
+import tty
+import termios
+import sqlite3
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "openmv"))
+
+from daily_stats import STATS_SCHEMA, decode_payload as decode_stats, payload_size  # noqa: E402
+from stm32_sim import FRAME_NAMES, body_size, synth_traffic, trace_size  # noqa: E402
+from snapshot_reassemble import Reassembler  # noqa: E402
+
+RECONNECT_DELAY = 2.0
+READ_SIZE = 65536
+KEEP_SNAPSHOTS = 4      # 每路保留的未收齐快照数
+
+STATS_COLUMNS = [field[0] for field in STATS_SCHEMA]
+
+# 表名 -> (建表语句, 插入语句)
+TABLES = {
+    "detections": ("pen TEXT, ts REAL, frame_id INTEGER, cx INTEGER, cy INTEGER",
+                   "INSERT INTO detections VALUES (?, ?, ?, ?, ?)"),
+    "realtime": ("pen TEXT, ts REAL, feces INTEGER, pigs INTEGER, alarm INTEGER",
+                 "INSERT INTO realtime VALUES (?, ?, ?, ?, ?)"),
+    "alarms": ("pen TEXT, ts REAL, state INTEGER",
+               "INSERT INTO alarms VALUES (?, ?, ?)"),
+    "stats": ("pen TEXT, ts REAL, hour INTEGER, " + ", ".join(f"{c} INTEGER" for c in STATS_COLUMNS),
+              "INSERT INTO stats VALUES (?, ?, ?, " + ", ".join("?" for _ in STATS_COLUMNS) + ")"),
+    "heatmaps": ("pen TEXT, ts REAL, data BLOB",
+                 "INSERT INTO heatmaps VALUES (?, ?, ?)"),
+    "snapshots": ("pen TEXT, ts REAL, snap_id INTEGER, reason TEXT, quality INTEGER, cam_time TEXT, "
+                  "x INTEGER, y INTEGER, w INTEGER, h INTEGER, jpeg BLOB",
+                  "INSERT INTO snapshots VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"),
+    "grids": ("pen TEXT, ts REAL, frame_id INTEGER, data BLOB",
+              "INSERT INTO grids VALUES (?, ?, ?, ?)"),
+}
+
+
+class Store:
+    """SQLite批量写入（只在写线程中使用连接）"""
+
+    def __init__(self, path):
+        self.path = path
+        self.db = None
+
+    def open(self):
+        self.db = sqlite3.connect(self.path, check_same_thread=False, cached_statements=64)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        for name, (columns, _) in TABLES.items():
+            self.db.execute(f"CREATE TABLE IF NOT EXISTS {name} ({columns})")
+            self.db.execute(f"CREATE INDEX IF NOT EXISTS {name}_pen_ts ON {name} (pen, ts)")
+        self.db.commit()
+
+    def write(self, batches):
+        """
+        一次事务写入全部批次
+
+        Returns:
+            float: 耗时（ms）
+        """
+        start = time.perf_counter()
+        with self.db:
+            for name, rows in batches.items():
+                if rows:
+                    self.db.executemany(TABLES[name][1], rows)
+        return (time.perf_counter() - start) * 1000
+
+    def close(self):
+        if self.db:
+            self.db.close()
+
+
+class PenStream:
+    """
+    一个栏位的串口数据流
+
+    接收缓冲只在一次读取处理完后整体前移；帧数据以memoryview交给解码函数，
+    解码函数只取出数值（需要保存的二进制数据才复制），不持有memoryview。
+    """
+
+    def __init__(self, gateway, pen, path, baud):
+        self.gateway = gateway
+        self.pen = pen
+        self.path = path
+        self.baud = baud
+        self.fd = None
+        self.buf = bytearray()
+        self.connected = False
+        self.last_alarm = 0
+        self.reassembler = Reassembler()
+
+        # 指标
+        self.bytes = 0
+        self.frames = {}
+        self.errors = 0
+        self.garbage = 0
+        self.reconnects = 0
+        self.last_rx = None
+
+    # ---------------- 串口 ----------------
+
+    def open(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        tty.setraw(fd)
+        attrs = termios.tcgetattr(fd)
+        speed = getattr(termios, f"B{self.baud}", None)
+        if speed is not None:
+            attrs[4] = attrs[5] = speed
+            termios.tcsetattr(fd, termios.TCSANOW, attrs)
+        self.fd = fd
+        self.buf.clear()
+        self.connected = True
+        asyncio.get_running_loop().add_reader(fd, self._on_readable)
+
+    def close(self):
+        if self.fd is not None:
+            asyncio.get_running_loop().remove_reader(self.fd)
+            os.close(self.fd)
+            self.fd = None
+        self.connected = False
+
+    async def keep_open(self):
+        """打开串口，断开后定期重连"""
+        while True:
+            if not self.connected:
+                try:
+                    self.open()
+                except OSError as e:
+                    print(f"[{self.pen}] 打开{self.path}失败: {e}")
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    def _on_readable(self):
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            print(f"[{self.pen}] 串口断开")
+            self.close()
+            self.reconnects += 1
+            return
+        self.bytes += len(data)
+        self.last_rx = time.time()
+        self.feed(data, self.last_rx)
+
+    # ---------------- 解析 ----------------
+
+    def feed(self, data, ts):
+        """送入收到的数据，解码全部完整的帧"""
+        self.buf += data
+        buf = self.buf
+        stats_size = self.gateway.stats_size
+        trace = self.gateway.trace
+        pos = 0
+        with memoryview(buf) as view:
+            while pos < len(buf):
+                b = buf[pos]
+                frame_type = b & 0x0F
+                if (b & 0xF0) != 0xF0 or frame_type not in FRAME_NAMES:
+                    self.garbage += 1
+                    pos += 1
+                    continue
+                size = body_size(buf, pos, stats_size)
+                if size is None:
+                    break
+                tail = trace_size(frame_type, trace)
+                end = pos + 1 + size + tail
+                if size < 0 or (end < len(buf) and buf[end] != 0xE0 + frame_type):
+                    self.errors += 1
+                    pos += 1
+                    continue
+                if end >= len(buf):
+                    break
+                self.frames[frame_type] = self.frames.get(frame_type, 0) + 1
+                try:
+                    self._decode(frame_type, view[pos + 1:pos + 1 + size], view[end - tail:end], ts)
+                except Exception:
+                    self.errors += 1
+                pos = end + 1
+        del buf[:pos]
+
+    def _decode(self, frame_type, body, tag, ts):
+        add = self.gateway.add
+        pen = self.pen
+        frame_id = ((tag[0] << 8) | tag[1]) if len(tag) else None
+        if frame_type == 1:
+            if body[0] == 1:
+                add("detections", (pen, ts, frame_id, (body[1] << 8) | body[2], (body[3] << 8) | body[4]))
+        elif frame_type == 2:
+            alarm = body[4]
+            add("realtime", (pen, ts, (body[0] << 8) | body[1], (body[2] << 8) | body[3], alarm))
+            if alarm != self.last_alarm:
+                add("alarms", (pen, ts, alarm))
+                self.last_alarm = alarm
+        elif frame_type == 3 or frame_type == 5:
+            hour = body[0] if frame_type == 5 else None
+            values = decode_stats(body[1:] if frame_type == 5 else body)
+            add("stats", (pen, ts, hour) + tuple(values[c] for c in STATS_COLUMNS))
+        elif frame_type == 4:
+            add("heatmaps", (pen, ts, bytes(body[2:])))
+        elif frame_type == 6:
+            if self.gateway.store_grids:
+                add("grids", (pen, ts, (body[2] << 8) | body[3], bytes(body[2:])))
+        elif frame_type == 10:
+            self._snapshot(bytes(body[2:]), ts)
+
+    def _snapshot(self, body, ts):
+        reassembler = self.reassembler
+        snap_id = reassembler.feed(body)
+        if snap_id is None:
+            raise Exception("快照分块CRC错误")
+        if not reassembler.complete(snap_id):
+            while len(reassembler.snapshots) > KEEP_SNAPSHOTS:
+                del reassembler.snapshots[next(iter(reassembler.snapshots))]
+            return
+        try:
+            shot = reassembler.assemble(snap_id)
+        finally:
+            del reassembler.snapshots[snap_id]
+        self.gateway.add("snapshots", (self.pen, ts, snap_id, shot["reason"], shot["quality"],
+                                       shot["time"].isoformat(), *shot["roi"], shot["jpeg"]))
+
+    def metrics(self):
+        return {
+            "path": self.path,
+            "connected": self.connected,
+            "bytes": self.bytes,
+            "frames": {FRAME_NAMES[t]: n for t, n in sorted(self.frames.items())},
+            "errors": self.errors,
+            "garbage": self.garbage,
+            "buffered": len(self.buf),
+            "reconnects": self.reconnects,
+            "idle_s": round(time.time() - self.last_rx, 1) if self.last_rx else None,
+        }
+
+
+class Gateway:
+    """栏位数据流、批量写入和指标"""
+
+    def __init__(self, args):
+        self.args = args
+        self.trace = args.trace
+        self.store_grids = args.store_grids
+        self.stats_size = payload_size()
+        self.streams = []
+        self.store = Store(args.db)
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.batches = {name: [] for name in TABLES}
+        self.pending = 0
+        self.flushing = False
+
+        # 指标
+        self.written = 0
+        self.flushes = 0
+        self.flush_ms = 0.0
+        self.flush_max_ms = 0.0
+        self.loop_lag_ms = 0.0
+        self.loop_lag_max_ms = 0.0
+        self.sim_overruns = 0
+        self.started = time.time()
+        self.cpu_started = time.process_time()
+        self.last_sample = (self.started, self.cpu_started, 0, 0, 0)
+        self.rates = {}
+
+    def add(self, table, row):
+        self.batches[table].append(row)
+        self.pending += 1
+        if self.pending >= self.args.batch and not self.flushing:
+            asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self):
+        """把当前批次交给写线程，写入期间继续接收"""
+        if self.flushing or not self.pending:
+            return
+        self.flushing = True
+        batches = self.batches
+        count = self.pending
+        self.batches = {name: [] for name in TABLES}
+        self.pending = 0
+        try:
+            ms = await asyncio.get_running_loop().run_in_executor(self.executor, self.store.write, batches)
+            self.written += count
+            self.flushes += 1
+            self.flush_ms = ms
+            self.flush_max_ms = max(self.flush_max_ms, ms)
+        finally:
+            self.flushing = False
+
+    async def flush_loop(self):
+        while True:
+            await asyncio.sleep(self.args.flush_ms / 1000)
+            await self.flush()
+
+    async def lag_loop(self):
+        """事件循环延迟：定时器实际唤醒时间与预期的差"""
+        interval = 0.1
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag = (time.perf_counter() - start - interval) * 1000
+            self.loop_lag_ms = lag
+            self.loop_lag_max_ms = max(self.loop_lag_max_ms, lag)
+
+    def metrics(self):
+        now = time.time()
+        cpu = time.process_time()
+        total_bytes = sum(s.bytes for s in self.streams)
+        total_frames = sum(sum(s.frames.values()) for s in self.streams)
+        t0, cpu0, bytes0, frames0, written0 = self.last_sample
+        dt = max(now - t0, 1e-6)
+        self.rates = {
+            "bytes_per_s": round((total_bytes - bytes0) / dt),
+            "frames_per_s": round((total_frames - frames0) / dt, 1),
+            "records_per_s": round((self.written - written0) / dt, 1),
+            "cpu": round((cpu - cpu0) / dt, 3),
+        }
+        self.last_sample = (now, cpu, total_bytes, total_frames, self.written)
+        return {
+            "uptime_s": round(now - self.started),
+            "streams": len(self.streams),
+            "connected": sum(1 for s in self.streams if s.connected),
+            "rates": self.rates,
+            "bytes": total_bytes,
+            "frames": total_frames,
+            "errors": sum(s.errors for s in self.streams),
+            "backlog_records": self.pending,
+            "backlog_bytes": sum(len(s.buf) for s in self.streams),
+            "written": self.written,
+            "flushes": self.flushes,
+            "flush_ms": round(self.flush_ms, 2),
+            "flush_max_ms": round(self.flush_max_ms, 2),
+            "loop_lag_ms": round(self.loop_lag_ms, 2),
+            "loop_lag_max_ms": round(self.loop_lag_max_ms, 2),
+            "sim_overruns": self.sim_overruns,
+            "pens": {s.pen: s.metrics() for s in self.streams},
+        }
+
+    async def metrics_loop(self):
+        while True:
+            await asyncio.sleep(self.args.metrics_every)
+            m = self.metrics()
+            r = m["rates"]
+            print(f"[{m['uptime_s']}s] 栏位 {m['connected']}/{m['streams']} "
+                  f"{r['frames_per_s']} 帧/秒 {r['bytes_per_s']} 字节/秒 {r['records_per_s']} 记录/秒 "
+                  f"积压 {m['backlog_records']} 条/{m['backlog_bytes']} 字节 错误 {m['errors']} "
+                  f"写入 {m['flush_ms']}ms(最大{m['flush_max_ms']}) 循环延迟最大 {m['loop_lag_max_ms']}ms "
+                  f"CPU {r['cpu']:.0%}")
+
+    async def serve_metrics(self, reader, writer):
+        """GET / 返回JSON指标"""
+        await reader.readline()
+        body = json.dumps(self.metrics(), ensure_ascii=False).encode()
+        writer.write(b"HTTP/1.0 200 OK\r\nContent-Type: application/json\r\n"
+                     + f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+        writer.close()
+
+    async def simulate_camera(self, master, segments, duration_ms, start_ms):
+        """模拟一台摄像头：从模拟数据的start_ms处开始循环，按帧时间写入pty主端（缓冲满时丢弃整段并计数）"""
+        loop = asyncio.get_running_loop()
+        begin = loop.time() - start_ms / 1000
+        offset = 0.0
+        while True:
+            for t, data in segments:
+                if offset + t < start_ms:
+                    continue
+                delay = begin + (offset + t) / 1000 - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                try:
+                    n = os.write(master, data)
+                except BlockingIOError:
+                    self.sim_overruns += 1
+                    continue
+                while n < len(data):
+                    # 只写入了一部分：等可写后补上剩余部分，保证帧完整
+                    self.sim_overruns += 1
+                    await asyncio.sleep(0.005)
+                    try:
+                        n += os.write(master, data[n:])
+                    except BlockingIOError:
+                        pass
+            offset += duration_ms
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self.store.open)
+        tasks = [self.flush_loop(), self.lag_loop(), self.metrics_loop()]
+
+        if self.args.simulate:
+            # 所有模拟摄像头共用一段数据，起始时间错开
+            seconds = self.args.sim_length
+            segments = synth_traffic(seconds, fps=self.args.fps, trace=self.trace)
+            for n in range(self.args.simulate):
+                master, slave = os.openpty()
+                os.set_blocking(master, False)
+                stream = PenStream(self, f"sim{n + 1:03d}", os.ttyname(slave), self.args.baud)
+                stream.slave = slave    # 保持从端打开
+                self.streams.append(stream)
+                tasks.append(self.simulate_camera(master, segments, seconds * 1000,
+                                                  seconds * 1000 * n / self.args.simulate))
+        for spec in self.args.port:
+            pen, _, path = spec.partition("=")
+            path, _, baud = path.partition(":")
+            self.streams.append(PenStream(self, pen, path, int(baud) if baud else self.args.baud))
+        if not self.streams:
+            raise Exception("没有串口（使用--port或--simulate）")
+        tasks += [stream.keep_open() for stream in self.streams]
+
+        if self.args.metrics_port:
+            server = await asyncio.start_server(self.serve_metrics, port=self.args.metrics_port)
+            print(f"指标: http://localhost:{self.args.metrics_port}/")
+            tasks.append(server.serve_forever())
+
+        print(f"栏位: {len(self.streams)} 数据库: {self.args.db}")
+        try:
+            await asyncio.wait_for(asyncio.gather(*tasks), self.args.seconds)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            for stream in self.streams:
+                stream.close()
+            await self.flush()
+            print(json.dumps({k: v for k, v in self.metrics().items() if k != "pens"}, ensure_ascii=False))
+            await loop.run_in_executor(self.executor, self.store.close)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多栏位串口数据汇总网关")
+    parser.add_argument("--port", action="append", default=[],
+                        help="栏位=串口路径[:波特率]，可重复，如 pen01=/dev/ttyUSB0:921600")
+    parser.add_argument("--baud", type=int, default=115200, help="默认波特率")
+    parser.add_argument("--trace", action="store_true", help="帧尾前有4字节追踪标记（参数latency_trace）")
+    parser.add_argument("--db", default="pens.db", help="SQLite数据库文件")
+    parser.add_argument("--batch", type=int, default=2000, help="积压达到该条数时立即写入")
+    parser.add_argument("--flush-ms", type=int, default=500, help="定时写入间隔（ms）")
+    parser.add_argument("--store-grids", action="store_true", help="保存类别网格帧（每帧一条，数据量大）")
+    parser.add_argument("--metrics-every", type=float, default=10.0, help="输出指标的间隔（秒）")
+    parser.add_argument("--metrics-port", type=int, default=None, help="HTTP指标端口")
+    parser.add_argument("--simulate", type=int, default=0, help="模拟摄像头数量（每台一个pty）")
+    parser.add_argument("--fps", type=int, default=10, help="模拟摄像头帧率")
+    parser.add_argument("--sim-length", type=float, default=600, help="模拟数据循环长度（秒）")
+    parser.add_argument("--seconds", type=float, default=None, help="运行时间，默认一直运行")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(Gateway(args).run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# snapshot_reassemble.py - 事件快照分块帧（类型10）重组（上位机/单片机移植参考）
+#
+# 从串口抓包数据中取出快照分块，校验CRC、按块序号重组（重发的块直接覆盖），
+# 收齐的快照保存为JPEG；没有收齐的快照输出应发送的NAK命令帧，收齐的输出ACK命令帧。
+# 只用Python内置类型，帧格式见 openmv/snapshot.py。
+#
+# 用法示例：
+#   python tools/snapshot_reassemble.py uart_capture.bin
+#   python tools/snapshot_reassemble.py uart_capture.bin --out snapshots
+#   python tools/snapshot_reassemble.py uart_capture.bin --trace
+
+import os
+import argparse
+from datetime import datetime, timedelta
+
+FRAME_TYPE = 10
+INFO_SIZE = 18
+TRACE_SIZE = 4      # 参数latency_trace开启时帧尾前附加的追踪标记（帧号2 + 拍照时间低16位2）
+CMD_SNAPSHOT_NAK = 0x61
+CMD_SNAPSHOT_ACK = 0x62
+REASONS = {1: "alarm", 2: "pump", 3: "request"}
+
+# 板端时间戳以2000-01-01为纪元（MicroPython的time.mktime）
+EPOCH = datetime(2000, 1, 1)
+
+
+def crc16(data, crc=0xFFFF):
+    """CRC16-CCITT（多项式0x1021，初值0xFFFF，与uart_link.crc16相同）"""
+    for b in data:
+        crc ^= b << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+            crc &= 0xFFFF
+    return crc
+
+
+def command_frame(cmd, args):
+    """命令帧（单片机 -> OpenMV）：0xF8, 长度(2), 命令号, 参数..., 0xE8"""
+    length = 1 + len(args)
+    return bytes([0xF8, length >> 8, length & 0xff, cmd]) + bytes(args) + bytes([0xE8])
+
+
+def find_payloads(raw, trace=False):
+    """
+    在串口抓包数据中查找全部类型10帧，返回(帧内容, 帧字节数)列表（帧内容不含长度）
+
+    trace为True时跳过帧尾前的追踪标记（参数latency_trace）
+    """
+    header = 0xF0 + FRAME_TYPE
+    footer = 0xE0 + FRAME_TYPE
+    tail = TRACE_SIZE if trace else 0
+    payloads = []
+    i = 0
+    while i < len(raw) - 3:
+        if raw[i] == header:
+            length = (raw[i + 1] << 8) | raw[i + 2]
+            end = i + 3 + length + tail
+            if 8 <= length and end < len(raw) and raw[end] == footer:
+                payloads.append((raw[i + 3:end - tail], length + 4 + tail))
+                i = end + 1
+                continue
+        i += 1
+    return payloads
+
+
+class Reassembler:
+    """按快照号收集分块"""
+
+    def __init__(self):
+        self.snapshots = {}     # 快照号 -> {'total', 'chunks': {序号: 数据}}
+        self.crc_errors = 0
+        self.duplicates = 0
+
+    def feed(self, body):
+        """
+        处理一个分块帧的内容
+
+        Returns:
+            int: 快照号，CRC错误时为None
+        """
+        if len(body) < 8 or crc16(body[:-2]) != ((body[-2] << 8) | body[-1]):
+            self.crc_errors += 1
+            return None
+        snap_id = (body[0] << 8) | body[1]
+        seq = (body[2] << 8) | body[3]
+        total = (body[4] << 8) | body[5]
+        snap = self.snapshots.get(snap_id)
+        if snap is None or snap["total"] != total:
+            # 快照号回绕后是新的快照
+            snap = self.snapshots[snap_id] = {"total": total, "chunks": {}}
+        if seq in snap["chunks"]:
+            self.duplicates += 1
+        snap["chunks"][seq] = bytes(body[6:-2])
+        return snap_id
+
+    def missing(self, snap_id):
+        snap = self.snapshots[snap_id]
+        return [seq for seq in range(snap["total"]) if seq not in snap["chunks"]]
+
+    def complete(self, snap_id):
+        return not self.missing(snap_id)
+
+    def reply(self, snap_id):
+        """应发送给OpenMV的命令帧：缺块时从第一个缺的块开始重发（NAK），收齐时确认（ACK）"""
+        missing = self.missing(snap_id)
+        if missing:
+            seq = missing[0]
+            return command_frame(CMD_SNAPSHOT_NAK, [snap_id >> 8, snap_id & 0xff, seq >> 8, seq & 0xff])
+        return command_frame(CMD_SNAPSHOT_ACK, [snap_id >> 8, snap_id & 0xff])
+
+    def assemble(self, snap_id):
+        """
+        重组收齐的快照
+
+        Returns:
+            dict: {'reason', 'quality', 'time', 'roi', 'jpeg'}
+        """
+        snap = self.snapshots[snap_id]
+        data = b"".join(snap["chunks"][seq] for seq in range(snap["total"]))
+        size = int.from_bytes(data[14:18], "big")
+        jpeg = data[INFO_SIZE:INFO_SIZE + size]
+        if len(jpeg) != size:
+            raise Exception(f"快照{snap_id}长度错误: {len(jpeg)}/{size}")
+        return {
+            "reason": REASONS.get(data[0], str(data[0])),
+            "quality": data[1],
+            "time": EPOCH + timedelta(seconds=int.from_bytes(data[2:6], "big")),
+            "roi": tuple(int.from_bytes(data[6 + 2 * k:8 + 2 * k], "big") for k in range(4)),
+            "jpeg": jpeg,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="事件快照分块重组")
+    parser.add_argument("input", help="串口抓包文件（原始字节）")
+    parser.add_argument("--out", default="snapshots", help="JPEG输出目录")
+    parser.add_argument("--trace", action="store_true", help="帧尾前有4字节追踪标记（参数latency_trace）")
+    args = parser.parse_args()
+
+    with open(args.input, "rb") as f:
+        raw = f.read()
+    payloads = find_payloads(raw, args.trace)
+    if not payloads:
+        raise Exception("未找到快照分块帧")
+
+    reassembler = Reassembler()
+    for body, _ in payloads:
+        reassembler.feed(body)
+
+    os.makedirs(args.out, exist_ok=True)
+    for snap_id in sorted(reassembler.snapshots):
+        snap = reassembler.snapshots[snap_id]
+        if not reassembler.complete(snap_id):
+            missing = reassembler.missing(snap_id)
+            print(f"快照{snap_id}: 收到 {len(snap['chunks'])}/{snap['total']} 块，缺 {missing}，"
+                  f"NAK: {reassembler.reply(snap_id).hex(' ')}")
+            continue
+        shot = reassembler.assemble(snap_id)
+        name = os.path.join(args.out, f"snap_{snap_id:05d}_{shot['time']:%Y%m%d_%H%M%S}_{shot['reason']}.jpg")
+        with open(name, "wb") as f:
+            f.write(shot["jpeg"])
+        print(f"快照{snap_id}: {shot['time']} 原因={shot['reason']} ROI={shot['roi']} 质量={shot['quality']} "
+              f"{len(shot['jpeg'])}字节 -> {name}，ACK: {reassembler.reply(snap_id).hex(' ')}")
+
+    sizes = sum(size for _, size in payloads)
+    print(f"分块帧: {len(payloads)} 共 {sizes} 字节 (占抓包数据 {sizes / len(raw):.1%})，"
+          f"CRC错误 {reassembler.crc_errors}，重复块 {reassembler.duplicates}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# stats_decode.py - 每日/每小时统计帧（类型3/5）解码（上位机）
+#
+# 字段表直接从板端 openmv/daily_stats.py 导入，板端增删字段后无需修改本工具。
+#
+# 用法示例：
+#   python tools/stats_decode.py uart_capture.bin
+#   python tools/stats_decode.py uart_capture.bin --csv daily_stats.csv
+#   python tools/stats_decode.py uart_capture.bin --hourly
+#   python tools/stats_decode.py uart_capture.bin --trace
+
+import os
+import sys
+import csv
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "openmv"))
+
+from daily_stats import STATS_SCHEMA, decode_payload, payload_size  # noqa: E402
+
+FRAME_DAILY = 3
+FRAME_HOURLY = 5   # 数据前多1字节小时号
+TRACE_SIZE = 4      # 参数latency_trace开启时帧尾前附加的追踪标记（帧号2 + 拍照时间低16位2）
+
+
+def find_frames(raw, frame_type=FRAME_DAILY, schema=STATS_SCHEMA, trace=False):
+    """
+    在串口抓包数据中查找全部完整的统计帧（trace为True时跳过帧尾前的追踪标记）
+
+    Returns:
+        list: [dict, ...] 每帧解码后的字段（每小时统计帧多一个'hour'字段）
+    """
+    header = 0xF0 + frame_type
+    footer = 0xE0 + frame_type
+    prefix = 1 if frame_type == FRAME_HOURLY else 0
+    size = prefix + payload_size(schema)
+    tail = TRACE_SIZE if trace else 0
+    frames = []
+    i = 0
+    while i + size + tail + 1 < len(raw):
+        if raw[i] == header and raw[i + size + tail + 1] == footer:
+            try:
+                frame = decode_payload(raw[i + 1 + prefix:i + 1 + size], schema)
+                if prefix:
+                    frame["hour"] = raw[i + 1]
+                frames.append(frame)
+                i += size + tail + 2
+                continue
+            except Exception:
+                pass
+        i += 1
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="统计帧解码")
+    parser.add_argument("input", help="串口抓包文件（原始字节）")
+    parser.add_argument("--hourly", action="store_true", help="解码每小时统计帧（类型5）")
+    parser.add_argument("--csv", default=None, help="输出CSV文件")
+    parser.add_argument("--trace", action="store_true", help="帧尾前有4字节追踪标记（参数latency_trace）")
+    args = parser.parse_args()
+
+    with open(args.input, "rb") as f:
+        frames = find_frames(f.read(), FRAME_HOURLY if args.hourly else FRAME_DAILY, trace=args.trace)
+    if not frames:
+        raise Exception("未找到完整的统计帧")
+
+    columns = ["hour"] if args.hourly else []
+    columns += [field[0] for field in STATS_SCHEMA]
+    for n, frame in enumerate(frames):
+        print(f"--- 第{n + 1}帧 ---" + (f" {frame['hour']:02d}时" if args.hourly else ""))
+        for name, _, _, desc in STATS_SCHEMA:
+            print(f"{desc}: {frame[name]}")
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(frames)
+        print(f"已保存: {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
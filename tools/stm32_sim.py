@@ -0,0 +1,693 @@
+# stm32_sim.py - STM32G4控制器替身（上位机），用于协议修改和吞吐量的长时间测试
+#
+# 解码OpenMV发出的全部帧类型（0-10，见openmv/my_uart.py），按实际固件的逻辑动作：
+#   类型0记录图像尺寸和参考点；类型1（或开启--grid-control时的类型6）把目标中心换算成舵机角度并开启水泵，
+#   --pump-hold内没有目标时关闭水泵，水泵连续运行超过40秒时报警并请求事件快照（CMD_SNAPSHOT_TAKE）；
+#   类型7应答波特率协商和回环帧；类型10重组快照并回复NAK/ACK；类型3/5/6按格式校验解码。
+# 单片机的处理按单服务队列建模：每帧处理时间 = --proc-ms + 0~--proc-jitter-ms 的随机值，
+# 接收队列超过--queue帧时丢帧，统计排队延迟分布。
+#
+# 数据来源：
+#   --pty               创建pty，打印从端路径，OpenMV侧（或link_standin等）连接该路径
+#   --tcp HOST:PORT     连接串口转TCP服务器（如ser2net）
+#   --listen PORT       等待一个TCP连接
+#   --replay FILE       回放串口抓包数据（没有时间信息，按--baud连续发送）
+#   --synthetic 秒数    生成与v13主程序相同格式、按帧率定时的模拟数据并回放（--wire-speed时连续发送）
+# 回放使用线路时间（字节数×10/波特率），几小时的数据几分钟就能跑完；--realtime时按线路时间实际等待。
+# 回放时同时用一个不注入错误的解析器解析同样的数据，作为丢帧统计的基准。
+#
+# 用法示例：
+#   python tools/stm32_sim.py --pty --proc-ms 2
+#   python tools/stm32_sim.py --replay uart_capture.bin --hours 4 --error-rate 1e-5
+#   python tools/stm32_sim.py --synthetic 600 --trace --hours 8 --baud 921600 --proc-ms 1.5 --queue 4
+#   python tools/stm32_sim.py --synthetic 60 --wire-speed --hours 1 --proc-ms 0.5
+#   python tools/stm32_sim.py --tcp 192.168.1.20:4000 --seconds 3600 --report-every 600
+
+import os
+import sys
+import time
+import tty
+import random
+import select
+import socket
+import argparse
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "openmv"))
+
+from daily_stats import Stats, decode_payload as decode_stats, payload_size  # noqa: E402
+from feces_heatmap import rle_encode  # noqa: E402
+from class_grid_decode import decode_payload as decode_grid, grid_targets, choose_target  # noqa: E402
+from snapshot_reassemble import Reassembler, crc16, command_frame  # noqa: E402
+
+FRAME_NAMES = {
+    0: "init", 1: "target", 2: "realtime", 3: "daily", 4: "heatmap", 5: "hourly",
+    6: "class_grid", 7: "link", 8: "command", 9: "response", 10: "snapshot",
+}
+LENGTH_FRAMES = (4, 6, 7, 8, 9, 10)     # 数据以2字节长度开头的帧（见body_size）
+MAX_LENGTH = 2048
+TRACE_SIZE = 4
+
+# 链路帧（见openmv/uart_link.py）
+LINK_FRAME = 7
+OP_PROPOSE, OP_ACCEPT, OP_REJECT, OP_ECHO, OP_ECHO_REPLY, OP_COMMIT, OP_FALLBACK = range(1, 8)
+
+CMD_SNAPSHOT_TAKE = 0x60
+SNAP_PUMP = 2
+PUMP_ALARM_MS = 40000   # 水泵连续工作40秒报警
+
+CHUNK = 256             # 回放时每次送入解析器的字节数
+
+
+def trace_size(frame_type, trace):
+    """
+    帧尾前追踪标记的长度：latency_trace开启时为TRACE_SIZE，
+    链路帧（类型7）由uart_link以trace=False发送，始终为0
+    """
+    return TRACE_SIZE if trace and frame_type != LINK_FRAME else 0
+
+
+def body_size(buf, pos, stats_size):
+    """
+    帧头位于buf[pos]时数据部分的长度（固定长度、首字节决定或2字节长度）
+
+    Returns:
+        int: 长度，数据不足以判断时为None，不合法时为-1
+    """
+    frame_type = buf[pos] & 0x0F
+    avail = len(buf) - pos - 1
+    if frame_type == 0:
+        return 8
+    if frame_type == 1:
+        if avail < 1:
+            return None
+        return {0: 1, 1: 5}.get(buf[pos + 1], -1)
+    if frame_type == 2:
+        return 5
+    if frame_type == 3:
+        return stats_size
+    if frame_type == 5:
+        return 1 + stats_size
+    if avail < 2:
+        return None
+    length = (buf[pos + 1] << 8) | buf[pos + 2]
+    if not 1 <= length <= MAX_LENGTH:
+        return -1
+    return 2 + length
+
+
+class Histogram:
+    """0.1ms分辨率的直方图（长时间运行时不保存每个样本）"""
+
+    def __init__(self, limit_ms=10000):
+        self.bins = [0] * (limit_ms * 10 + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.bins[min(len(self.bins) - 1, max(0, int(ms * 10)))] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, p):
+        if not self.count:
+            return 0.0
+        target = p / 100 * self.count
+        n = 0
+        for i, c in enumerate(self.bins):
+            n += c
+            if n >= target:
+                return i / 10
+        return self.max
+
+    def text(self):
+        if not self.count:
+            return "无数据"
+        return (f"平均 {self.total / self.count:.2f} P50 {self.percentile(50):.1f} "
+                f"P99 {self.percentile(99):.1f} 最大 {self.max:.1f} ms")
+
+
+class FrameParser:
+    """
+    流式帧解析
+
+    帧头为0xF0+类型；按类型确定数据长度（固定长度、首字节决定或2字节长度），再检查帧尾。
+    帧尾不符时从帧头的下一个字节重新同步，不丢弃已收到的字节。
+    """
+
+    def __init__(self, trace=False):
+        self.trace = trace
+        self.buf = bytearray()
+        self.base = 0               # buf[0]的绝对偏移
+        self.chunks = deque()       # (绝对起始偏移, 起始时间ms, 每字节ms)
+        self.garbage = 0
+        self.errors = {}
+        self.stats_size = payload_size()
+
+    def _error(self, kind):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def _arrival(self, offset):
+        """某个字节的到达时间"""
+        chunks = self.chunks
+        while len(chunks) > 1 and chunks[1][0] <= offset:
+            chunks.popleft()
+        start, t, byte_ms = chunks[0]
+        return t + (offset - start + 1) * byte_ms
+
+    def feed(self, data, t, byte_ms=0.0):
+        """
+        送入一段数据
+
+        Args:
+            data (bytes): 收到的字节
+            t (float): 第一个字节开始传输的时间（ms）
+            byte_ms (float): 每字节传输时间，实时数据为0
+
+        Returns:
+            list: [(帧类型, 数据, 追踪标记, 到达时间ms), ...]
+        """
+        self.chunks.append((self.base + len(self.buf), t, byte_ms))
+        self.buf += data
+        buf = self.buf
+        frames = []
+        pos = 0
+        while pos < len(buf):
+            b = buf[pos]
+            frame_type = b & 0x0F
+            if (b & 0xF0) != 0xF0 or frame_type not in FRAME_NAMES:
+                self.garbage += 1
+                pos += 1
+                continue
+            size = body_size(buf, pos, self.stats_size)
+            if size is None:
+                break
+            if size < 0:
+                self._error("length")
+                pos += 1
+                continue
+            tail = trace_size(frame_type, self.trace)
+            end = pos + 1 + size + tail
+            if end >= len(buf):
+                break
+            if buf[end] != 0xE0 + frame_type:
+                self._error("footer")
+                pos += 1
+                continue
+            body = bytes(buf[pos + 1:pos + 1 + size])
+            tag = bytes(buf[end - tail:end]) if tail else None
+            frames.append((frame_type, body, tag, self._arrival(self.base + end)))
+            pos = end + 1
+        del buf[:pos]
+        self.base += pos
+        return frames
+
+
+class Controller:
+    """单片机一端的动作与统计"""
+
+    def __init__(self, args, write=None):
+        self.args = args
+        self.write = write
+        self.rng = random.Random(args.seed)
+
+        # 图像参数（类型0）
+        self.width, self.height = 320, 240
+        self.ref = (141, 215)
+        self.pan = self.tilt = None
+
+        # 接收队列
+        self.queue = deque()
+        self.wait = Histogram()
+        self.latency = Histogram()
+        self.dropped = {}
+
+        # 统计
+        self.received = {}
+        self.decode_errors = {}
+        self.bytes = 0
+        self.moves = 0
+        self.pump_since = None
+        self.last_target = None
+        self.pump_runs = 0
+        self.pump_longest = 0.0
+        self.pump_alarmed = False
+        self.alarms = 0
+        self.alarm_flag = 0
+        self.responses = {}
+        self.link_ops = {}
+        self.snapshots = 0
+        self.reassembler = Reassembler()
+        self.last_frame_id = None
+        self.frame_id_gaps = 0
+
+    # ---------------- 队列 ----------------
+
+    def on_frame(self, frame_type, body, tag, arrival):
+        """一帧到达：进入接收队列，队列满时丢弃，否则在处理完成的时间点动作"""
+        queue = self.queue
+        while queue and queue[0] <= arrival:
+            queue.popleft()
+        if len(queue) >= self.args.queue:
+            self.dropped[frame_type] = self.dropped.get(frame_type, 0) + 1
+            return
+        start = max(arrival, queue[-1] if queue else arrival)
+        done = start + self.args.proc_ms + self.rng.random() * self.args.proc_jitter_ms
+        queue.append(done)
+        self.wait.add(start - arrival)
+        self.latency.add(done - arrival)
+        self.received[frame_type] = self.received.get(frame_type, 0) + 1
+        self.bytes += len(body) + 2 + (TRACE_SIZE if tag else 0)
+        if tag:
+            self._check_frame_id((tag[0] << 8) | tag[1])
+        try:
+            self._act(frame_type, body, done)
+        except Exception:
+            self.decode_errors[frame_type] = self.decode_errors.get(frame_type, 0) + 1
+
+    def _check_frame_id(self, frame_id):
+        last = self.last_frame_id
+        if last is not None and frame_id != last:
+            gap = (frame_id - last - 1) & 0xffff
+            if gap < 1000:
+                self.frame_id_gaps += gap
+        self.last_frame_id = frame_id
+
+    # ---------------- 动作 ----------------
+
+    def _act(self, frame_type, body, t):
+        if frame_type == 0:
+            self.width = (body[0] << 8) | body[1]
+            self.height = (body[2] << 8) | body[3]
+            self.ref = ((body[4] << 8) | body[5], (body[6] << 8) | body[7])
+        elif frame_type == 1:
+            if body[0] == 1:
+                self._aim((body[1] << 8) | body[2], (body[3] << 8) | body[4], t)
+        elif frame_type == 2:
+            self.alarm_flag = body[4]
+        elif frame_type == 3:
+            decode_stats(body)
+        elif frame_type == 5:
+            if body[0] >= 24:
+                raise Exception("小时号错误")
+            decode_stats(body[1:])
+        elif frame_type == 6:
+            frame = decode_grid(body)
+            if self.args.grid_control and len(frame["grids"]) >= self.args.grid_class:
+                target = choose_target(grid_targets(frame, self.args.grid_class), self.ref)
+                if target:
+                    self._aim(int(target[0]), int(target[1]), t)
+        elif frame_type == LINK_FRAME:
+            self._link(body[2:])
+        elif frame_type == 9:
+            status = body[3]
+            self.responses[status] = self.responses.get(status, 0) + 1
+        elif frame_type == 10:
+            self._snapshot(body[2:])
+        self.update(t)
+
+    def _aim(self, cx, cy, t):
+        """目标中心 -> 舵机角度，开启水泵"""
+        a = self.args
+        self.pan = a.pan_min + (a.pan_max - a.pan_min) * min(max(cx / self.width, 0), 1)
+        self.tilt = a.tilt_min + (a.tilt_max - a.tilt_min) * min(max(cy / self.height, 0), 1)
+        self.moves += 1
+        self.last_target = t
+        if self.pump_since is None:
+            self.pump_since = t
+            self.pump_alarmed = False
+            self.pump_runs += 1
+
+    def update(self, t):
+        """水泵超时关闭、连续运行报警"""
+        if self.pump_since is None:
+            return
+        run = t - self.pump_since
+        self.pump_longest = max(self.pump_longest, run)
+        if run > PUMP_ALARM_MS and not self.pump_alarmed:
+            self.pump_alarmed = True
+            self.alarms += 1
+            self._send(command_frame(CMD_SNAPSHOT_TAKE, [SNAP_PUMP]))
+        if t - self.last_target > self.args.pump_hold:
+            self.pump_since = None
+
+    def _send(self, frame):
+        if self.write:
+            self.write(frame)
+
+    def _link(self, body):
+        if len(body) < 3 or crc16(body[:-2]) != ((body[-2] << 8) | body[-1]):
+            raise Exception("链路帧CRC错误")
+        op, data = body[0], body[1:-2]
+        self.link_ops[op] = self.link_ops.get(op, 0) + 1
+        if op == OP_PROPOSE:
+            baud = int.from_bytes(data[:4], "big")
+            self._send_link(OP_ACCEPT if baud in self.args.accept_baud else OP_REJECT, data[:4])
+        elif op == OP_ECHO:
+            self._send_link(OP_ECHO_REPLY, data)
+
+    def _send_link(self, op, data):
+        body = bytes([op]) + bytes(data)
+        crc = crc16(body)
+        length = len(body) + 2
+        self._send(bytes([0xF0 + LINK_FRAME, length >> 8, length & 0xff]) + body
+                   + bytes([crc >> 8, crc & 0xff, 0xE0 + LINK_FRAME]))
+
+    def _snapshot(self, body):
+        snap_id = self.reassembler.feed(body)
+        if snap_id is None:
+            raise Exception("快照分块CRC错误")
+        seq = (body[2] << 8) | body[3]
+        total = (body[4] << 8) | body[5]
+        if seq == total - 1 or self.reassembler.complete(snap_id):
+            if self.reassembler.complete(snap_id):
+                self.snapshots += 1
+            self._send(self.reassembler.reply(snap_id))
+
+    # ---------------- 报告 ----------------
+
+    def report(self, parser, elapsed_ms, reference=None):
+        print(f"==== {elapsed_ms / 3600000:.2f} 小时 ====")
+        print(f"{'帧类型':<12}{'期望':>9}{'收到':>9}{'丢失':>7}{'队列丢弃':>9}{'解码错误':>9}")
+        types = set(self.received) | set(self.dropped) | set(reference.counts if reference else {})
+        for t in sorted(types):
+            got = self.received.get(t, 0)
+            dropped = self.dropped.get(t, 0)
+            expected = reference.counts.get(t, 0) if reference else None
+            lost = expected - got - dropped if reference else None
+            print(f"{FRAME_NAMES[t]:<12}{expected if reference else '-':>9}{got:>9}"
+                  f"{lost if reference else '-':>7}{dropped:>9}{self.decode_errors.get(t, 0):>9}")
+        print(f"解析错误: {parser.errors or 0} 丢弃字节: {parser.garbage} 帧号缺口: {self.frame_id_gaps}")
+        if elapsed_ms > 0:
+            usage = self.bytes * 10 / self.args.baud / (elapsed_ms / 1000)
+            print(f"有效数据: {self.bytes} 字节，{self.bytes / elapsed_ms * 1000:.0f} 字节/秒，"
+                  f"占 {self.args.baud} 波特率的 {usage:.1%}")
+        print(f"排队: {self.wait.text()}")
+        print(f"排队+处理: {self.latency.text()}")
+        print(f"动作: 瞄准 {self.moves} 次 水泵 {self.pump_runs} 次 最长 {self.pump_longest / 1000:.1f} s "
+              f"水泵报警 {self.alarms} 次 快照 {self.snapshots} 张")
+        if self.link_ops or self.responses:
+            print(f"链路操作: {self.link_ops} 命令应答状态: {self.responses}")
+
+
+class Reference:
+    """不注入错误的解析，统计每种帧应收到的数目"""
+
+    def __init__(self, trace):
+        self.parser = FrameParser(trace)
+        self.counts = {}
+
+    def feed(self, data):
+        for frame_type, _, _, _ in self.parser.feed(data, 0.0):
+            self.counts[frame_type] = self.counts.get(frame_type, 0) + 1
+
+
+class ErrorInjector:
+    """按字节错误率翻转随机位、按丢字节率删除字节（用指数分布的间隔，不逐字节取随机数）"""
+
+    def __init__(self, error_rate, drop_rate, seed):
+        self.rng = random.Random(seed + 1)
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.next_error = self._gap(error_rate)
+        self.next_drop = self._gap(drop_rate)
+        self.errors = 0
+        self.drops = 0
+
+    def _gap(self, rate):
+        return int(self.rng.expovariate(rate)) if rate > 0 else None
+
+    def apply(self, data):
+        if self.next_error is None and self.next_drop is None:
+            return data
+        data = bytearray(data)
+        if self.next_error is not None:
+            pos = self.next_error
+            while pos < len(data):
+                data[pos] ^= 1 << self.rng.randrange(8)
+                self.errors += 1
+                pos += 1 + self._gap(self.error_rate)
+            self.next_error = pos - len(data)
+        if self.next_drop is not None:
+            pos = self.next_drop
+            drops = []
+            while pos < len(data):
+                drops.append(pos)
+                pos += 1 + self._gap(self.drop_rate)
+            self.next_drop = pos - len(data)
+            for p in reversed(drops):
+                del data[p]
+            self.drops += len(drops)
+        return bytes(data)
+
+
+def synth_traffic(seconds, fps=10, trace=False, seed=1):
+    """
+    生成与v13主程序相同格式的串口数据：
+    类型0一次；每帧类型6（12×12、4位、2类）和类型1（有目标时为中心，没有时最多连续25个0）；
+    每5秒类型2；每小时类型5；每10分钟一张快照（10块）。
+    目标出现45秒、消失90秒，水泵会超过40秒报警。
+
+    Returns:
+        list: [(时间ms, 本帧发送的字节), ...]
+    """
+    rng = random.Random(seed)
+    segments = []
+    out = bytearray()
+    tag = bytearray(TRACE_SIZE)
+
+    def packet(frame_type, data):
+        out.append(0xF0 + frame_type)
+        out.extend(data)
+        if trace:
+            out.extend(tag)
+        out.append(0xE0 + frame_type)
+
+    packet(0, [0x01, 0x40, 0x00, 0xF0, 0x00, 141, 0x00, 215])
+    cols = rows = 12
+    cell = 20
+    stats = Stats()
+    fail = 0
+    snap_id = 0
+    for n in range(int(seconds * fps)):
+        frame_id = (n + 1) & 0xffff
+        t = int(n * 1000 / fps)
+        tag[:] = bytes([frame_id >> 8, frame_id & 0xff, (t >> 8) & 0xff, t & 0xff])
+        present = (n // (fps * 45)) % 3 == 0
+        cx = 160 + int(60 * rng.uniform(-1, 1))
+        cy = 150 + int(40 * rng.uniform(-1, 1))
+
+        body = bytearray([frame_id >> 8, frame_id & 0xff, cols, rows, 4, 2, 0, 0, 0, 0, (cell * 16) >> 8,
+                          (cell * 16) & 0xff])
+        for class_id in (1, 2):
+            packed = bytearray(cols * rows // 2)
+            if present and class_id == 2:
+                i = (cy // cell) * cols + cx // cell
+                packed[i // 2] |= 0xC << (4 if i % 2 == 0 else 0)
+            encoded = rle_encode(packed)
+            body += bytes([len(encoded) >> 8, len(encoded) & 0xff]) + encoded
+        packet(6, bytes([len(body) >> 8, len(body) & 0xff]) + body)
+
+        if present:
+            fail = 0
+            packet(1, [1, cx >> 8, cx & 0xff, cy >> 8, cy & 0xff])
+        elif fail < 25:
+            fail += 1
+            packet(1, [0])
+
+        stats.update('frame_count')
+        if n % (fps * 5) == 0:
+            packet(2, [0, 1 if present else 0, 0, rng.randrange(4), 0])
+        if n and n % (fps * 3600) == 0:
+            packet(5, bytes([(n // (fps * 3600)) % 24]) + stats.uart_payload())
+        if n % (fps * 600) == 0:
+            snap_id = (snap_id + 1) & 0xffff
+            jpeg = b"\xff\xd8" + bytes(rng.randrange(256) for _ in range(1240)) + b"\xff\xd9"
+            info = bytes([1, 50]) + (n // fps).to_bytes(4, "big") + bytes([0, 40, 0, 30, 0, 160, 0, 120]) \
+                + len(jpeg).to_bytes(4, "big")
+            data = info + jpeg
+            total = (len(data) + 127) // 128
+            for seq in range(total):
+                chunk = bytes([snap_id >> 8, snap_id & 0xff, seq >> 8, seq & 0xff, 0, total]) \
+                    + data[seq * 128:(seq + 1) * 128]
+                crc = crc16(chunk)
+                chunk += bytes([crc >> 8, crc & 0xff])
+                packet(10, bytes([len(chunk) >> 8, len(chunk) & 0xff]) + chunk)
+        segments.append((t, bytes(out)))
+        out.clear()
+    return segments
+
+
+# ---------------- 数据来源 ----------------
+
+def run_replay(segments, duration_ms, args, controller, parser):
+    """
+    回放：按线路时间送入解析器，直到达到--hours或--loops
+
+    Args:
+        segments (list): [(时间ms或None, 字节), ...]，时间为None时紧接上一段发送
+        duration_ms (float): 一次回放的时长
+    """
+    byte_ms = 10000 / args.baud     # 8N1每字节10位
+    reference = Reference(args.trace)
+    injector = ErrorInjector(args.error_rate, args.drop_rate, args.seed)
+    limit_ms = args.hours * 3600000 if args.hours else None
+    loops = args.loops if not limit_ms else None
+    line_free = 0.0     # 线路空闲的时间
+    offset = 0.0        # 本次回放的起始时间
+    wall_start = time.monotonic()
+    next_report = args.report_every * 1000 if args.report_every else None
+    loop = 0
+    while True:
+        for seg_t, chunk in segments:
+            if seg_t is None or args.wire_speed:
+                t = line_free
+            else:
+                t = max(offset + seg_t, line_free)
+            if limit_ms and t >= limit_ms:
+                break
+            if args.realtime:
+                delay = t / 1000 - (time.monotonic() - wall_start)
+                if delay > 0:
+                    time.sleep(delay)
+            reference.feed(chunk)
+            for frame in parser.feed(injector.apply(chunk), t, byte_ms):
+                controller.on_frame(*frame)
+            line_free = t + len(chunk) * byte_ms
+            controller.update(line_free)
+            if next_report and line_free >= next_report:
+                controller.report(parser, line_free, reference)
+                next_report += args.report_every * 1000
+        else:
+            loop += 1
+            offset = line_free if args.wire_speed else max(line_free, offset + duration_ms)
+            if loops is None or loop < loops:
+                continue
+        break
+    controller.report(parser, line_free, reference)
+    print(f"注入错误: 翻转 {injector.errors} 字节 删除 {injector.drops} 字节，"
+          f"用时 {time.monotonic() - wall_start:.1f} s（线路时间 {line_free / 1000:.0f} s）")
+
+
+def run_live(read, write, args, controller, parser):
+    """实时数据：pty或TCP"""
+    controller.write = write
+    start = time.monotonic()
+    next_report = args.report_every or None
+    try:
+        while True:
+            now = time.monotonic() - start
+            if args.seconds and now >= args.seconds:
+                break
+            data = read(0.05)
+            if data is None:
+                print("连接已断开")
+                break
+            t = (time.monotonic() - start) * 1000
+            if data:
+                for frame in parser.feed(data, t):
+                    controller.on_frame(*frame)
+            controller.update(t)
+            if next_report and now >= next_report:
+                controller.report(parser, t)
+                next_report += args.report_every
+    except KeyboardInterrupt:
+        pass
+    controller.report(parser, (time.monotonic() - start) * 1000)
+
+
+def open_pty():
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    print(f"pty从端: {os.ttyname(slave)}")
+
+    def read(timeout):
+        if not select.select([master], [], [], timeout)[0]:
+            return b""
+        return os.read(master, 4096)
+
+    return read, lambda frame: os.write(master, frame)
+
+
+def open_socket(sock):
+    sock.setblocking(False)
+
+    def read(timeout):
+        if not select.select([sock], [], [], timeout)[0]:
+            return b""
+        data = sock.recv(4096)
+        return data or None
+
+    return read, sock.sendall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="STM32G4控制器替身")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--pty", action="store_true", help="创建pty")
+    source.add_argument("--tcp", help="连接HOST:PORT")
+    source.add_argument("--listen", type=int, help="在该端口等待TCP连接")
+    source.add_argument("--replay", help="回放串口抓包文件")
+    source.add_argument("--synthetic", type=float, help="生成指定秒数的模拟数据并回放")
+    parser.add_argument("--baud", type=int, default=115200, help="线路波特率（回放时换算时间、计算占用率）")
+    parser.add_argument("--trace", action="store_true", help="帧尾前有4字节追踪标记（参数latency_trace）")
+    parser.add_argument("--proc-ms", type=float, default=1.0, help="每帧处理时间（ms）")
+    parser.add_argument("--proc-jitter-ms", type=float, default=0.5, help="处理时间的随机增加量上限（ms）")
+    parser.add_argument("--queue", type=int, default=8, help="接收队列长度（帧）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="回放时每字节的错误概率")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="回放时每字节的丢失概率")
+    parser.add_argument("--pump-hold", type=float, default=1500, help="没有目标多久后关闭水泵（ms）")
+    parser.add_argument("--grid-control", action="store_true", help="用类别网格帧选择目标")
+    parser.add_argument("--grid-class", type=int, default=2, help="类别网格帧中的目标类别序号")
+    parser.add_argument("--accept-baud", type=int, nargs="*", default=[230400, 460800, 921600],
+                        help="接受的协商波特率（空为全部拒绝）")
+    parser.add_argument("--pan-min", type=float, default=45)
+    parser.add_argument("--pan-max", type=float, default=150)
+    parser.add_argument("--tilt-min", type=float, default=45)
+    parser.add_argument("--tilt-max", type=float, default=135)
+    parser.add_argument("--hours", type=float, default=None, help="回放的线路时间（小时），循环回放数据")
+    parser.add_argument("--loops", type=int, default=1, help="回放次数（没有--hours时）")
+    parser.add_argument("--realtime", action="store_true", help="回放时按线路时间实际等待")
+    parser.add_argument("--wire-speed", action="store_true", help="模拟数据不按帧率定时，连续发送（压力测试）")
+    parser.add_argument("--seconds", type=float, default=None, help="实时数据的运行时间")
+    parser.add_argument("--report-every", type=float, default=None, help="每隔多少秒输出一次报告")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    frame_parser = FrameParser(args.trace)
+    controller = Controller(args)
+    if args.replay or args.synthetic:
+        if args.replay:
+            with open(args.replay, "rb") as f:
+                data = f.read()
+            segments = [(None, data[i:i + CHUNK]) for i in range(0, len(data), CHUNK)]
+            duration_ms = len(data) * 10000 / args.baud
+        else:
+            segments = synth_traffic(args.synthetic, trace=args.trace, seed=args.seed)
+            duration_ms = args.synthetic * 1000
+        size = sum(len(chunk) for _, chunk in segments)
+        print(f"回放数据: {size} 字节，时长 {duration_ms / 1000:.1f} s")
+        run_replay(segments, duration_ms, args, controller, frame_parser)
+        return
+
+    if args.pty:
+        read, write = open_pty()
+    elif args.tcp:
+        host, port = args.tcp.rsplit(":", 1)
+        read, write = open_socket(socket.create_connection((host, int(port))))
+    else:
+        server = socket.socket()
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(("", args.listen))
+        server.listen(1)
+        print(f"等待连接: 端口{args.listen}")
+        conn, addr = server.accept()
+        print(f"已连接: {addr}")
+        read, write = open_socket(conn)
+    run_live(read, write, args, controller, frame_parser)
+
+
+if __name__ == "__main__":
+    main()